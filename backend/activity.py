@@ -0,0 +1,35 @@
+"""
+Daily activity aggregation for the stats dashboard
+"""
+from datetime import timedelta
+from .rollups import fetch_daily_rollups_client
+
+# Activity type -> rollup counter
+ACTIVITY_COUNTERS = {
+    'goals': 'goals_completed',
+    'habits': 'habit_completions',
+    'focus': 'focus_sessions',
+    'mood': 'mood_entries'
+}
+
+def activity_window(start_date, end_date, days=7):
+    """Return the calendar days to report: the last ``days`` days of the period"""
+    last_day = end_date.date()
+    first_day = max(start_date.date(), last_day - timedelta(days=days - 1))
+    return [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+def aggregate_daily_activity(client, user_id, start_date, end_date, days=7):
+    """Build per-day activity counts from the daily rollups in one query"""
+    window = activity_window(start_date, end_date, days)
+    if not window:
+        return []
+
+    activity = []
+    for rollup in fetch_daily_rollups_client(client, user_id, window[0], window[-1]):
+        day_stats = {'date': rollup['day']}
+        for activity_type, counter in ACTIVITY_COUNTERS.items():
+            day_stats[activity_type] = rollup[counter]
+        day_stats['total'] = sum(day_stats[activity_type] for activity_type in ACTIVITY_COUNTERS)
+        activity.append(day_stats)
+
+    return activity
@@ -10,6 +10,7 @@ import os
 
 from .models import db, User, DailyEntry, Habit, HabitLog
 from .config import config
+from .db import init_app as init_db_pool, get_pool_stats
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -20,6 +21,7 @@ def create_app(config_name='default'):
     # Initialize extensions
     db.init_app(app)
     migrate = Migrate(app, db)
+    init_db_pool(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
     # Setup rate limiting
@@ -60,6 +62,11 @@ def create_app(config_name='default'):
         app.logger.error(f'Server Error: {error}')
         return jsonify({'error': 'Internal server error'}), 500
     
+    # Health checks
+    @app.route('/health/db-pool')
+    def db_pool_health():
+        return jsonify({'pool': get_pool_stats()})
+    
     # Routes
     @app.route('/')
     def index():
@@ -0,0 +1,159 @@
+"""
+Local file storage for generated report artifacts.
+
+Artifacts are addressed by the ``file_url`` stored on ``report_exports``
+(e.g. ``/exports/<export_id>.parquet``) and live under
+``REPORT_ARTIFACT_DIR``. Files are written to a temporary name and renamed
+into place so readers never see a partial artifact.
+
+``ArtifactCache`` is a content-addressed cache for rendered files: entries
+are named by a hash of everything that determines their content, so a
+changed input simply produces a new key and stale entries age out through
+LRU eviction once the cache exceeds its size budget.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+def artifact_path(root, file_url):
+    """Resolve a file_url to a path inside ``root``"""
+    root = os.path.abspath(root)
+    path = os.path.abspath(os.path.join(root, file_url.lstrip('/')))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f'Artifact path escapes the artifact root: {file_url}')
+    return path
+
+def save_artifact(root, file_url, data):
+    """Atomically write ``data`` for ``file_url``; returns the size in bytes"""
+    return _write_atomic(artifact_path(root, file_url), data)
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(data)
+
+def artifact_exists(root, file_url):
+    return bool(file_url) and os.path.isfile(artifact_path(root, file_url))
+
+def cache_key(*parts):
+    """Hash JSON-serializable parts into a stable cache key"""
+    encoded = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+class ArtifactCache:
+    """Size-bounded on-disk cache of rendered artifacts with LRU eviction.
+
+    Recency is tracked with file modification times, which are refreshed on
+    every hit, so the cache survives restarts and is shared by every process
+    pointing at the same directory. Each process keeps a running total of
+    the cache size, counted from disk on the first write and after every
+    eviction, so writes only walk the directory once it is over budget.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _path(self, key, suffix):
+        return os.path.join(self.root, key[:2], f'{key}.{suffix}')
+
+    def get(self, key, suffix):
+        """Return the cached bytes for ``key`` or None"""
+        path = self._path(key, suffix)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self._stats['misses'] += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self._stats['hits'] += 1
+        return data
+
+    def contains(self, key, suffix):
+        """Whether ``key`` is cached; counts as a use for eviction"""
+        try:
+            os.utime(self._path(key, suffix))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key, suffix, data):
+        path = self._path(key, suffix)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        _write_atomic(path, data)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - replaced
+            over_budget = self._size is None or self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def get_or_create(self, key, suffix, create):
+        """Return cached bytes, rendering and storing them with ``create()`` on a miss"""
+        data = self.get(key, suffix)
+        if data is None:
+            data = create()
+            self.put(key, suffix, data)
+        return data
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if name.endswith('.tmp'):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            if total > self.max_bytes:
+                for _, size, path in sorted(entries):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    self._stats['evictions'] += 1
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+            self._size = total
+
+    def stats(self):
+        return dict(self._stats)
+
+_caches = {}
+
+def get_artifact_cache(config):
+    """Return the cache configured by REPORT_CACHE_DIR, one per process"""
+    root = config.get('REPORT_CACHE_DIR', 'instance/report_cache')
+    if root not in _caches:
+        _caches[root] = ArtifactCache(root, config.get('REPORT_CACHE_MAX_BYTES', 512 * 2 ** 20))
+    return _caches[root]
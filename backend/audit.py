@@ -0,0 +1,160 @@
+"""
+Batched audit log writer.
+
+``log_audit_event`` in routes/security.py used to insert and commit every
+event on the request's connection. Events are now queued in process and a
+background thread writes them with one multi-row INSERT per batch, when
+``batch_size`` events are waiting or ``flush_interval`` seconds after the
+first one arrived, whichever comes first. The queue is flushed when the
+process exits.
+
+Events whose record must exist before the response is sent are written
+with ``write_audit_events`` on the request's own connection instead.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLUMNS = ('user_id', 'event_type', 'event_category', 'event_data',
+                 'ip_address', 'user_agent', 'status', 'created_at')
+
+def audit_event(user_id, event_type, category, event_data, ip_address=None,
+                user_agent=None, status='success'):
+    """Build an audit row, timestamped now rather than when it is written"""
+    return {
+        'user_id': user_id,
+        'event_type': event_type,
+        'event_category': category,
+        'event_data': json.dumps(event_data),
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'status': status,
+        'created_at': datetime.now(timezone.utc)
+    }
+
+def write_audit_events(db, events):
+    """Insert audit rows in one statement and commit"""
+    execute_values(
+        db.cursor(),
+        f"INSERT INTO audit_logs ({', '.join(AUDIT_COLUMNS)}) VALUES %s",
+        [tuple(event[column] for column in AUDIT_COLUMNS) for event in events],
+        page_size=max(len(events), 1)
+    )
+    db.commit()
+
+class AuditWriter:
+    """Queue audit events and write them in batches from a background thread"""
+
+    def __init__(self, pool, batch_size=200, flush_interval=1.0, max_queue=10000, retries=3):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def enqueue(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # The database is falling behind; make this request pay for a flush
+            # rather than lose events or grow without bound
+            logger.warning('Audit queue full, flushing synchronously')
+            self.flush()
+            self._queue.put(event)
+
+    def _take(self, limit, block_until=None):
+        """Up to ``limit`` queued events, waiting for more until ``block_until``"""
+        batch = []
+        while len(batch) < limit:
+            timeout = None if block_until is None else block_until - time.monotonic()
+            try:
+                if timeout is None or timeout <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first] + self._take(self.batch_size - 1, time.monotonic() + self.flush_interval)
+            with self._flush_lock:
+                self._write(batch)
+
+    def _write(self, batch):
+        for attempt in range(1, self.retries + 1):
+            conn = None
+            try:
+                conn = self.pool.getconn()
+                write_audit_events(conn, batch)
+                self.pool.putconn(conn)
+                return True
+            except Exception as e:
+                if conn is not None:
+                    self.pool.putconn(conn, discard=True)
+                logger.warning('Audit batch of %d failed (attempt %d of %d): %s',
+                               len(batch), attempt, self.retries, e)
+                if attempt < self.retries:
+                    time.sleep(min(0.1 * 2 ** attempt, 2.0))
+        for event in batch:
+            logger.error('Audit event not written: %s',
+                         json.dumps(event, default=str))
+        return False
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        with self._flush_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    return
+                self._write(batch)
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 1)
+        self.flush()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_audit_writer(config, pool):
+    """This process's writer, started on first use and flushed at exit"""
+    global _writer
+    writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        return writer
+
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = AuditWriter(
+                pool,
+                batch_size=config.get('AUDIT_BATCH_SIZE', 200),
+                flush_interval=config.get('AUDIT_FLUSH_INTERVAL', 1.0),
+                max_queue=config.get('AUDIT_QUEUE_SIZE', 10000)
+            ).start()
+            atexit.register(_writer.close)
+        return _writer
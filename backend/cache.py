@@ -0,0 +1,283 @@
+"""
+Response cache for read-heavy dashboard endpoints.
+
+``@cached`` stores a view's successful JSON response per endpoint, user and
+query string for a fixed TTL. Each cached endpoint declares the tags it
+depends on (``points``, ``goals``, ...). A tag has a version number that is
+part of every cache key, so write endpoints invalidate data by bumping the
+version (``@invalidates`` or ``invalidate_tags``). Old entries are never read
+again and expire on their own, and a response computed from data that
+changed mid-request is stored under a version nobody reads anymore.
+
+Misses are single-flight: the first request takes a short lock and renders,
+concurrent requests for the same key wait for its result instead of
+hitting the database too.
+
+Entries live in Redis when ``CACHE_REDIS_URL`` is set and the redis package
+is installed, otherwise in an in-process store (tests, development). Cache
+failures are logged and the view is served uncached.
+"""
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from flask import current_app, request
+
+from .artifacts import cache_key
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'cache:'
+
+class MemoryBackend:
+    """In-process key/value store with expiry, for tests and single-process deployments"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.monotonic())
+
+    def get_many(self, keys):
+        with self._lock:
+            now = time.monotonic()
+            return [self._live(key, now) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        """Set ``key`` only if it does not exist; returns whether it was set"""
+        with self._lock:
+            if self._live(key, time.monotonic()) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key, value, ttl):
+        if key not in self._data and len(self._data) >= self.max_entries:
+            self._purge()
+        self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+
+    def _purge(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._data.items()
+                    if expires_at is not None and expires_at <= now]:
+            del self._data[key]
+        # Still full: drop the oldest entries (dicts keep insertion order)
+        while len(self._data) >= self.max_entries:
+            del self._data[next(iter(self._data))]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._live(key, time.monotonic()) or 0) + 1
+            self._data[key] = (None, value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class RedisBackend:
+    """The same operations on a Redis server"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def get_many(self, keys):
+        return self.client.mget(keys)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=ttl)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, ex=ttl, nx=True))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{KEY_PREFIX}*'):
+            self.client.delete(key)
+
+class ResponseCache:
+    """Tag-versioned cache with single-flight misses on top of a backend"""
+
+    def __init__(self, backend, lock_timeout=10, poll_interval=0.05):
+        self.backend = backend
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def tag_key(tag, user_id=None):
+        return f'{KEY_PREFIX}tag:{tag}' if user_id is None else f'{KEY_PREFIX}tag:{tag}:{user_id}'
+
+    def key_for(self, namespace, user_id, tags, *parts):
+        """Build the entry key; it changes whenever one of the tags is invalidated"""
+        versions = self.backend.get_many([self.tag_key(tag, user_id) for tag in tags]) if tags else []
+        return f'{KEY_PREFIX}{namespace}:' + cache_key(user_id, [
+            int(version or 0) for version in versions], *parts)
+
+    def invalidate(self, tags, user_id=None):
+        for tag in tags:
+            self.backend.incr(self.tag_key(tag, user_id))
+
+    def get_or_compute(self, key, ttl, compute):
+        """Return the cached string for ``key`` or the result of ``compute()``.
+
+        Only one caller per key computes at a time; the others wait up to
+        ``lock_timeout`` for its result. A ``None`` result is not cached.
+        """
+        value = self._attempt(self.backend.get, key)
+        if value is not None:
+            return _decode(value)
+
+        lock_key = f'{key}:lock'
+        locked = self._attempt(self.backend.add, lock_key, '1', self.lock_timeout)
+        if not locked:
+            value = self._wait(key, lock_key)
+            if value is not None:
+                return _decode(value)
+
+        try:
+            value = compute()
+            if value is not None:
+                self._attempt(self.backend.set, key, value, ttl)
+            return value
+        finally:
+            if locked:
+                self._attempt(self.backend.delete, lock_key)
+
+    def _wait(self, key, lock_key):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value, lock = self._attempt(self.backend.get_many, [key, lock_key]) or (None, None)
+            if value is not None or lock is None:
+                return value
+        return None
+
+    @staticmethod
+    def _attempt(operation, *args):
+        try:
+            return operation(*args)
+        except Exception as e:
+            logger.warning('Response cache unavailable: %s', e)
+            return None
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+_caches = {}
+
+def get_response_cache(config):
+    """Return the cache configured by CACHE_REDIS_URL, one per process; None when disabled"""
+    if not config.get('CACHE_ENABLED', True):
+        return None
+
+    url = config.get('CACHE_REDIS_URL') if redis is not None else None
+    if url not in _caches:
+        backend = RedisBackend(redis.from_url(url)) if url else MemoryBackend()
+        _caches[url] = ResponseCache(backend, lock_timeout=config.get('CACHE_LOCK_TIMEOUT', 10))
+    return _caches[url]
+
+def _request_user(args):
+    """The user a request is for: passed by require_auth or given as ``user_id``"""
+    if args:
+        return args[0]
+    return request.args.get('user_id') or (request.get_json(silent=True) or {}).get('user_id')
+
+def _dump_response(response):
+    return json.dumps({
+        'status': response.status_code,
+        'mimetype': response.mimetype,
+        'body': response.get_data(as_text=True)
+    })
+
+def _load_response(value):
+    data = json.loads(value)
+    return current_app.response_class(data['body'], status=data['status'], mimetype=data['mimetype'])
+
+def cached(ttl, tags=(), per_user=True):
+    """Cache a GET view's 200 responses for ``ttl`` seconds.
+
+    Per-user views are keyed by the requesting user and their ``tags`` are
+    that user's tags; requests without a user are passed through so the view
+    can reject them.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            cache = get_response_cache(current_app.config)
+            user_id = _request_user(args) if per_user else None
+            if cache is None or (per_user and not user_id):
+                return f(*args, **kwargs)
+
+            key = ResponseCache._attempt(
+                cache.key_for, request.endpoint, user_id, tags,
+                sorted(request.args.items(multi=True)), kwargs)
+            if key is None:
+                return f(*args, **kwargs)
+
+            uncacheable = []
+
+            def render():
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    uncacheable.append(response)
+                    return None
+                return _dump_response(response)
+
+            value = cache.get_or_compute(key, ttl, render)
+            return uncacheable[0] if value is None else _load_response(value)
+        return decorated
+    return decorator
+
+def invalidate_tags(tags, user_id=None):
+    """Drop cached responses depending on ``tags`` (a user's tags when ``user_id`` is given)"""
+    cache = get_response_cache(current_app.config)
+    if cache is not None:
+        ResponseCache._attempt(cache.invalidate, tags, user_id)
+
+def invalidates(*tags):
+    """Invalidate the requesting user's ``tags`` after a successful write"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            response = current_app.make_response(f(*args, **kwargs))
+            user_id = _request_user(args)
+            if response.status_code < 400 and user_id:
+                invalidate_tags(tags, user_id)
+            return response
+        return decorated
+    return decorator
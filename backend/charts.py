@@ -0,0 +1,113 @@
+"""
+Report chart rendering.
+
+Charts are drawn with matplotlib's object-oriented API on Agg canvases (no
+global pyplot state, so rendering is safe in any thread or process) in a
+process pool, one task per chart. Each task only receives the columns its
+chart plots. Rendered PNGs are stored in the report ``ArtifactCache`` under
+a hash of the chart config and its data, so an unchanged chart is never
+drawn twice and report JSON only carries a reference to the image.
+
+The cache evicts PNGs like any other entry; the chart's spec is kept in
+``report_charts`` (which also records who may view it) so an evicted chart
+is drawn again when it is next requested.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .artifacts import cache_key
+
+CHART_FIELDS = {
+    'bar': ('x_field', 'y_field'),
+    'line': ('x_field', 'y_field'),
+    'pie': ('label_field', 'value_field')
+}
+
+_executor = None
+
+def get_chart_executor(max_workers=None):
+    """Process pool shared by every report rendered in this process"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+    return _executor
+
+def chart_columns(viz, rows):
+    """Extract only the columns a chart plots from the report rows"""
+    return {field: [row.get(viz[field]) for row in rows]
+            for field in CHART_FIELDS[viz['chart_type']]}
+
+def bar_totals(labels, values):
+    """Sum the values of repeated bar labels, in order of first appearance.
+
+    Matplotlib draws bars with the same label on top of each other, so
+    only the last one would be visible.
+    """
+    totals = {}
+    for label, value in zip(labels, values):
+        label = str(label)
+        totals[label] = totals.get(label, 0) + (value or 0)
+    return list(totals), list(totals.values())
+
+def render_chart(chart_type, title, columns):
+    """Render one chart to PNG bytes"""
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    if chart_type == 'bar':
+        ax.bar(*bar_totals(columns['x_field'], columns['y_field']))
+    elif chart_type == 'line':
+        ax.plot(columns['x_field'], columns['y_field'], marker='o')
+    elif chart_type == 'pie':
+        ax.pie(columns['value_field'], labels=columns['label_field'])
+
+    ax.set_title(title)
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+def chart_specs(rows, visualization_config):
+    """{viz_id: spec} for every chart of a report; ``spec['chart_id']`` names its image"""
+    specs = {}
+    for viz in visualization_config:
+        if viz['type'] != 'chart' or viz['chart_type'] not in CHART_FIELDS:
+            continue
+        columns = chart_columns(viz, rows)
+        specs[viz['id']] = {
+            'chart_id': cache_key('chart', viz['chart_type'], viz['title'], columns),
+            'chart_type': viz['chart_type'],
+            'title': viz['title'],
+            'columns': columns
+        }
+    return specs
+
+def render_charts(specs, cache, executor=None):
+    """Render the charts in ``specs`` that aren't cached yet, in parallel.
+
+    Returns {viz_id: {'title', 'chart_type', 'file_url'}}.
+    """
+    charts = {}
+    pending = {}
+
+    for viz_id, spec in specs.items():
+        chart_id = spec['chart_id']
+        charts[viz_id] = {
+            'title': spec['title'],
+            'chart_type': spec['chart_type'],
+            'file_url': f'/charts/{chart_id}.png'
+        }
+
+        if chart_id not in pending and not cache.contains(chart_id, 'png'):
+            executor = executor or get_chart_executor()
+            pending[chart_id] = executor.submit(
+                render_chart, spec['chart_type'], spec['title'], spec['columns'])
+
+    for chart_id, future in pending.items():
+        cache.put(chart_id, 'png', future.result())
+
+    return charts
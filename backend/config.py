@@ -19,6 +19,56 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # PostgreSQL connection pool (one pool per worker process)
+    DATABASE_POOL_DSN = os.environ.get('DATABASE_URL')
+    DATABASE_POOL_MIN_SIZE = int(os.environ.get('DATABASE_POOL_MIN_SIZE', 1))
+    DATABASE_POOL_MAX_SIZE = int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10))
+    DATABASE_POOL_TIMEOUT = float(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+    DATABASE_POOL_MAX_IDLE = float(os.environ.get('DATABASE_POOL_MAX_IDLE', 300))
+    DATABASE_POOL_MAX_LIFETIME = float(os.environ.get('DATABASE_POOL_MAX_LIFETIME', 3600))
+    DATABASE_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL', 30))
+    
+    # Rows fetched per round trip by streaming exports
+    EXPORT_STREAM_BATCH_SIZE = int(os.environ.get('EXPORT_STREAM_BATCH_SIZE', 2000))
+
+    # Background report jobs (run workers with `python -m backend.report_worker`)
+    REPORT_QUEUE_PATH = os.environ.get('REPORT_QUEUE_PATH', 'instance/report_jobs.sqlite3')
+    REPORT_WORKER_CONCURRENCY = int(os.environ.get('REPORT_WORKER_CONCURRENCY', 2))
+    REPORT_JOB_MAX_ATTEMPTS = int(os.environ.get('REPORT_JOB_MAX_ATTEMPTS', 3))
+    REPORT_JOB_RETRY_DELAY = float(os.environ.get('REPORT_JOB_RETRY_DELAY', 5))
+    REPORT_JOB_VISIBILITY_TIMEOUT = float(os.environ.get('REPORT_JOB_VISIBILITY_TIMEOUT', 600))
+    REPORT_MAX_ACTIVE_JOBS_PER_USER = int(os.environ.get('REPORT_MAX_ACTIVE_JOBS_PER_USER', 3))
+    # Generated report files (Parquet/Arrow exports)
+    REPORT_ARTIFACT_DIR = os.environ.get('REPORT_ARTIFACT_DIR', 'instance/report_artifacts')
+    # Processes used to render report charts in parallel
+    CHART_RENDER_WORKERS = int(os.environ.get('CHART_RENDER_WORKERS', 2))
+    # Content-addressed cache of report data and chart images (LRU by size)
+    REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', 'instance/report_cache')
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    # Dashboard response cache (in-process when no Redis URL is set)
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', os.environ.get('REDIS_URL'))
+    CACHE_LOCK_TIMEOUT = int(os.environ.get('CACHE_LOCK_TIMEOUT', 10))
+    # Points leaderboards (in-process when no Redis URL is set)
+    LEADERBOARD_REDIS_URL = os.environ.get('LEADERBOARD_REDIS_URL', os.environ.get('REDIS_URL'))
+    # Without Redis, each worker reseeds its boards from the ledger this often
+    LEADERBOARD_REFRESH_SECONDS = int(os.environ.get('LEADERBOARD_REFRESH_SECONDS', 60))
+    # Users with more friends than this are read at feed time instead of fanned out;
+    # run rebuild_feed_timelines.py after changing it
+    FEED_FANOUT_MAX_FOLLOWERS = int(os.environ.get('FEED_FANOUT_MAX_FOLLOWERS', 1000))
+    # Entrants refunded per transaction when a prize draw is cancelled
+    DRAW_REFUND_CHUNK_SIZE = int(os.environ.get('DRAW_REFUND_CHUNK_SIZE', 1000))
+    # Server-sent event streams (in-process when no Redis URL is set)
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL', os.environ.get('REDIS_URL'))
+    EVENTS_BACKLOG = int(os.environ.get('EVENTS_BACKLOG', 100))
+    EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+    EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    # Audit events are written in batches by a background thread unless disabled
+    AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'true').lower() == 'true'
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+
     # Rate Limiting
     RATELIMIT_DEFAULT = "100 per minute"
     RATELIMIT_STORAGE_URL = "memory://"
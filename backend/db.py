@@ -1,22 +1,311 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
-from flask import g
+from flask import g, current_app
+
+# Fallback credentials used when DATABASE_URL is not set
+DEFAULT_CONNECT_KWARGS = {
+    'dbname': 'productivity_app',
+    'user': 'postgres',
+    'password': 'your_password',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+    pass
+
+class PooledConnection:
+    """Wraps a psycopg2 connection with pool bookkeeping and a cursor shortcut"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def execute(self, query, params=None):
+        """Run a query on a fresh cursor and return the cursor for fetching"""
+        cursor = self._conn.cursor()
+        cursor.execute(query, params)
+        return cursor
+
+    def stream(self, query, params=None, batch_size=2000):
+        """Yield batches of rows from a server-side (named) cursor.
+
+        Only ``batch_size`` rows are held in memory at a time. The cursor
+        lives inside the current transaction, so don't commit until the
+        generator is exhausted or closed.
+        """
+        cursor = self._conn.cursor(name=f'stream_{uuid.uuid4().hex}')
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool.
+
+    Connections are created lazily up to ``max_size``; at least ``min_size``
+    are kept open. Idle connections above the minimum are recycled after
+    ``max_idle`` seconds, every connection is replaced after ``max_lifetime``
+    seconds, and connections idle for longer than ``health_check_interval``
+    are pinged before being handed out.
+    """
+
+    def __init__(self, dsn=None, min_size=1, max_size=10, timeout=30.0,
+                 max_idle=300.0, max_lifetime=3600.0,
+                 health_check_interval=30.0, connect_kwargs=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min=%s max=%s' % (min_size, max_size))
+
+        self.dsn = dsn
+        self.connect_kwargs = connect_kwargs or {}
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.pid = os.getpid()
+
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self._metrics = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'connections_recycled': 0,
+            'checkouts': 0,
+            'checkout_timeouts': 0,
+            'checkout_wait_seconds': 0.0,
+            'health_check_failures': 0,
+            'connect_errors': 0
+        }
+
+    # Connection lifecycle
+    def _connect(self):
+        if self.dsn:
+            conn = psycopg2.connect(self.dsn)
+        else:
+            conn = psycopg2.connect(**self.connect_kwargs)
+        # Return results as dictionaries
+        conn.cursor_factory = psycopg2.extras.DictCursor
+        return PooledConnection(conn)
+
+    def _close(self, conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+        self._metrics['connections_closed'] += 1
+
+    def _is_expired(self, conn, now):
+        return self.max_lifetime and now - conn.created_at > self.max_lifetime
+
+    def _needs_health_check(self, conn, now):
+        return bool(self.health_check_interval) and \
+            now - conn.last_used >= self.health_check_interval
+
+    def _ping(self, conn):
+        try:
+            cursor = conn.raw.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn = None
+            with self._cond:
+                while conn is None:
+                    if self._closed:
+                        raise PoolTimeout('Connection pool is closed')
+
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        now = time.monotonic()
+                        if self._is_expired(candidate, now) or (
+                                self.max_idle
+                                and now - candidate.last_used > self.max_idle
+                                and self._size > self.min_size):
+                            self._size -= 1
+                            self._metrics['connections_recycled'] += 1
+                            self._close(candidate)
+                            continue
+                        if candidate.raw.closed:
+                            self._size -= 1
+                            self._close(candidate)
+                            continue
+                        conn = candidate
+                    elif self._size < self.max_size:
+                        # Reserve the slot, then connect without holding the lock
+                        self._size += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._metrics['checkout_timeouts'] += 1
+                            raise PoolTimeout(
+                                'No database connection available after %.1fs '
+                                '(max_size=%d)' % (timeout, self.max_size))
+                        self._cond.wait(remaining)
+
+            if conn is None:
+                return self._open_reserved(started)
+
+            # Ping long-idle connections outside the lock before handing them out
+            if self._needs_health_check(conn, time.monotonic()) and not self._ping(conn):
+                with self._cond:
+                    self._size -= 1
+                    self._metrics['health_check_failures'] += 1
+                    self._close(conn)
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                return self._checked_out(conn, started)
+
+    def _open_reserved(self, started):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._metrics['connect_errors'] += 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._metrics['connections_created'] += 1
+            return self._checked_out(conn, started)
+
+    def _checked_out(self, conn, started):
+        self._metrics['checkouts'] += 1
+        self._metrics['checkout_wait_seconds'] += time.monotonic() - started
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, resetting any open transaction"""
+        if not discard and not conn.raw.closed:
+            status = conn.raw.get_transaction_status()
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.raw.rollback()
+                except Exception:
+                    discard = True
+        discard = discard or conn.raw.closed
+
+        with self._cond:
+            now = time.monotonic()
+            if discard or self._closed or self._is_expired(conn, now):
+                self._size -= 1
+                self._close(conn)
+            else:
+                conn.last_used = now
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._size -= 1
+                self._close(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool size and counters"""
+        with self._cond:
+            stats = dict(self._metrics)
+            stats.update({
+                'pid': self.pid,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size
+            })
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def create_pool(config):
+    """Build a pool from Flask config values"""
+    return ConnectionPool(
+        dsn=config.get('DATABASE_POOL_DSN'),
+        min_size=config.get('DATABASE_POOL_MIN_SIZE', 1),
+        max_size=config.get('DATABASE_POOL_MAX_SIZE', 10),
+        timeout=config.get('DATABASE_POOL_TIMEOUT', 30.0),
+        max_idle=config.get('DATABASE_POOL_MAX_IDLE', 300.0),
+        max_lifetime=config.get('DATABASE_POOL_MAX_LIFETIME', 3600.0),
+        health_check_interval=config.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL', 30.0),
+        connect_kwargs=DEFAULT_CONNECT_KWARGS
+    )
+
+def get_pool():
+    """Return this process's pool, creating it on first use.
+
+    Gunicorn forks workers after the app is imported, so a pool inherited from
+    the parent is abandoned (not closed, the parent still owns those sockets)
+    and each worker builds its own.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = create_pool(current_app.config)
+        return _pool
+
+def get_pool_stats():
+    """Pool metrics for the current worker process"""
+    if _pool is None or _pool.pid != os.getpid():
+        return None
+    return _pool.stats()
 
 def get_db():
     if 'db' not in g:
-        # Replace these with your actual database credentials
-        g.db = psycopg2.connect(
-            dbname='productivity_app',
-            user='postgres',
-            password='your_password',
-            host='localhost',
-            port='5432'
-        )
-        # Return results as dictionaries
-        g.db.cursor_factory = psycopg2.extras.DictCursor
+        g.db = get_pool().getconn()
     return g.db
 
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close() 
\ No newline at end of file
+        get_pool().putconn(db)
+
+def init_app(app):
+    """Return request connections to the pool when the app context ends"""
+    app.teardown_appcontext(close_db)
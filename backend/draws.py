@@ -0,0 +1,167 @@
+"""
+Weighted prize draw selection.
+
+Entries are read page by page and folded into one weight (ticket count)
+per user, so memory grows with the number of entrants, not tickets. Winners
+are picked from a Fenwick tree of cumulative weights: each pick is a binary
+descent over prefix sums (O(log n)) and a winner's weight is then zeroed
+(O(log n)), so several winners are drawn without replacement.
+
+Draws are reproducible: the random generator is seeded with a recorded
+seed and entrants are ordered by user id, so ``select_winners`` returns
+the same winners for the same entries and seed. ``draw_audit`` summarizes
+what a draw was computed from and ``verify_draw`` replays a completed
+draw against it. Seeds for live draws are always generated by the server:
+entries are readable, so a caller-chosen seed could be searched offline
+for a winner.
+
+Cancelling a draw refunds entrants through ``refund_draw``, which drives
+the ``refund_prize_draw_chunk`` RPC (see schema_update.sql) chunk by chunk.
+"""
+import hashlib
+import logging
+import random
+import secrets
+
+logger = logging.getLogger(__name__)
+
+ENTRY_PAGE_SIZE = 1000
+REFUND_CHUNK_SIZE = 1000
+
+class FenwickSampler:
+    """Weighted sampling without replacement over integer weights"""
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.weights = list(weights)
+        self.tree = [0] + self.weights
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+
+    def _add(self, index, delta):
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+        self.total += delta
+
+    def find(self, target):
+        """Index whose cumulative weight range contains ``target`` (0 <= target < total)"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            following = position + step
+            if following <= self.size and self.tree[following] <= target:
+                position = following
+                target -= self.tree[following]
+            step >>= 1
+        return position
+
+    def sample(self, rng):
+        """Pick an index with probability proportional to its weight and remove it"""
+        if self.total <= 0:
+            raise ValueError('No weight left to sample from')
+        index = self.find(rng.randrange(self.total))
+        self._add(index, -self.weights[index])
+        self.weights[index] = 0
+        return index
+
+def iter_entries(client, draw_id, page_size=ENTRY_PAGE_SIZE):
+    """Yield a draw's entries from Supabase one page at a time"""
+    start = 0
+    while True:
+        page = client.table('prize_draw_entries')\
+            .select('id, user_id, tickets')\
+            .eq('draw_id', draw_id)\
+            .order('id')\
+            .range(start, start + page_size - 1)\
+            .execute().data
+        yield from page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+def tickets_by_user(entries):
+    """Fold entries into [(user_id, tickets)] ordered by user id"""
+    tickets = {}
+    for entry in entries:
+        if entry['tickets'] > 0:
+            tickets[entry['user_id']] = tickets.get(entry['user_id'], 0) + entry['tickets']
+    return sorted(tickets.items())
+
+def select_winners(weighted_users, count, seed):
+    """Draw up to ``count`` distinct users, weighted by tickets, with a seeded generator"""
+    sampler = FenwickSampler([tickets for _, tickets in weighted_users])
+    rng = random.Random(seed)
+    return [weighted_users[sampler.sample(rng)][0]
+            for _ in range(min(count, len(weighted_users)))]
+
+def new_seed():
+    return secrets.token_hex(16)
+
+def draw_audit(weighted_users, seed, winner_ids):
+    """What a draw was computed from, to store alongside its result"""
+    digest = hashlib.sha256()
+    for user_id, tickets in weighted_users:
+        digest.update(f'{user_id}:{tickets}\n'.encode('utf-8'))
+    return {
+        'seed': seed,
+        'entrants': len(weighted_users),
+        'tickets': sum(tickets for _, tickets in weighted_users),
+        'entries_sha256': digest.hexdigest(),
+        'winner_ids': winner_ids
+    }
+
+def verify_draw(weighted_users, audit, seed=None):
+    """Replay a completed draw from its current entries and stored audit.
+
+    ``seed``, when given, must be the seed the draw was made with; the
+    entries must still hash to the stored digest and the recorded seed
+    must reproduce the recorded winners.
+    """
+    recorded = audit['winner_ids']
+    current = draw_audit(weighted_users, audit['seed'], recorded)
+    problems = []
+    if seed is not None and str(seed) != audit['seed']:
+        problems.append('seed does not match the recorded seed')
+    if current['entries_sha256'] != audit['entries_sha256']:
+        problems.append('entries changed since the draw')
+    elif select_winners(weighted_users, len(recorded), audit['seed']) != recorded:
+        problems.append('recorded seed does not reproduce the winners')
+    return {'verified': not problems, 'problems': problems,
+            'entries_sha256': current['entries_sha256'], 'winner_ids': recorded}
+
+def refund_draw(client, draw_id, chunk_size=REFUND_CHUNK_SIZE):
+    """Cancel a draw and refund every entrant's tickets.
+
+    Each chunk of entrants is refunded in one transaction that also records
+    the draw's ``refund_progress``. Refunds are keyed per draw and user, so
+    calling this again after a failure resumes the cancellation without
+    refunding anyone twice. Returns the progress and the refunds issued by
+    this call as (user_id, points) pairs.
+    """
+    progress = client.rpc('begin_draw_cancellation', {'p_draw_id': draw_id}).execute().data
+    after_user = progress.get('last_user_id')
+    refunds = []
+    processed = progress.get('users', 0)
+    status = progress['status']
+
+    while status == 'cancelling':
+        rows = client.rpc('refund_prize_draw_chunk', {
+            'p_draw_id': draw_id,
+            'p_after_user': after_user,
+            'p_limit': chunk_size
+        }).execute().data
+        refunds.extend((row['user_id'], row['points']) for row in rows if row['refunded'])
+        processed += len(rows)
+        if rows:
+            after_user = rows[-1]['user_id']
+        if len(rows) < chunk_size:
+            status = 'cancelled'
+        logger.info('Draw %s: refunded %d of %s entrants', draw_id,
+                    processed, progress.get('total_users'))
+
+    return {'status': status, 'total_users': progress.get('total_users'), 'refunds': refunds}
@@ -0,0 +1,235 @@
+"""
+Per-user event publishing for the Server-Sent Events gateway.
+
+Writers call ``publish_event(user_id, type, data)`` after committing (new
+metric values, notifications, messages) and every open stream of that user
+receives the event instead of polling the database.
+
+Each user has a sequence of numbered events and a short backlog of the
+most recent ones, so a client reconnecting with ``Last-Event-ID`` is sent
+what it missed; an id the broker can't resume from (after a restart, or
+older than the backlog) gets a ``resync`` event telling the client to
+refetch instead. Every connection has a bounded queue: a client that stops
+reading is disconnected once its queue is full rather than buffering
+without limit, and catches up from the backlog when it reconnects.
+
+Events are delivered in process by ``EventBroker``. With ``EVENTS_REDIS_URL``
+set, ``RedisEventBroker`` keeps the sequence and backlog in Redis and
+relays events between workers over Redis pub/sub.
+"""
+import json
+import logging
+import queue
+import threading
+from collections import deque
+from flask import current_app
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'events:user:'
+
+def format_sse(event):
+    """Encode an event in the text/event-stream format"""
+    return (f"id: {event['id']}\n"
+            f"event: {event['type']}\n"
+            f"data: {json.dumps(event['data'], default=str)}\n\n")
+
+HEARTBEAT = ': keep-alive\n\n'
+
+class Subscription:
+    """One client's stream: replayed events, then a bounded queue of live ones"""
+
+    def __init__(self, broker, user_id, max_queue):
+        self.broker = broker
+        self.user_id = user_id
+        self.last_id = -1
+        self.pending = deque()
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # The client is not keeping up; end its stream so it reconnects
+            # and replays from the backlog
+            self.overflowed = True
+
+    def events(self, heartbeat):
+        """Yield events in id order, or None every ``heartbeat`` seconds of silence.
+
+        Live events can be queued before the replay is read, so ids at or
+        below the last one sent are skipped.
+        """
+        while self.pending:
+            event = self.pending.popleft()
+            if event['id'] > self.last_id:
+                self.last_id = event['id']
+                yield event
+        while not self.overflowed:
+            try:
+                event = self.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield None
+                continue
+            if event['id'] > self.last_id:
+                self.last_id = event['id']
+                yield event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class EventBroker:
+    """In-process pub/sub with a per-user sequence and replay backlog"""
+
+    def __init__(self, backlog=100, max_queue=100):
+        self.backlog_size = backlog
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._sequences = {}
+        self._backlogs = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event_type, data):
+        user_id = str(user_id)
+        with self._lock:
+            event_id = self._sequences.get(user_id, 0) + 1
+            self._sequences[user_id] = event_id
+            event = {'id': event_id, 'type': event_type, 'data': data}
+            self._backlogs.setdefault(user_id, deque(maxlen=self.backlog_size)).append(event)
+        self._deliver(user_id, event)
+        return event
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Open a stream, replaying backlog events after ``last_event_id``.
+
+        An id that can't be resumed from starts the stream with a ``resync``
+        event carrying the current id instead.
+        """
+        user_id = str(user_id)
+        subscription = Subscription(self, user_id, self.max_queue)
+        # Register before reading the backlog so no event falls in between;
+        # events() drops the duplicates
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+
+        current = self.last_event_id(user_id)
+        if last_event_id is None:
+            # New clients only get what happens from now on
+            subscription.last_id = current
+            return subscription
+
+        missed = self.backlog(user_id, last_event_id) if last_event_id <= current else []
+        resumable = last_event_id <= current and (
+            last_event_id == current or (missed and missed[0]['id'] == last_event_id + 1))
+        if resumable:
+            subscription.last_id = last_event_id
+            subscription.pending.extend(missed)
+        else:
+            # Ahead of the sequence (it was reset) or older than the backlog
+            subscription.last_id = current - 1
+            subscription.pending.append({'id': current, 'type': 'resync',
+                                         'data': {'last_event_id': current}})
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def last_event_id(self, user_id):
+        with self._lock:
+            return self._sequences.get(user_id, 0)
+
+    def backlog(self, user_id, after_id):
+        with self._lock:
+            return [event for event in self._backlogs.get(user_id, ()) if event['id'] > after_id]
+
+    def _deliver(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+class RedisEventBroker(EventBroker):
+    """Sequence and backlog in Redis, events relayed to every worker over pub/sub"""
+
+    def __init__(self, client, backlog=100, max_queue=100):
+        super().__init__(backlog, max_queue)
+        self.client = client
+        self._listener = None
+
+    def publish(self, user_id, event_type, data):
+        user_id = str(user_id)
+        event_id = self.client.incr(f'{CHANNEL_PREFIX}{user_id}:seq')
+        event = {'id': event_id, 'type': event_type, 'data': data}
+        payload = json.dumps(event, default=str)
+        pipe = self.client.pipeline()
+        pipe.lpush(f'{CHANNEL_PREFIX}{user_id}:backlog', payload)
+        pipe.ltrim(f'{CHANNEL_PREFIX}{user_id}:backlog', 0, self.backlog_size - 1)
+        pipe.publish(f'{CHANNEL_PREFIX}{user_id}', payload)
+        pipe.execute()
+        return event
+
+    def subscribe(self, user_id, last_event_id=None):
+        self._ensure_listener()
+        return super().subscribe(user_id, last_event_id)
+
+    def last_event_id(self, user_id):
+        return int(self.client.get(f'{CHANNEL_PREFIX}{user_id}:seq') or 0)
+
+    def backlog(self, user_id, after_id):
+        events = [json.loads(payload)
+                  for payload in self.client.lrange(f'{CHANNEL_PREFIX}{user_id}:backlog', 0, -1)]
+        return sorted((event for event in events if event['id'] > after_id), key=lambda e: e['id'])
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+            self._listener = threading.Thread(target=self._listen, args=(pubsub,), daemon=True)
+            self._listener.start()
+
+    def _listen(self, pubsub):
+        for message in pubsub.listen():
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode('utf-8')
+            user_id = channel[len(CHANNEL_PREFIX):]
+            if ':' in user_id:
+                continue
+            try:
+                self._deliver(user_id, json.loads(message['data']))
+            except ValueError:
+                logger.warning('Dropped malformed event on %s', channel)
+
+_brokers = {}
+
+def get_event_broker(config):
+    """Return the broker configured by EVENTS_REDIS_URL, one per process"""
+    url = config.get('EVENTS_REDIS_URL') if redis is not None else None
+    if url not in _brokers:
+        backlog = config.get('EVENTS_BACKLOG', 100)
+        max_queue = config.get('EVENTS_QUEUE_SIZE', 100)
+        _brokers[url] = RedisEventBroker(redis.from_url(url), backlog, max_queue) if url \
+            else EventBroker(backlog, max_queue)
+    return _brokers[url]
+
+def publish_event(user_id, event_type, data):
+    """Push an event to the user's open streams; never fails the write that caused it"""
+    try:
+        get_event_broker(current_app.config).publish(user_id, event_type, data)
+    except Exception as e:
+        logger.warning('Failed to publish %s event for user %s: %s', event_type, user_id, e)
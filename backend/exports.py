@@ -0,0 +1,60 @@
+"""
+Incremental CSV / NDJSON encoding for data exports.
+
+The encoders take an iterable of row batches (as produced by
+``PooledConnection.stream``) and yield encoded chunks, so an export never
+holds more than one batch in memory no matter how many rows it has.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+STREAM_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+def export_value(value):
+    """Convert a database value into something JSON can encode"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _csv_value(value):
+    value = export_value(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def iter_csv(columns, batches):
+    """Yield a CSV header followed by one encoded chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8')
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(row[column]) for column in columns] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+
+def iter_ndjson(columns, batches):
+    """Yield one JSON object per line, one chunk per batch"""
+    for rows in batches:
+        yield ''.join(
+            json.dumps({column: export_value(row[column]) for column in columns}) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+def iter_export(format, columns, batches):
+    if format == 'csv':
+        return iter_csv(columns, batches)
+    return iter_ndjson(columns, batches)
@@ -0,0 +1,65 @@
+"""
+Bulk loading of habit completion history.
+
+Completions for all of a user's habits are fetched with ``in_()`` queries in
+chunks of habit ids (keeping the request URL short), paged to stay under the
+PostgREST row limit, and grouped in memory.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from .streaks import read_index, live_streak
+
+HABIT_ID_CHUNK_SIZE = 100
+PAGE_SIZE = 1000
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def fetch_completion_dates(client, habit_ids, start_date, end_date,
+                           chunk_size=HABIT_ID_CHUNK_SIZE):
+    """Return {habit_id: set of ISO completion dates} for the date range"""
+    dates_by_habit = defaultdict(set)
+
+    for chunk in _chunks(list(habit_ids), chunk_size):
+        offset = 0
+        while True:
+            response = client.table('habit_completions') \
+                .select('id,habit_id,completion_date') \
+                .in_('habit_id', chunk) \
+                .gte('completion_date', start_date.isoformat()) \
+                .lte('completion_date', end_date.isoformat()) \
+                .order('id') \
+                .range(offset, offset + PAGE_SIZE - 1) \
+                .execute()
+
+            for completion in response.data:
+                dates_by_habit[completion['habit_id']].add(str(completion['completion_date'])[:10])
+
+            if len(response.data) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+
+    return dates_by_habit
+
+def load_habits_with_history(client, user_id, today, days=7):
+    """Fetch a user's habits with their ``days``-day history attached"""
+    habits = client.table('habits').select('*').eq('user_id', user_id).execute().data
+    if not habits:
+        return habits
+
+    start_date = today - timedelta(days=days - 1)
+    dates_by_habit = fetch_completion_dates(
+        client, [habit['id'] for habit in habits], start_date, today)
+
+    window = [(start_date + timedelta(days=i)).isoformat() for i in range(days)]
+    for habit in habits:
+        completion_dates = dates_by_habit.get(habit['id'], set())
+        habit['history'] = [
+            {'date': day, 'completed': day in completion_dates}
+            for day in window
+        ]
+        habit['completed_today'] = today.isoformat() in completion_dates
+        habit['current_streak'] = live_streak(read_index(habit), today)
+
+    return habits
@@ -0,0 +1,281 @@
+"""
+Background job queue and worker pool.
+
+Jobs are persisted in a SQLite database so the queue needs no external
+services: request handlers enqueue with ``enqueue()``, and
+``python -m backend.report_worker`` claims due jobs and runs them in a pool
+of worker processes. Failed jobs are retried with exponential backoff until
+``max_attempts`` is reached. Workers renew the lock of jobs they are still
+running (``heartbeat``), so only jobs whose worker died are reclaimed, once
+their lock is older than the visibility timeout. Completing or failing a
+job only takes effect for the worker holding its lock.
+"""
+import importlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+def task(name, on_failure=None):
+    """Register a function as a job handler.
+
+    ``on_failure(payload, error, will_retry)`` runs in the worker (inside an
+    app context) after each failed attempt.
+    """
+    def decorator(fn):
+        TASKS[name] = {'fn': fn, 'on_failure': on_failure}
+        return fn
+    return decorator
+
+class SQLiteJobQueue:
+    """Durable job queue stored in a single SQLite file"""
+
+    def __init__(self, path, visibility_timeout=600, retry_delay=5):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.retry_delay = retry_delay
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    locked_by TEXT,
+                    locked_at REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS jobs_status_available_idx
+                ON jobs(status, available_at)
+            ''')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def enqueue(self, task_name, payload, max_attempts=3, delay=0):
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute('''
+                INSERT INTO jobs (id, task, payload, status, max_attempts,
+                                  available_at, created_at, updated_at)
+                VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)
+            ''', (job_id, task_name, json.dumps(payload), max_attempts,
+                  now + delay, now, now))
+        return job_id
+
+    def claim(self, worker_id):
+        """Atomically take the oldest due job, or return None"""
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute('''
+                SELECT * FROM jobs
+                WHERE (status = 'queued' AND available_at <= ?)
+                OR (status = 'running' AND locked_at < ?)
+                ORDER BY available_at
+                LIMIT 1
+            ''', (now, now - self.visibility_timeout)).fetchone()
+            if row is None:
+                return None
+            conn.execute('''
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1,
+                    locked_by = ?, locked_at = ?, updated_at = ?
+                WHERE id = ?
+            ''', (worker_id, now, now, row['id']))
+        job = dict(row)
+        job['attempts'] += 1
+        job['locked_by'] = worker_id
+        job['locked_at'] = now
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def heartbeat(self, job):
+        """Renew the lock on a running job; returns False if another worker took it"""
+        now = time.time()
+        with self._connection() as conn:
+            renewed = conn.execute('''
+                UPDATE jobs
+                SET locked_at = ?, updated_at = ?
+                WHERE id = ? AND status = 'running' AND locked_by = ?
+            ''', (now, now, job['id'], job['locked_by'])).rowcount
+        job['locked_at'] = now
+        return renewed > 0
+
+    def complete(self, job):
+        """Mark a claimed job done; returns False if its lock was lost"""
+        with self._connection() as conn:
+            return conn.execute('''
+                UPDATE jobs
+                SET status = 'completed', locked_by = NULL, updated_at = ?
+                WHERE id = ? AND status = 'running' AND locked_by = ?
+            ''', (time.time(), job['id'], job['locked_by'])).rowcount > 0
+
+    def fail(self, job, error):
+        """Reschedule a failed job with backoff; returns True if it will retry.
+
+        Does nothing (and returns False) if the job's lock was lost.
+        """
+        now = time.time()
+        will_retry = job['attempts'] < job['max_attempts']
+        with self._connection() as conn:
+            if will_retry:
+                updated = conn.execute('''
+                    UPDATE jobs
+                    SET status = 'queued', locked_by = NULL, last_error = ?,
+                        available_at = ?, updated_at = ?
+                    WHERE id = ? AND status = 'running' AND locked_by = ?
+                ''', (error, now + self.retry_delay * 2 ** (job['attempts'] - 1),
+                      now, job['id'], job['locked_by'])).rowcount
+            else:
+                updated = conn.execute('''
+                    UPDATE jobs
+                    SET status = 'failed', locked_by = NULL, last_error = ?,
+                        updated_at = ?
+                    WHERE id = ? AND status = 'running' AND locked_by = ?
+                ''', (error, now, job['id'], job['locked_by'])).rowcount
+        return will_retry and updated > 0
+
+    def get(self, job_id):
+        with self._connection() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def counts(self):
+        with self._connection() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+class _Transaction:
+    """``with`` block running statements in one immediate transaction"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+_queues = {}
+
+def get_job_queue(config):
+    """Return the queue configured by REPORT_QUEUE_PATH, one per process"""
+    path = config.get('REPORT_QUEUE_PATH', 'instance/report_jobs.sqlite3')
+    key = (os.getpid(), path)
+    if key not in _queues:
+        _queues[key] = SQLiteJobQueue(
+            path,
+            visibility_timeout=config.get('REPORT_JOB_VISIBILITY_TIMEOUT', 600),
+            retry_delay=config.get('REPORT_JOB_RETRY_DELAY', 5))
+    return _queues[key]
+
+def enqueue(config, task_name, payload, max_attempts=None):
+    max_attempts = max_attempts or config.get('REPORT_JOB_MAX_ATTEMPTS', 3)
+    return get_job_queue(config).enqueue(task_name, payload, max_attempts=max_attempts)
+
+# Worker side
+_worker_app = None
+
+def _init_worker(app_factory, config_name, task_modules):
+    global _worker_app
+    # Children started with "spawn" must import the modules that register tasks
+    for module in task_modules:
+        importlib.import_module(module)
+    _worker_app = app_factory(config_name)
+
+def _execute(job):
+    """Run one job inside an app context; returns None or an error string"""
+    handler = TASKS.get(job['task'])
+    if handler is None:
+        return f"Unknown task: {job['task']}"
+
+    with _worker_app.app_context():
+        try:
+            handler['fn'](**job['payload'])
+            return None
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            if handler['on_failure']:
+                will_retry = job['attempts'] < job['max_attempts']
+                try:
+                    handler['on_failure'](job['payload'], error, will_retry)
+                except Exception:
+                    logger.exception('on_failure hook for %s failed', job['task'])
+            return error
+
+def run_worker(queue, app_factory, config_name, task_modules=(), concurrency=2,
+               poll_interval=1.0, stop_event=None):
+    """Claim jobs and run up to ``concurrency`` of them in child processes"""
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    stop_event = stop_event or threading.Event()
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=concurrency,
+                             initializer=_init_worker,
+                             initargs=(app_factory, config_name, tuple(task_modules))) as pool:
+        while not stop_event.is_set() or running:
+            while not stop_event.is_set() and len(running) < concurrency:
+                job = queue.claim(worker_id)
+                if job is None:
+                    break
+                logger.info('Running job %s (%s) attempt %d', job['id'], job['task'], job['attempts'])
+                running[pool.submit(_execute, job)] = job
+
+            if not running:
+                stop_event.wait(poll_interval)
+                continue
+
+            # Keep the locks of long-running jobs from expiring
+            for job in running.values():
+                if time.time() - job['locked_at'] >= queue.visibility_timeout / 3 \
+                        and not queue.heartbeat(job):
+                    logger.warning('Lost the lock on job %s', job['id'])
+
+            done, _ = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    error = future.result()
+                except Exception as e:
+                    # The child process itself died
+                    error = f'{type(e).__name__}: {e}'
+                if error is None:
+                    if not queue.complete(job):
+                        logger.warning('Job %s finished after its lock was lost', job['id'])
+                elif queue.fail(job, error):
+                    logger.warning('Job %s failed, will retry: %s', job['id'], error)
+                else:
+                    logger.error('Job %s failed permanently: %s', job['id'], error)
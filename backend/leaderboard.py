@@ -0,0 +1,285 @@
+"""
+Points leaderboards.
+
+Each board is a sorted set of user ids scored by points earned: ``global``
+(lifetime), ``weekly`` (ISO week) and ``monthly`` (calendar month). Award
+sites call ``record_points`` so boards are updated incrementally, and rank
+and neighbour lookups are O(log n) instead of sorting ``user_profiles`` on
+every request. Windowed boards are named after their period
+(``leaderboard:weekly:2024-W07``), so a new period starts from an empty
+board; ``rollover`` deletes periods older than the retention and
+``rebuild_leaderboards.py`` reseeds boards from the points ledger.
+
+The ``friends`` board is not stored: it ranks a user and their accepted
+friends by their global scores, fetched in one call.
+
+Boards live in Redis when ``LEADERBOARD_REDIS_URL`` is set and the redis
+package is installed, otherwise in process memory. In-process boards are
+seeded from ``leaderboard_totals`` on first use and reseeded every
+``LEADERBOARD_REFRESH_SECONDS``, so every worker serves the ledger's
+standings plus at most that interval of its own recent awards.
+"""
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from .db import get_db
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'leaderboard:'
+STORED_BOARDS = ('global', 'weekly', 'monthly')
+BOARD_TYPES = STORED_BOARDS + ('friends',)
+# Windowed boards kept besides the current one (e.g. last week's standings)
+RETAINED_PERIODS = 1
+
+def board_period(board_type, when=None):
+    """Period a windowed board covers at ``when``: '2024-W07', '2024-02' or None"""
+    when = when or datetime.utcnow()
+    if board_type == 'weekly':
+        year, week, _ = when.isocalendar()
+        return f'{year}-W{week:02d}'
+    if board_type == 'monthly':
+        return f'{when.year}-{when.month:02d}'
+    return None
+
+def period_start(board_type, when=None):
+    """First day a board counts points from, or None for the global board"""
+    when = when or datetime.utcnow()
+    if board_type == 'weekly':
+        return (when - timedelta(days=when.weekday())).date()
+    if board_type == 'monthly':
+        return when.date().replace(day=1)
+    return None
+
+def board_key(board_type, when=None):
+    period = board_period(board_type, when)
+    return f'{KEY_PREFIX}{board_type}' if period is None else f'{KEY_PREFIX}{board_type}:{period}'
+
+class MemoryLeaderboardStore:
+    """Sorted sets kept as bisect-ordered lists, for tests and single-process deployments"""
+
+    def __init__(self):
+        self._scores = {}
+        self._order = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key, member, amount):
+        with self._lock:
+            scores = self._scores.setdefault(key, {})
+            order = self._order.setdefault(key, [])
+            old = scores.get(member)
+            if old is not None:
+                del order[bisect.bisect_left(order, (-old, member))]
+            score = (old or 0) + amount
+            scores[member] = score
+            bisect.insort(order, (-score, member))
+            return score
+
+    def replace(self, key, scores):
+        with self._lock:
+            self._scores[key] = dict(scores)
+            self._order[key] = sorted((-score, member) for member, score in scores.items())
+
+    def rank(self, key, member):
+        """0-based position by descending score, or None"""
+        with self._lock:
+            score = self._scores.get(key, {}).get(member)
+            if score is None:
+                return None
+            return bisect.bisect_left(self._order[key], (-score, member))
+
+    def scores(self, key, members):
+        with self._lock:
+            scores = self._scores.get(key, {})
+            return [scores.get(member) for member in members]
+
+    def range(self, key, start, stop):
+        """Members ranked start..stop (inclusive) as (member, score) pairs"""
+        with self._lock:
+            return [(member, -score) for score, member in self._order.get(key, [])[start:stop + 1]]
+
+    def size(self, key):
+        with self._lock:
+            return len(self._order.get(key, []))
+
+    def keys(self):
+        with self._lock:
+            return list(self._scores)
+
+    def delete(self, key):
+        with self._lock:
+            self._scores.pop(key, None)
+            self._order.pop(key, None)
+
+class RedisLeaderboardStore:
+    """The same operations on Redis sorted sets"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def incr(self, key, member, amount):
+        return self.client.zincrby(key, amount, member)
+
+    def replace(self, key, scores):
+        tmp_key = f'{key}:rebuild'
+        pipe = self.client.pipeline()
+        pipe.delete(tmp_key)
+        if scores:
+            pipe.zadd(tmp_key, scores)
+            pipe.rename(tmp_key, key)
+        else:
+            pipe.delete(key)
+        pipe.execute()
+
+    def rank(self, key, member):
+        return self.client.zrevrank(key, member)
+
+    def scores(self, key, members):
+        return self.client.zmscore(key, members)
+
+    def range(self, key, start, stop):
+        return [(_text(member), score)
+                for member, score in self.client.zrevrange(key, start, stop, withscores=True)]
+
+    def size(self, key):
+        return self.client.zcard(key)
+
+    def keys(self):
+        return [_text(key) for key in self.client.scan_iter(f'{KEY_PREFIX}*')]
+
+    def delete(self, key):
+        self.client.delete(key)
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+def _entry(rank, member, score):
+    return {'rank': rank + 1, 'user_id': member, 'points': int(score)}
+
+class Leaderboard:
+    """Boards over a store; ``loader(since)`` -> {user_id: points} reseeds them on reads"""
+
+    def __init__(self, store, loader=None, refresh_interval=60):
+        self.store = store
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._seeded_at = None
+        self._seed_lock = threading.Lock()
+
+    def refresh(self, when=None):
+        """Reseed every board from ``loader`` when it is due"""
+        if self.loader is None:
+            return
+        with self._seed_lock:
+            now = time.monotonic()
+            if self._seeded_at is not None and now - self._seeded_at < self.refresh_interval:
+                return
+            try:
+                for board_type in STORED_BOARDS:
+                    self.rebuild(board_type, self.loader(period_start(board_type, when)), when)
+                self._seeded_at = now
+            except Exception as e:
+                logger.warning('Failed to seed leaderboards: %s', e)
+
+    def record(self, user_id, points, when=None):
+        """Add earned points to every board covering ``when``"""
+        for board_type in STORED_BOARDS:
+            self.store.incr(board_key(board_type, when), str(user_id), points)
+
+    def top(self, board_type, limit=100, when=None):
+        self.refresh(when)
+        key = board_key(board_type, when)
+        return [_entry(rank, member, score)
+                for rank, (member, score) in enumerate(self.store.range(key, 0, limit - 1))]
+
+    def rank(self, board_type, user_id, when=None):
+        """The user's entry on a board, or None if they have no points on it"""
+        self.refresh(when)
+        key = board_key(board_type, when)
+        rank = self.store.rank(key, str(user_id))
+        if rank is None:
+            return None
+        score, = self.store.scores(key, [str(user_id)])
+        return _entry(rank, str(user_id), score)
+
+    def around(self, board_type, user_id, radius=5, when=None):
+        """Entries within ``radius`` places of the user, including the user"""
+        self.refresh(when)
+        key = board_key(board_type, when)
+        rank = self.store.rank(key, str(user_id))
+        if rank is None:
+            return []
+        start = max(rank - radius, 0)
+        return [_entry(start + offset, member, score)
+                for offset, (member, score) in enumerate(self.store.range(key, start, rank + radius))]
+
+    def friends(self, user_id, friend_ids):
+        """Rank the user and their friends by global points"""
+        self.refresh()
+        members = [str(user_id)] + [str(friend_id) for friend_id in friend_ids if str(friend_id) != str(user_id)]
+        scores = self.store.scores(board_key('global'), members)
+        ranked = sorted(zip(members, (score or 0 for score in scores)), key=lambda item: (-item[1], item[0]))
+        return [_entry(rank, member, score) for rank, (member, score) in enumerate(ranked)]
+
+    def rebuild(self, board_type, totals, when=None):
+        """Replace a board with {user_id: points} computed from the ledger"""
+        self.store.replace(board_key(board_type, when),
+                           {str(user_id): points for user_id, points in totals.items() if points})
+
+    def rollover(self, when=None, retained=RETAINED_PERIODS):
+        """Delete windowed boards older than the current and ``retained`` previous periods.
+
+        Returns the deleted keys.
+        """
+        when = when or datetime.utcnow()
+        oldest = {
+            'weekly': board_key('weekly', when - timedelta(weeks=retained)),
+            'monthly': board_key('monthly', _months_before(when, retained))
+        }
+        deleted = []
+        for key in sorted(self.store.keys()):
+            for board_type, oldest_key in oldest.items():
+                # Period names sort chronologically
+                if key.startswith(f'{KEY_PREFIX}{board_type}:') and key < oldest_key:
+                    self.store.delete(key)
+                    deleted.append(key)
+        return deleted
+
+def _months_before(when, months):
+    month_index = when.year * 12 + when.month - 1 - months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+_leaderboards = {}
+
+def load_totals(since):
+    """Points per user from the ledger since a date (all time for None)"""
+    rows = get_db().execute('SELECT user_id, points FROM leaderboard_totals(%s)', (since,)).fetchall()
+    return {str(row['user_id']): int(row['points']) for row in rows}
+
+def get_leaderboard(config):
+    """Return the leaderboard configured by LEADERBOARD_REDIS_URL, one per process"""
+    url = config.get('LEADERBOARD_REDIS_URL') if redis is not None else None
+    if url not in _leaderboards:
+        if url:
+            _leaderboards[url] = Leaderboard(RedisLeaderboardStore(redis.from_url(url)))
+        else:
+            _leaderboards[url] = Leaderboard(MemoryLeaderboardStore(), load_totals,
+                                             config.get('LEADERBOARD_REFRESH_SECONDS', 60))
+    return _leaderboards[url]
+
+def record_points(user_id, points):
+    """Update the boards after points are awarded; never fails the award"""
+    try:
+        points = int(points or 0)
+        if user_id and points > 0:
+            get_leaderboard(current_app.config).record(user_id, points)
+    except Exception as e:
+        logger.warning('Failed to update leaderboards for user %s: %s', user_id, e)
@@ -0,0 +1,31 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+def main():
+    parser = argparse.ArgumentParser(description='Create upcoming audit log partitions and drop expired ones')
+    parser.add_argument('--months-ahead', type=int, default=3, help='Months of partitions to create ahead of now')
+    parser.add_argument('--retention', default='2 years', help='How long audit logs are kept')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    supabase: Client = create_client(url, key)
+
+    print("Creating audit log partitions...")
+    created = supabase.rpc('ensure_audit_log_partitions', {'p_months_ahead': args.months_ahead}).execute().data
+    for name in created:
+        print(f"  created {name}")
+
+    print("Dropping expired audit log partitions...")
+    dropped = supabase.rpc('drop_audit_log_partitions', {'p_retention': args.retention}).execute().data
+    for name in dropped:
+        print(f"  dropped {name}")
+
+    print(f"Created {len(created)} and dropped {len(dropped)} partitions.")
+
+if __name__ == "__main__":
+    main()
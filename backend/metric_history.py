@@ -0,0 +1,116 @@
+"""
+Real-time metric history.
+
+Samples are stored in ``metric_samples`` (see schema_update.sql) as
+per-bucket aggregates at three resolutions: minute, hour and day. Each new
+value is folded into all three buckets by ``record_metric_sample``, and
+``prune_metric_samples.py`` deletes buckets past their resolution's
+retention, so the table stays bounded and writes cost the same however
+long a metric has been tracked.
+
+``fetch_series`` reads a time range at the finest resolution that is still
+retained and fits in ``MAX_POINTS`` buckets, and returns series aligned on
+one list of timestamps with gaps as None, ready to chart.
+"""
+from datetime import datetime, timedelta, timezone
+
+RESOLUTIONS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+# Must match the defaults of prune_metric_samples
+RETENTION = {
+    'minute': timedelta(days=2),
+    'hour': timedelta(days=90),
+    'day': timedelta(days=730)
+}
+
+MAX_POINTS = 1000
+
+def sample_value(value):
+    """The number charted for a metric value: itself, or its score or level"""
+    if isinstance(value, dict):
+        value = value.get('score', value.get('level'))
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+def parse_time(value):
+    """Parse an ISO timestamp; naive times are taken as UTC"""
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def truncate(moment, resolution):
+    """Start of the bucket containing ``moment`` (UTC)"""
+    moment = parse_time(moment)
+    if resolution == 'minute':
+        return moment.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def bucket_count(start, end, resolution):
+    return int((truncate(end, resolution) - truncate(start, resolution)) / RESOLUTIONS[resolution]) + 1
+
+def choose_resolution(start, end, now=None, max_points=MAX_POINTS):
+    """Finest resolution still retained at ``start`` with at most ``max_points`` buckets.
+
+    Falls back to 'day', which may still exceed ``max_points``; callers check.
+    """
+    start, end = parse_time(start), parse_time(end)
+    now = parse_time(now or datetime.now(timezone.utc))
+    for resolution in RESOLUTIONS:
+        if start >= now - RETENTION[resolution] and bucket_count(start, end, resolution) <= max_points:
+            return resolution
+    return 'day'
+
+def align_series(rows, metric_types, start, end, resolution):
+    """Lay bucket rows out on one timestamp axis, one series per metric"""
+    step = RESOLUTIONS[resolution]
+    first = truncate(start, resolution)
+    timestamps = [first + step * i for i in range(bucket_count(start, end, resolution))]
+    index = {timestamp: i for i, timestamp in enumerate(timestamps)}
+
+    series = {metric_type: {key: [None] * len(timestamps) for key in ('avg', 'min', 'max', 'count')}
+              for metric_type in metric_types}
+    for row in rows:
+        i = index.get(parse_time(row['bucket']))
+        if i is None or row['metric_type'] not in series:
+            continue
+        values = series[row['metric_type']]
+        values['avg'][i] = row['value_sum'] / row['sample_count']
+        values['min'][i] = row['value_min']
+        values['max'][i] = row['value_max']
+        values['count'][i] = row['sample_count']
+
+    return {
+        'resolution': resolution,
+        'timestamps': [timestamp.isoformat() for timestamp in timestamps],
+        'series': series
+    }
+
+def record_sample(db, user_id, metric_type, value, at=None):
+    """Add a metric value to its minute/hour/day buckets; the caller commits"""
+    number = sample_value(value)
+    if number is None:
+        return False
+    db.execute('SELECT record_metric_sample(%s, %s, %s, %s)',
+               (user_id, metric_type, number, parse_time(at or datetime.now(timezone.utc))))
+    return True
+
+def fetch_series(db, user_id, metric_types, start, end, resolution=None):
+    """Aligned series for the metrics between ``start`` and ``end``"""
+    start, end = parse_time(start), parse_time(end)
+    resolution = resolution or choose_resolution(start, end)
+    rows = db.execute('''
+        SELECT metric_type, bucket, sample_count, value_sum, value_min, value_max
+        FROM metric_samples
+        WHERE user_id = %s AND metric_type = ANY(%s) AND resolution = %s
+        AND bucket BETWEEN %s AND %s
+        ORDER BY bucket
+    ''', (user_id, list(metric_types), resolution, truncate(start, resolution), end)).fetchall()
+    return align_series(rows, metric_types, start, end, resolution)
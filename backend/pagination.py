@@ -0,0 +1,44 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on a page, e.g. ``(created_at,
+id)``, encoded as an opaque URL-safe token. The next page is read with
+``WHERE (created_at, id) < (%s, %s) ORDER BY created_at DESC, id DESC``,
+which stays an index range scan however deep the client pages, unlike
+OFFSET.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+
+def encode_cursor(*values):
+    """Encode a row's sort key into a cursor token"""
+    encoded = json.dumps([value.isoformat() if isinstance(value, datetime) else str(value)
+                          for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(encoded.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size=2):
+    """Decode a cursor token into its ``size`` values; raises ValueError when malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+def decode_time_cursor(token):
+    """Decode a ``(timestamp, uuid)`` cursor; the id is checked before it reaches SQL"""
+    timestamp, row_id = decode_cursor(token)
+    try:
+        return datetime.fromisoformat(timestamp), str(uuid.UUID(row_id))
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def page_size(value, default=20, maximum=100):
+    """Parse a ``limit`` query argument, clamped to 1..maximum"""
+    try:
+        return max(1, min(int(value), maximum)) if value is not None else default
+    except ValueError:
+        return default
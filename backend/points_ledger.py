@@ -0,0 +1,67 @@
+"""
+Reads from the materialized points balance ledger.
+
+``user_points_balances`` is updated by triggers on ``points_log`` and
+``points_history`` in the same transaction as every award or refund, so a
+user's totals, including the per-category breakdown, are a single-row
+lookup instead of a scan of their history. Every award records a
+structured ``category`` (one of the values below, or e.g. ``rewards`` /
+``prize_draw`` for spending) plus a ``source`` and ``source_id``.
+"""
+import threading
+import time
+
+# Categories shown on the points dashboard
+POINTS_CATEGORIES = ('goals', 'habits', 'focus', 'mood', 'quiz', 'achievements')
+
+# Achievements are only edited in the database, never by the app (awards
+# don't change these totals), so edits are picked up within this TTL
+ACHIEVEMENT_TOTALS_TTL = 300
+
+_achievement_totals = {'value': None, 'loaded_at': 0.0}
+_achievement_totals_lock = threading.Lock()
+
+def empty_balance(user_id):
+    return {
+        'user_id': user_id,
+        'balance': 0,
+        'lifetime_earned': 0,
+        'lifetime_spent': 0,
+        'entries': 0,
+        'category_totals': {}
+    }
+
+def fetch_points_balance(client, user_id):
+    """Return the ledger row for a user (zeros if they have no points yet)"""
+    response = client.table('user_points_balances') \
+        .select('user_id,balance,lifetime_earned,lifetime_spent,entries,category_totals') \
+        .eq('user_id', user_id) \
+        .execute()
+    if not response.data:
+        return empty_balance(user_id)
+    return response.data[0]
+
+def category_points(balance, categories=POINTS_CATEGORIES):
+    """Points earned per dashboard category, from a ledger row"""
+    totals = balance.get('category_totals') or {}
+    return {category: totals.get(category, 0) for category in categories}
+
+def available_points_by_category(client):
+    """Total achievement rewards per category, cached process-wide"""
+    with _achievement_totals_lock:
+        cached = _achievement_totals['value']
+        if cached is not None and time.monotonic() - _achievement_totals['loaded_at'] < ACHIEVEMENT_TOTALS_TTL:
+            return cached
+
+    response = client.table('achievements') \
+        .select('category,points_reward') \
+        .execute()
+    totals = {}
+    for achievement in response.data:
+        totals[achievement['category']] = totals.get(achievement['category'], 0) + \
+            (achievement['points_reward'] or 0)
+
+    with _achievement_totals_lock:
+        _achievement_totals['value'] = totals
+        _achievement_totals['loaded_at'] = time.monotonic()
+    return totals
@@ -0,0 +1,32 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete real-time metric history past its retention')
+    parser.add_argument('--minute-retention', default='2 days', help='How long minute buckets are kept')
+    parser.add_argument('--hour-retention', default='90 days', help='How long hour buckets are kept')
+    parser.add_argument('--day-retention', default='2 years', help='How long day buckets are kept')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    supabase: Client = create_client(url, key)
+
+    print("Pruning metric history...")
+    pruned = supabase.rpc('prune_metric_samples', {
+        'p_minute_retention': args.minute_retention,
+        'p_hour_retention': args.hour_retention,
+        'p_day_retention': args.day_retention
+    }).execute().data
+
+    for row in pruned:
+        print(f"  {row['resolution']}: deleted {row['deleted']} buckets")
+    if not pruned:
+        print("Nothing to prune.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild user_daily_rollups from the source tables')
+    parser.add_argument('--user-id', help='Only rebuild rollups for this user')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    supabase: Client = create_client(url, key)
+
+    target = f"user {args.user_id}" if args.user_id else "all users"
+    print(f"Rebuilding daily rollups for {target}...")
+    result = supabase.rpc('rebuild_daily_rollups', {'p_user_id': args.user_id}).execute()
+    print(f"Done. {result.data} daily rollup rows written.")
+
+if __name__ == "__main__":
+    main()
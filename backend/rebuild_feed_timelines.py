@@ -0,0 +1,29 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Fan recent activities out into feed timelines again')
+    parser.add_argument('--max-followers', type=int,
+                        default=int(os.environ.get('FEED_FANOUT_MAX_FOLLOWERS', 1000)),
+                        help='Fan-out limit; must match FEED_FANOUT_MAX_FOLLOWERS')
+    parser.add_argument('--window', default='90 days', help='How far back activities are fanned out')
+    args = parser.parse_args()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    supabase: Client = create_client(url, key)
+
+    print(f"Fanning out activities from the last {args.window} (limit {args.max_followers} friends)...")
+    settled = supabase.rpc('backfill_feed_timelines', {
+        'p_max_followers': args.max_followers,
+        'p_window': args.window
+    }).execute().data
+
+    print(f"Timelines rebuilt; {settled} authors no longer need fan-in.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Backfill the habit streak index from habit_completions.
+
+Usage: python -m backend.rebuild_habit_streaks [--user-id USER_ID]
+"""
+import argparse
+import os
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from .streaks import rebuild_habit_index
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill the habit streak index from habit_completions')
+    parser.add_argument('--user-id', help='Only rebuild habits belonging to this user')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    supabase: Client = create_client(url, key)
+
+    query = supabase.table('habits').select('id')
+    if args.user_id:
+        query = query.eq('user_id', args.user_id)
+    habits = query.execute().data
+
+    print(f"Rebuilding streak index for {len(habits)} habits...")
+    for habit in habits:
+        index = rebuild_habit_index(supabase, habit['id'])
+        print(f"  {habit['id']}: current={index['current_streak']} "
+              f"longest={index['longest_streak']} last={index['last_completion_date']}")
+    print("Done.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Reseed the points leaderboards from the ledger and drop expired periods.
+
+Run it after deploying, after restoring Redis, or daily to roll weekly and
+monthly boards over.
+
+Usage: python -m backend.rebuild_leaderboards [--rollover-only]
+"""
+import argparse
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from .leaderboard import STORED_BOARDS, Leaderboard, RedisLeaderboardStore, period_start, redis
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild leaderboards from the points ledger')
+    parser.add_argument('--rollover-only', action='store_true',
+                        help='Only delete boards of expired weeks and months')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    redis_url = os.environ.get('LEADERBOARD_REDIS_URL', os.environ.get('REDIS_URL'))
+    if not redis_url or redis is None:
+        raise SystemExit("LEADERBOARD_REDIS_URL (or REDIS_URL) and the redis package are required; "
+                         "in-process leaderboards seed themselves from the ledger.")
+    leaderboard = Leaderboard(RedisLeaderboardStore(redis.from_url(redis_url)))
+    now = datetime.utcnow()
+
+    if not args.rollover_only:
+        url = os.environ.get('SUPABASE_URL')
+        key = os.environ.get('SUPABASE_KEY')
+        supabase: Client = create_client(url, key)
+
+        for board_type in STORED_BOARDS:
+            since = period_start(board_type, now)
+            rows = supabase.rpc('leaderboard_totals', {
+                'p_since': since.isoformat() if since else None
+            }).execute().data
+            leaderboard.rebuild(board_type, {row['user_id']: row['points'] for row in rows}, now)
+            print(f"Rebuilt {board_type} leaderboard: {len(rows)} users.")
+
+    for key in leaderboard.rollover(now):
+        print(f"Deleted expired board {key}.")
+
+if __name__ == "__main__":
+    main()
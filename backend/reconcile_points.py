@@ -0,0 +1,33 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify user_points_balances against points_log and points_history')
+    parser.add_argument('--fix', action='store_true', help='Rewrite mismatched ledger rows from the logs')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    supabase: Client = create_client(url, key)
+
+    print("Reconciling points ledger...")
+    mismatches = supabase.rpc('reconcile_points_balances', {'p_fix': args.fix}).execute().data
+
+    for row in mismatches:
+        print(f"  {row['user_id']}: ledger={row['ledger_balance']} ({row['ledger_entries']} entries) "
+              f"log={row['log_balance']} ({row['log_entries']} entries)")
+
+    if not mismatches:
+        print("Ledger matches the points logs.")
+    elif args.fix:
+        print(f"Fixed {len(mismatches)} ledger rows.")
+    else:
+        print(f"{len(mismatches)} ledger rows differ; rerun with --fix to repair them.")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
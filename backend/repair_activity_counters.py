@@ -0,0 +1,33 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify social activity counters against reactions and comments')
+    parser.add_argument('--fix', action='store_true', help='Rewrite mismatched counters from the source tables')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    supabase: Client = create_client(url, key)
+
+    print("Checking activity counters...")
+    mismatches = supabase.rpc('repair_activity_counters', {'p_fix': args.fix}).execute().data
+
+    for row in mismatches:
+        print(f"  {row['activity_id']}: reactions={row['stored_reactions']} (actual {row['actual_reactions']}) "
+              f"comments={row['stored_comments']} (actual {row['actual_comments']})")
+
+    if not mismatches:
+        print("Counters match reactions and comments.")
+    elif args.fix:
+        print(f"Fixed {len(mismatches)} activities.")
+    else:
+        print(f"{len(mismatches)} activities have wrong counters; rerun with --fix to repair them.")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Scheduled report dispatcher.
+
+Usage: python -m backend.report_scheduler [--poll-interval SECONDS] [--batch-size N]
+
+Polls ``scheduled_reports`` for active schedules whose ``next_run`` has
+passed, claims them with ``FOR UPDATE SKIP LOCKED`` so several scheduler
+replicas never fire the same run twice, queues a report execution for the
+report workers and advances ``next_run``. Missed runs (e.g. while the
+scheduler was down) are coalesced into a single execution.
+
+Executions are committed before their job is queued, so a crash or queue
+error in between leaves a 'queued' execution without a ``job_id``. Each
+dispatch first re-queues such scheduled executions once they are older
+than ``ORPHAN_GRACE`` and fails orphaned on-demand ones, whose export
+format isn't stored.
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+import croniter
+import pytz
+
+from .db import get_db
+from .jobs import enqueue
+
+logger = logging.getLogger(__name__)
+
+# How long an execution may wait for its job before it counts as orphaned
+ORPHAN_GRACE = timedelta(minutes=5)
+
+class SchedulerMetrics:
+    """Counters and due-time lag for dispatched schedules"""
+
+    def __init__(self):
+        self.polls = 0
+        self.dispatched = 0
+        self.errors = 0
+        self.lag_seconds_total = 0.0
+        self.lag_seconds_max = 0.0
+        self.last_lag_seconds = None
+
+    def record_dispatch(self, lag_seconds):
+        self.dispatched += 1
+        self.lag_seconds_total += lag_seconds
+        self.lag_seconds_max = max(self.lag_seconds_max, lag_seconds)
+        self.last_lag_seconds = lag_seconds
+
+    def stats(self):
+        return {
+            'polls': self.polls,
+            'dispatched': self.dispatched,
+            'errors': self.errors,
+            'lag_seconds_avg': self.lag_seconds_total / self.dispatched if self.dispatched else None,
+            'lag_seconds_max': self.lag_seconds_max,
+            'last_lag_seconds': self.last_lag_seconds
+        }
+
+def _add_month(moment):
+    year = moment.year + moment.month // 12
+    month = moment.month % 12 + 1
+    return moment.replace(year=year, month=month, day=1)
+
+def next_run_after(schedule, now):
+    """Return the first run time of ``schedule`` strictly after ``now``"""
+    tz = pytz.timezone(schedule['timezone'] or 'UTC')
+    run = schedule['next_run'].astimezone(tz)
+
+    if schedule['schedule_type'] == 'custom':
+        cron = croniter.croniter(schedule['cron_expression'], max(run, now.astimezone(tz)))
+        return cron.get_next(datetime)
+
+    # Step in local wall-clock time so runs keep their hour across DST changes
+    while run <= now:
+        local = run.replace(tzinfo=None)
+        if schedule['schedule_type'] == 'daily':
+            run = tz.localize(local + timedelta(days=1))
+        elif schedule['schedule_type'] == 'weekly':
+            run = tz.localize(local + timedelta(days=7))
+        else:  # monthly
+            run = tz.localize(_add_month(local))
+    return run
+
+def queue_execution(db, config, execution_id, user_id, template_id, parameters, export_format):
+    """Queue the report job for a committed execution and record its job id"""
+    job_id = enqueue(config, 'generate_report', {
+        'execution_id': str(execution_id),
+        'user_id': str(user_id),
+        'template_id': str(template_id),
+        'parameters': parameters or {},
+        'format': export_format
+    })
+    db.execute('''
+        UPDATE report_executions
+        SET job_id = %s
+        WHERE id = %s
+    ''', (job_id, execution_id))
+    db.commit()
+    return job_id
+
+def recover_orphaned_executions(db, config, now, grace=ORPHAN_GRACE, limit=50):
+    """Re-queue scheduled executions whose job was never queued; fail on-demand ones.
+
+    Orphans are claimed one per transaction: committing releases the row
+    lock, so a batch locked together would be open to other schedulers
+    after the first commit. Returns the number of executions recovered.
+    """
+    recovered = 0
+    while recovered < limit:
+        orphan = db.execute('''
+            SELECT e.id, e.user_id, e.template_id, e.parameters, e.scheduled_id,
+                   s.export_format
+            FROM report_executions e
+            LEFT JOIN scheduled_reports s ON s.id = e.scheduled_id
+            WHERE e.status = 'queued' AND e.job_id IS NULL AND e.created_at < %s
+            ORDER BY e.created_at
+            LIMIT 1
+            FOR UPDATE OF e SKIP LOCKED
+        ''', (now - grace,)).fetchone()
+        if orphan is None:
+            db.rollback()
+            break
+
+        recovered += 1
+        if orphan['scheduled_id'] is None:
+            db.execute('''
+                UPDATE report_executions
+                SET status = 'failed',
+                    error_details = 'Report was never queued; request it again',
+                    completed_at = NOW()
+                WHERE id = %s
+            ''', (orphan['id'],))
+            db.commit()
+            continue
+        queue_execution(db, config, orphan['id'], orphan['user_id'], orphan['template_id'],
+                        orphan['parameters'], (orphan['export_format'] or ['json'])[0])
+        logger.warning('Re-queued orphaned execution %s', orphan['id'])
+
+    return recovered
+
+def dispatch_due_schedules(db, config, metrics, batch_size=50):
+    """Claim due schedules, queue their executions and advance next_run.
+
+    Returns the number of schedules dispatched.
+    """
+    now = datetime.now(pytz.utc)
+    recover_orphaned_executions(db, config, now)
+
+    schedules = db.execute('''
+        SELECT s.*
+        FROM scheduled_reports s
+        WHERE s.is_active = true AND s.next_run <= %s
+        ORDER BY s.next_run
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ''', (now, batch_size)).fetchall()
+
+    if not schedules:
+        db.rollback()
+        return 0
+
+    dispatched = []
+    for schedule in schedules:
+        formats = schedule['export_format'] or ['json']
+        execution_id = db.execute('''
+            INSERT INTO report_executions (
+                template_id, user_id, scheduled_id,
+                parameters, status, progress, scheduled_for
+            )
+            VALUES (%s, %s, %s, %s, 'queued', 0, %s)
+            RETURNING id
+        ''', (schedule['template_id'], schedule['user_id'],
+              schedule['id'], '{}', schedule['next_run'])).fetchone()['id']
+
+        db.execute('''
+            UPDATE scheduled_reports
+            SET last_run = %s,
+                next_run = %s
+            WHERE id = %s
+        ''', (now, next_run_after(schedule, now), schedule['id']))
+
+        dispatched.append((schedule, execution_id, formats[0]))
+
+    # Commit before queueing so a failed commit never leaves a job behind;
+    # executions whose job doesn't get queued are recovered on a later poll
+    db.commit()
+
+    for schedule, execution_id, export_format in dispatched:
+        queue_execution(db, config, execution_id, schedule['user_id'],
+                        schedule['template_id'], {}, export_format)
+
+        lag = (now - schedule['next_run']).total_seconds()
+        metrics.record_dispatch(lag)
+        logger.info('Dispatched schedule %s as execution %s (lag %.1fs)',
+                    schedule['id'], execution_id, lag)
+
+    return len(dispatched)
+
+def run_scheduler(app, poll_interval=10.0, batch_size=50, stop_event=None,
+                  metrics_interval=300.0):
+    stop_event = stop_event or threading.Event()
+    metrics = SchedulerMetrics()
+    last_metrics_log = time.monotonic()
+
+    while not stop_event.is_set():
+        metrics.polls += 1
+        dispatched = 0
+        try:
+            with app.app_context():
+                # Drain the backlog before sleeping
+                while not stop_event.is_set():
+                    count = dispatch_due_schedules(get_db(), app.config, metrics, batch_size)
+                    dispatched += count
+                    if count < batch_size:
+                        break
+        except Exception:
+            metrics.errors += 1
+            logger.exception('Scheduler poll failed')
+
+        if time.monotonic() - last_metrics_log >= metrics_interval:
+            logger.info('Scheduler metrics: %s', metrics.stats())
+            last_metrics_log = time.monotonic()
+
+        if not dispatched:
+            stop_event.wait(poll_interval)
+
+    return metrics
+
+def main():
+    parser = argparse.ArgumentParser(description='Dispatch due scheduled reports to the report workers')
+    parser.add_argument('--config', default=os.environ.get('FLASK_CONFIG', 'default'),
+                        help='Config name passed to create_app')
+    parser.add_argument('--poll-interval', type=float, default=10.0,
+                        help='Seconds between polls when nothing is due')
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help='Maximum schedules claimed per transaction')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s: %(message)s')
+
+    from .app import create_app
+    app = create_app(args.config)
+    stop_event = threading.Event()
+
+    def shutdown(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    logging.info('Report scheduler started')
+    metrics = run_scheduler(app, args.poll_interval, args.batch_size, stop_event)
+    logging.info(f"Report scheduler stopped: {metrics.stats()}")
+
+if __name__ == "__main__":
+    main()
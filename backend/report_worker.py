@@ -0,0 +1,53 @@
+"""
+Report generation worker.
+
+Usage: python -m backend.report_worker [--concurrency N] [--config NAME]
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+
+from .app import create_app
+from .jobs import get_job_queue, run_worker
+
+TASK_MODULES = ('backend.routes.reporting',)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued report generation jobs')
+    parser.add_argument('--config', default=os.environ.get('FLASK_CONFIG', 'default'),
+                        help='Config name passed to create_app')
+    parser.add_argument('--concurrency', type=int,
+                        help='Number of reports generated in parallel '
+                             '(defaults to REPORT_WORKER_CONCURRENCY)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds to wait between polls when the queue is empty')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s: %(message)s')
+
+    app = create_app(args.config)
+    concurrency = args.concurrency or app.config['REPORT_WORKER_CONCURRENCY']
+    queue = get_job_queue(app.config)
+
+    stop_event = threading.Event()
+
+    def shutdown(signum, frame):
+        logging.info('Shutting down after running jobs finish...')
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    logging.info(f"Report worker started with concurrency={concurrency}, "
+                 f"queue={app.config['REPORT_QUEUE_PATH']}")
+    run_worker(queue, create_app, args.config,
+               task_modules=TASK_MODULES,
+               concurrency=concurrency,
+               poll_interval=args.poll_interval,
+               stop_event=stop_event)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-user daily rollups.
+
+``user_daily_rollups`` holds one row per user and day with the day's points,
+goal/habit/focus/mood/challenge counts and tracked time by category. Triggers
+on the source tables keep it current (see schema_update.sql) and
+``rebuild_daily_rollups.py`` recomputes it from scratch, so dashboards read
+one row per day instead of scanning raw events.
+"""
+from datetime import date, datetime, timedelta
+
+ROLLUP_COUNTERS = (
+    'points_earned', 'points_spent', 'goals_completed', 'habit_completions',
+    'focus_sessions', 'focus_minutes', 'mood_entries', 'mood_total',
+    'challenges_completed', 'time_minutes'
+)
+
+# PostgREST returns at most this many rows per request
+PAGE_SIZE = 1000
+
+def empty_rollup(day):
+    rollup = {counter: 0 for counter in ROLLUP_COUNTERS}
+    rollup['day'] = day
+    rollup['time_minutes_by_category'] = {}
+    return rollup
+
+def parse_day(value):
+    """Accept a date or an ISO date/datetime string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def _day_key(value):
+    return value.isoformat() if isinstance(value, date) else str(value)[:10]
+
+def _normalize(row):
+    rollup = empty_rollup(_day_key(row['day']))
+    for counter in ROLLUP_COUNTERS:
+        rollup[counter] = float(row.get(counter) or 0) if counter in ('mood_total', 'time_minutes') \
+            else int(row.get(counter) or 0)
+    rollup['time_minutes_by_category'] = {
+        category: float(minutes)
+        for category, minutes in (row.get('time_minutes_by_category') or {}).items()
+    }
+    return rollup
+
+def fill_days(rows, first_day, last_day):
+    """Return one rollup per day in the range, with empty days zero-filled"""
+    by_day = {rollup['day']: rollup for rollup in map(_normalize, rows)}
+    days = []
+    day = first_day
+    while day <= last_day:
+        days.append(by_day.get(day.isoformat()) or empty_rollup(day.isoformat()))
+        day += timedelta(days=1)
+    return days
+
+def fetch_daily_rollups(db, user_id, first_day, last_day):
+    """Rollups for a date range via a psycopg2 connection (see db.get_db)"""
+    first_day, last_day = parse_day(first_day), parse_day(last_day)
+    rows = db.execute('''
+        SELECT * FROM user_daily_rollups
+        WHERE user_id = %s AND day BETWEEN %s AND %s
+        ORDER BY day
+    ''', (user_id, first_day, last_day)).fetchall()
+    return fill_days([dict(row) for row in rows], first_day, last_day)
+
+def fetch_daily_rollups_client(client, user_id, first_day, last_day):
+    """Rollups for a date range via the Supabase client, read a page at a time"""
+    rows = []
+    offset = 0
+    while True:
+        response = client.table('user_daily_rollups') \
+            .select('*') \
+            .eq('user_id', user_id) \
+            .gte('day', first_day.isoformat()) \
+            .lte('day', last_day.isoformat()) \
+            .order('day') \
+            .range(offset, offset + PAGE_SIZE - 1) \
+            .execute()
+        rows.extend(response.data)
+
+        if len(response.data) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    return fill_days(rows, first_day, last_day)
+
+def sum_rollups(rollups):
+    """Combine daily rollups into period totals"""
+    totals = empty_rollup(None)
+    del totals['day']
+    for rollup in rollups:
+        for counter in ROLLUP_COUNTERS:
+            totals[counter] += rollup[counter]
+        for category, minutes in rollup['time_minutes_by_category'].items():
+            totals['time_minutes_by_category'][category] = \
+                totals['time_minutes_by_category'].get(category, 0) + minutes
+    return totals
+
+def mood_average(rollup):
+    if not rollup['mood_entries']:
+        return None
+    return rollup['mood_total'] / rollup['mood_entries']
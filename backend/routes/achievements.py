@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from ..config import supabase_client
 import uuid
+from ..cache import invalidates
+from ..leaderboard import record_points
 
 achievements_bp = Blueprint('achievements', __name__)
 
@@ -57,6 +59,7 @@ def get_achievements():
         }), 500
 
 @achievements_bp.route('/achievements/progress', methods=['POST'])
+@invalidates('points')
 def update_achievement_progress():
     data = request.get_json()
     user_id = data.get('user_id')
@@ -106,9 +109,13 @@ def update_achievement_progress():
                     'user_id': user_id,
                     'points': achievement['points_reward'],
                     'reason': f'Completed achievement: {achievement["title"]}',
+                    'category': 'achievements',
+                    'source': 'achievement_completed',
+                    'source_id': achievement['id'],
                     'created_at': current_time
                 }
                 supabase_client.table('points_history').insert(points_data).execute()
+                record_points(points_data['user_id'], points_data['points'])
             
             response = supabase_client.table('user_achievements') \
                 .update(update_data) \
@@ -136,9 +143,13 @@ def update_achievement_progress():
                     'user_id': user_id,
                     'points': achievement['points_reward'],
                     'reason': f'Completed achievement: {achievement["title"]}',
+                    'category': 'achievements',
+                    'source': 'achievement_completed',
+                    'source_id': achievement['id'],
                     'created_at': current_time
                 }
                 supabase_client.table('points_history').insert(points_data).execute()
+                record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({
             'success': True,
@@ -1,10 +1,11 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from datetime import datetime, timedelta
 import json
-import pandas as pd
-import io
 from ..db import get_db
 from ..auth import require_auth
+from ..exports import STREAM_FORMATS, iter_export
+from ..rollups import fetch_daily_rollups
+from ..cache import cached, invalidate_tags
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -57,6 +58,7 @@ def productivity_score(user_id):
             VALUES (%s, %s, %s, %s)
         ''', (user_id, date, score_value, json.dumps(factors)))
         db.commit()
+        invalidate_tags(('productivity',), user_id)
         
         score = {
             'date': date,
@@ -68,6 +70,7 @@ def productivity_score(user_id):
 
 @analytics_bp.route('/productivity/trends', methods=['GET'])
 @require_auth
+@cached(300, tags=('productivity',))
 def productivity_trends(user_id):
     db = get_db()
     period = request.args.get('period', '30')  # days
@@ -153,6 +156,21 @@ def manage_dashboards(user_id):
     return jsonify({'message': 'Dashboard created successfully', 'dashboard_id': dashboard_id})
 
 # Export functionality
+EXPORT_QUERIES = {
+    'productivity': (['date', 'score', 'factors'], '''
+        SELECT date, score, factors
+        FROM productivity_scores
+        WHERE user_id = %s AND date BETWEEN %s AND %s
+        ORDER BY date
+    '''),
+    'time': (['activity_type', 'category', 'start_time', 'end_time', 'duration', 'notes', 'tags'], '''
+        SELECT activity_type, category, start_time, end_time, duration, notes, tags
+        FROM time_entries
+        WHERE user_id = %s AND start_time::date BETWEEN %s AND %s
+        ORDER BY start_time
+    ''')
+}
+
 @analytics_bp.route('/export', methods=['GET'])
 @require_auth
 def export_data(user_id):
@@ -162,58 +180,35 @@ def export_data(user_id):
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    # Get data based on export type
-    if export_type == 'productivity':
-        data = db.execute('''
-            SELECT date, score, factors
-            FROM productivity_scores
-            WHERE user_id = %s AND date BETWEEN %s AND %s
-            ORDER BY date
-        ''', (user_id, start_date, end_date)).fetchall()
-    elif export_type == 'time':
-        data = db.execute('''
-            SELECT activity_type, category, start_time, end_time, duration, notes, tags
-            FROM time_entries
-            WHERE user_id = %s AND start_time::date BETWEEN %s AND %s
-            ORDER BY start_time
-        ''', (user_id, start_date, end_date)).fetchall()
-    else:
+    if export_type not in EXPORT_QUERIES:
         return jsonify({'error': 'Invalid export type'}), 400
+    columns, query = EXPORT_QUERIES[export_type]
+    params = (user_id, start_date, end_date)
     
-    # Convert to DataFrame for easy export
-    df = pd.DataFrame(data)
-    
-    # Export in requested format
-    if format == 'csv':
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'{export_type}_export_{start_date}_to_{end_date}.csv'
-        )
-    elif format == 'json':
-        return jsonify(data)
-    else:
+    if format == 'json':
+        data = db.execute(query, params).fetchall()
+        return jsonify([dict(row) for row in data])
+    if format not in STREAM_FORMATS:
         return jsonify({'error': 'Invalid export format'}), 400
+    
+    # Stream rows from a server-side cursor so memory stays flat for any export size
+    mimetype, extension = STREAM_FORMATS[format]
+    batches = db.stream(query, params,
+                        batch_size=current_app.config.get('EXPORT_STREAM_BATCH_SIZE', 2000))
+    return Response(
+        stream_with_context(iter_export(format, columns, batches)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={export_type}_export_{start_date}_to_{end_date}.{extension}'
+        }
+    )
 
 def calculate_productivity_factors(db, user_id, date):
     """Calculate productivity factors based on various metrics"""
-    # Get completed tasks
-    completed_tasks = db.execute('''
-        SELECT COUNT(*) FROM user_challenges
-        WHERE user_id = %s AND status = 'completed'
-        AND created_at::date = %s
-    ''', (user_id, date)).fetchone()['count']
-    
-    # Get time tracked
-    time_tracked = db.execute('''
-        SELECT SUM(EXTRACT(EPOCH FROM duration)/3600) as hours
-        FROM time_entries
-        WHERE user_id = %s AND start_time::date = %s
-    ''', (user_id, date)).fetchone()['hours'] or 0
+    # Completed tasks and time tracked come from the daily rollup
+    rollup = fetch_daily_rollups(db, user_id, date, date)[0]
+    completed_tasks = rollup['challenges_completed']
+    time_tracked = rollup['time_minutes'] / 60
     
     # Get habit completions
     habits_completed = db.execute('''
@@ -1,10 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
+import json
+import uuid
 from ..db import get_db
 from ..auth import require_auth
+from ..events import publish_event
+from ..pagination import decode_time_cursor, encode_cursor, page_size
 
 enhanced_social_bp = Blueprint('enhanced_social', __name__)
 
+MAX_COUNTER_IDS = 100
+
 # Friend/Connection System
 @enhanced_social_bp.route('/friends', methods=['GET'])
 @require_auth
@@ -50,6 +56,8 @@ def respond_friend_request(user_id):
         SET status = %s, updated_at = NOW()
         WHERE friend_id = %s AND user_id = %s AND status = 'pending'
     ''', (data['status'], user_id, data['friend_id']))
+    if data['status'] == 'accepted':
+        backfill_friend_feeds(db, user_id, data['friend_id'])
     db.commit()
     return jsonify({'message': 'Friend request updated successfully'})
 
@@ -82,11 +90,13 @@ def send_message(user_id):
     db = get_db()
     data = request.json
     
-    db.execute('''
+    message = db.execute('''
         INSERT INTO direct_messages (sender_id, receiver_id, content)
         VALUES (%s, %s, %s)
-    ''', (user_id, data['receiver_id'], data['content']))
+        RETURNING *
+    ''', (user_id, data['receiver_id'], data['content'])).fetchone()
     db.commit()
+    publish_event(data['receiver_id'], 'message', dict(message))
     return jsonify({'message': 'Message sent successfully'})
 
 # Group Challenges
@@ -152,26 +162,17 @@ def group_challenges(user_id, group_id):
 @require_auth
 def get_social_feed(user_id):
     db = get_db()
-    feed = db.execute('''
-        SELECT sa.*, up.username, up.avatar_url,
-               (SELECT COUNT(*) FROM activity_reactions ar WHERE ar.activity_id = sa.id) as reaction_count,
-               (SELECT COUNT(*) FROM activity_comments ac WHERE ac.activity_id = sa.id) as comment_count,
-               EXISTS(SELECT 1 FROM activity_reactions ar 
-                     WHERE ar.activity_id = sa.id AND ar.user_id = %s) as has_reacted
-        FROM social_activities sa
-        JOIN user_profiles up ON sa.user_id = up.user_id
-        WHERE sa.visibility = 'public'
-        OR (sa.visibility = 'friends' AND EXISTS (
-            SELECT 1 FROM friend_connections fc
-            WHERE (fc.user_id = sa.user_id AND fc.friend_id = %s
-                   OR fc.user_id = %s AND fc.friend_id = sa.user_id)
-            AND fc.status = 'accepted'
-        ))
-        OR sa.user_id = %s
-        ORDER BY sa.created_at DESC
-        LIMIT 50
-    ''', (user_id, user_id, user_id, user_id)).fetchall()
-    return jsonify(feed)
+    limit = page_size(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    try:
+        before = decode_time_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    feed = read_feed(db, user_id, limit, before,
+                     current_app.config['FEED_FANOUT_MAX_FOLLOWERS'])
+    next_cursor = encode_cursor(feed[-1]['created_at'], feed[-1]['id']) if len(feed) == limit else None
+    return jsonify({'items': feed, 'next_cursor': next_cursor})
 
 @enhanced_social_bp.route('/activities', methods=['POST'])
 @require_auth
@@ -179,12 +180,15 @@ def create_activity(user_id):
     db = get_db()
     data = request.json
     
-    db.execute('''
+    activity_id = db.execute('''
         INSERT INTO social_activities (user_id, activity_type, content, visibility)
         VALUES (%s, %s, %s, %s)
-    ''', (user_id, data['activity_type'], data['content'], data.get('visibility', 'friends')))
+        RETURNING id
+    ''', (user_id, data['activity_type'], data['content'], data.get('visibility', 'friends'))).fetchone()['id']
+    db.execute('SELECT fan_out_activity(%s, %s)',
+               (activity_id, current_app.config['FEED_FANOUT_MAX_FOLLOWERS']))
     db.commit()
-    return jsonify({'message': 'Activity posted successfully'})
+    return jsonify({'message': 'Activity posted successfully', 'activity_id': activity_id})
 
 @enhanced_social_bp.route('/activities/<activity_id>/react', methods=['POST'])
 @require_auth
@@ -192,12 +196,35 @@ def react_to_activity(user_id, activity_id):
     db = get_db()
     data = request.json
     
+    # Lock the activity so concurrent reactions update its counters in turn
+    activity = db.execute('''
+        SELECT reaction_counts FROM social_activities
+        WHERE id = %s
+        FOR UPDATE
+    ''', (activity_id,)).fetchone()
+    if not activity:
+        db.rollback()
+        return jsonify({'error': 'Activity not found'}), 404
+
+    previous = db.execute('''
+        SELECT reaction_type FROM activity_reactions
+        WHERE activity_id = %s AND user_id = %s
+    ''', (activity_id, user_id)).fetchone()
+    previous_type = previous['reaction_type'] if previous else None
+
     db.execute('''
         INSERT INTO activity_reactions (activity_id, user_id, reaction_type)
         VALUES (%s, %s, %s)
         ON CONFLICT (activity_id, user_id) DO UPDATE
         SET reaction_type = EXCLUDED.reaction_type
     ''', (activity_id, user_id, data['reaction_type']))
+
+    reaction_counts = apply_reaction_change(activity['reaction_counts'], previous_type, data['reaction_type'])
+    db.execute('''
+        UPDATE social_activities
+        SET reaction_count = %s, reaction_counts = %s
+        WHERE id = %s
+    ''', (sum(reaction_counts.values()), json.dumps(reaction_counts), activity_id))
     db.commit()
     return jsonify({'message': 'Reaction added successfully'})
 
@@ -211,5 +238,142 @@ def comment_on_activity(user_id, activity_id):
         INSERT INTO activity_comments (activity_id, user_id, content)
         VALUES (%s, %s, %s)
     ''', (activity_id, user_id, data['content']))
+    db.execute('''
+        UPDATE social_activities SET comment_count = comment_count + 1
+        WHERE id = %s
+    ''', (activity_id,))
     db.commit()
-    return jsonify({'message': 'Comment added successfully'}) 
\ No newline at end of file
+    return jsonify({'message': 'Comment added successfully'})
+
+@enhanced_social_bp.route('/activities/counters', methods=['GET'])
+@require_auth
+def get_activity_counters(user_id):
+    """Reaction/comment counters and the viewer's reaction for up to 100 activities.
+
+    Activities the viewer can't see in their feed are left out.
+    """
+    activity_ids = [activity_id for activity_id in request.args.get('ids', '').split(',') if activity_id]
+    if not activity_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    if len(activity_ids) > MAX_COUNTER_IDS:
+        return jsonify({'error': f"At most {MAX_COUNTER_IDS} ids per request"}), 400
+    try:
+        activity_ids = [str(uuid.UUID(activity_id)) for activity_id in activity_ids]
+    except ValueError:
+        return jsonify({'error': 'ids must be activity ids'}), 400
+
+    db = get_db()
+    # Same visibility as the feed: own, public and friends' friends-only posts
+    rows = db.execute('''
+        SELECT sa.id, sa.reaction_count, sa.reaction_counts, sa.comment_count,
+               ar.reaction_type AS viewer_reaction
+        FROM social_activities sa
+        LEFT JOIN activity_reactions ar ON ar.activity_id = sa.id AND ar.user_id = %(viewer)s
+        WHERE sa.id = ANY(%(ids)s::uuid[])
+        AND (sa.user_id = %(viewer)s OR sa.visibility = 'public' OR (
+            sa.visibility = 'friends' AND EXISTS (
+                SELECT 1 FROM friend_connections fc
+                WHERE fc.status = 'accepted'
+                AND ((fc.user_id = %(viewer)s AND fc.friend_id = sa.user_id)
+                     OR (fc.friend_id = %(viewer)s AND fc.user_id = sa.user_id))
+            )
+        ))
+    ''', {'viewer': user_id, 'ids': activity_ids}).fetchall()
+
+    return jsonify({
+        str(row['id']): {
+            'reaction_count': row['reaction_count'],
+            'reaction_counts': row['reaction_counts'],
+            'comment_count': row['comment_count'],
+            'viewer_reaction': row['viewer_reaction']
+        }
+        for row in rows
+    })
+
+# Helper Functions
+def read_feed(db, user_id, limit, before, max_followers):
+    """One page of the user's feed, newest first.
+
+    Merges three index range scans, each cut at the cursor and limited to a
+    page: the user's materialized timeline, public posts, and friends-only
+    posts of friends too popular to fan out, or who were when they posted
+    (``feed_fan_in``). Counters are read from social_activities rather
+    than counted per row.
+    """
+    params = {'viewer': user_id, 'limit': limit, 'max_followers': max_followers}
+    timeline_before = activity_before = ''
+    if before:
+        params['before_time'], params['before_id'] = before
+        timeline_before = 'AND (created_at, activity_id) < (%(before_time)s, %(before_id)s::uuid)'
+        activity_before = 'AND (created_at, id) < (%(before_time)s, %(before_id)s::uuid)'
+
+    return db.execute(f'''
+        WITH fan_in AS (
+            SELECT up.user_id
+            FROM friend_connections fc
+            JOIN user_profiles up ON up.user_id = CASE
+                WHEN fc.user_id = %(viewer)s THEN fc.friend_id ELSE fc.user_id END
+            WHERE (fc.user_id = %(viewer)s OR fc.friend_id = %(viewer)s)
+            AND fc.status = 'accepted'
+            AND (up.friend_count > %(max_followers)s OR up.feed_fan_in)
+        ), page AS (
+            (SELECT activity_id AS id, created_at FROM feed_items
+             WHERE user_id = %(viewer)s {timeline_before}
+             ORDER BY created_at DESC, activity_id DESC
+             LIMIT %(limit)s)
+            UNION
+            (SELECT id, created_at FROM social_activities
+             WHERE visibility = 'public' {activity_before}
+             ORDER BY created_at DESC, id DESC
+             LIMIT %(limit)s)
+            UNION
+            (SELECT posts.id, posts.created_at
+             FROM fan_in
+             CROSS JOIN LATERAL (
+                 SELECT id, created_at FROM social_activities
+                 WHERE user_id = fan_in.user_id AND visibility = 'friends' {activity_before}
+                 ORDER BY created_at DESC, id DESC
+                 LIMIT %(limit)s
+             ) posts)
+        )
+        SELECT sa.*, up.username, up.avatar_url,
+               ar.reaction_type as viewer_reaction,
+               ar.activity_id IS NOT NULL as has_reacted
+        FROM page
+        JOIN social_activities sa ON sa.id = page.id
+        JOIN user_profiles up ON sa.user_id = up.user_id
+        LEFT JOIN activity_reactions ar ON ar.activity_id = sa.id AND ar.user_id = %(viewer)s
+        ORDER BY page.created_at DESC, page.id DESC
+        LIMIT %(limit)s
+    ''', params).fetchall()
+
+def apply_reaction_change(reaction_counts, previous_type, reaction_type):
+    """Per-type reaction counts after a user reacts with ``reaction_type``.
+
+    A first reaction adds one; switching type moves the user's reaction
+    from the old type to the new one, so the total stays the same.
+    """
+    counts = dict(reaction_counts or {})
+    if previous_type == reaction_type:
+        return counts
+    if previous_type is not None:
+        counts[previous_type] = counts.get(previous_type, 0) - 1
+        if counts[previous_type] <= 0:
+            del counts[previous_type]
+    counts[reaction_type] = counts.get(reaction_type, 0) + 1
+    return counts
+
+def backfill_friend_feeds(db, user_id, friend_id, per_friend=50):
+    """Copy each new friend's recent friends-only posts into the other's timeline"""
+    db.execute('''
+        INSERT INTO feed_items (user_id, activity_id, author_id, created_at)
+        SELECT reader.user_id, posts.id, posts.user_id, posts.created_at
+        FROM (VALUES (%s::uuid, %s::uuid), (%s::uuid, %s::uuid)) AS reader(user_id, author_id)
+        CROSS JOIN LATERAL (
+            SELECT id, user_id, created_at FROM social_activities
+            WHERE user_id = reader.author_id AND visibility = 'friends'
+            ORDER BY created_at DESC
+            LIMIT %s
+        ) posts
+        ON CONFLICT DO NOTHING
+    ''', (user_id, friend_id, friend_id, user_id, per_friend))
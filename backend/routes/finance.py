@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from backend.config import get_supabase_client
+from backend.cache import cached, invalidates
 
 finance_bp = Blueprint('finance', __name__)
 
@@ -64,6 +65,7 @@ def get_transactions():
         }), 500
 
 @finance_bp.route('/transactions', methods=['POST'])
+@invalidates('finance')
 def add_transaction():
     """Add a new financial transaction."""
     data = request.get_json()
@@ -85,6 +87,7 @@ def add_transaction():
         return jsonify({'error': str(e)}), 500
 
 @finance_bp.route('/summary', methods=['GET'])
+@cached(120, tags=('finance',))
 def get_summary():
     """Get financial summary for the specified period."""
     user_id = request.args.get('user_id')
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import uuid
 from ..config import supabase_client
+from ..cache import invalidates
+from ..leaderboard import record_points
 
 focus_bp = Blueprint('focus', __name__)
 
@@ -30,6 +32,7 @@ def get_sessions():
         return jsonify({'error': 'Failed to get focus sessions'}), 500
 
 @focus_bp.route('/focus/sessions', methods=['POST'])
+@invalidates('focus')
 def start_session():
     data = request.get_json()
     user_id = data.get('user_id')
@@ -54,6 +57,7 @@ def start_session():
         return jsonify({'error': 'Failed to start focus session'}), 500
 
 @focus_bp.route('/focus/sessions/<session_id>/complete', methods=['POST'])
+@invalidates('focus', 'points')
 def complete_session():
     session_id = request.view_args['session_id']
     data = request.get_json()
@@ -91,11 +95,13 @@ def complete_session():
             'id': str(uuid.uuid4()),
             'user_id': user_id,
             'points': points,
+            'category': 'focus',
             'source': 'focus_completed',
             'source_id': session_id,
             'created_at': datetime.now().isoformat()
         }
         supabase_client.table('points_history').insert(points_data).execute()
+        record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({
             'data': {
@@ -108,6 +114,7 @@ def complete_session():
         return jsonify({'error': 'Failed to complete focus session'}), 500
 
 @focus_bp.route('/focus/sessions/<session_id>', methods=['DELETE'])
+@invalidates('focus')
 def delete_session():
     session_id = request.view_args['session_id']
     user_id = request.args.get('user_id')
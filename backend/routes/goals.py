@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from backend.config import get_supabase_client
+from backend.cache import invalidates
+from backend.leaderboard import record_points
 
 goals_bp = Blueprint('goals', __name__)
 
@@ -56,6 +58,7 @@ def get_goals():
         }), 500
 
 @goals_bp.route('/', methods=['POST'])
+@invalidates('goals')
 def create_goal():
     """Create a new goal."""
     data = request.get_json()
@@ -81,6 +84,7 @@ def create_goal():
         return jsonify({'error': str(e)}), 500
 
 @goals_bp.route('/<goal_id>', methods=['PUT'])
+@invalidates('goals', 'points')
 def update_goal(goal_id):
     """Update a goal's status or progress."""
     data = request.get_json()
@@ -110,9 +114,12 @@ def update_goal(goal_id):
                 'user_id': user_id,
                 'points': 50,  # Base points for completing a goal
                 'reason': f'Completed goal: {response.data[0]["title"]}',
-                'category': 'goal_completion'
+                'category': 'goals',
+                'source': 'goal_completed',
+                'source_id': goal_id
             }
             supabase.table('points_log').insert(points_data).execute()
+            record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({
             'success': True,
@@ -122,6 +129,7 @@ def update_goal(goal_id):
         return jsonify({'error': str(e)}), 500
 
 @goals_bp.route('/<goal_id>', methods=['DELETE'])
+@invalidates('goals')
 def delete_goal(goal_id):
     """Delete a goal."""
     user_id = request.args.get('user_id')
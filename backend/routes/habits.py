@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
 from ..config import supabase_client
+from ..streaks import live_streak, record_completion, rebuild_habit_index
+from ..habit_history import load_habits_with_history
+from ..cache import invalidates
+from ..leaderboard import record_points
 
 habits_bp = Blueprint('habits', __name__)
 
@@ -12,49 +16,9 @@ def get_habits():
         return jsonify({'error': 'User ID is required'}), 400
         
     try:
-        # Get user's habits
-        response = supabase_client.table('habits').select('*').eq('user_id', user_id).execute()
-        habits = response.data
-        
-        # Get completion history for the last 7 days
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=6)
-        
-        for habit in habits:
-            # Get completion history
-            history_response = supabase_client.table('habit_completions') \
-                .select('*') \
-                .eq('habit_id', habit['id']) \
-                .gte('completion_date', start_date.isoformat()) \
-                .lte('completion_date', end_date.isoformat()) \
-                .execute()
-            
-            completions = history_response.data
-            completion_dates = {c['completion_date'] for c in completions}
-            
-            # Build 7-day history
-            history = []
-            current_date = start_date
-            while current_date <= end_date:
-                history.append({
-                    'date': current_date.isoformat(),
-                    'completed': current_date.isoformat() in completion_dates
-                })
-                current_date += timedelta(days=1)
-            
-            habit['history'] = history
-            habit['completed_today'] = end_date.isoformat() in completion_dates
-            
-            # Calculate current streak
-            streak = 0
-            current_streak_date = end_date
-            while True:
-                if current_streak_date.isoformat() in completion_dates:
-                    streak += 1
-                    current_streak_date -= timedelta(days=1)
-                else:
-                    break
-            habit['current_streak'] = streak
+        # Habits plus one bulk completion query for the 7-day history
+        habits = load_habits_with_history(supabase_client, user_id,
+                                          datetime.now().date())
         
         return jsonify({'data': habits})
     except Exception as e:
@@ -62,6 +26,7 @@ def get_habits():
         return jsonify({'error': 'Failed to get habits'}), 500
 
 @habits_bp.route('/habits', methods=['POST'])
+@invalidates('habits', 'points')
 def create_habit():
     data = request.get_json()
     required_fields = ['user_id', 'title', 'category', 'frequency']
@@ -90,11 +55,13 @@ def create_habit():
             'id': str(uuid.uuid4()),
             'user_id': data['user_id'],
             'points': 10,
+            'category': 'habits',
             'source': 'habit_created',
             'source_id': habit_data['id'],
             'created_at': datetime.now().isoformat()
         }
         supabase_client.table('points_history').insert(points_data).execute()
+        record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({'data': response.data[0]})
     except Exception as e:
@@ -102,6 +69,7 @@ def create_habit():
         return jsonify({'error': 'Failed to create habit'}), 500
 
 @habits_bp.route('/habits/<habit_id>/complete', methods=['POST'])
+@invalidates('habits', 'points')
 def complete_habit():
     data = request.get_json()
     habit_id = request.view_args['habit_id']
@@ -144,22 +112,8 @@ def complete_habit():
         }
         supabase_client.table('habit_completions').insert(completion_data).execute()
         
-        # Calculate streak
-        streak = 1
-        current_date = today - timedelta(days=1)
-        
-        while True:
-            streak_check = supabase_client.table('habit_completions') \
-                .select('*') \
-                .eq('habit_id', habit_id) \
-                .eq('completion_date', current_date.isoformat()) \
-                .execute()
-            
-            if not streak_check.data:
-                break
-                
-            streak += 1
-            current_date -= timedelta(days=1)
+        # Advance the streak index
+        streak = record_completion(supabase_client, habit, today)['current_streak']
         
         # Award points
         base_points = 5
@@ -170,11 +124,13 @@ def complete_habit():
             'id': str(uuid.uuid4()),
             'user_id': user_id,
             'points': total_points,
+            'category': 'habits',
             'source': 'habit_completed',
             'source_id': habit_id,
             'created_at': datetime.now().isoformat()
         }
         supabase_client.table('points_history').insert(points_data).execute()
+        record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({
             'data': {
@@ -186,7 +142,47 @@ def complete_habit():
         print(f"Error completing habit: {str(e)}")
         return jsonify({'error': 'Failed to complete habit'}), 500
 
+@habits_bp.route('/habits/<habit_id>/complete', methods=['DELETE'])
+@invalidates('habits', 'points')
+def uncomplete_habit(habit_id):
+    user_id = request.args.get('user_id')
+    
+    if not user_id:
+        return jsonify({'error': 'User ID is required'}), 400
+    
+    try:
+        # Check if habit exists and belongs to user
+        habit_response = supabase_client.table('habits') \
+            .select('id') \
+            .eq('id', habit_id) \
+            .eq('user_id', user_id) \
+            .execute()
+        
+        if not habit_response.data:
+            return jsonify({'error': 'Habit not found or unauthorized'}), 404
+        
+        completion_date = request.args.get('date', datetime.now().date().isoformat())
+        supabase_client.table('habit_completions') \
+            .delete() \
+            .eq('habit_id', habit_id) \
+            .eq('completion_date', completion_date) \
+            .execute()
+        
+        # Removing a day can split a run, so rebuild this habit's index
+        index = rebuild_habit_index(supabase_client, habit_id)
+        
+        return jsonify({
+            'data': {
+                'streak': live_streak(index),
+                'longest_streak': index['longest_streak']
+            }
+        })
+    except Exception as e:
+        print(f"Error removing habit completion: {str(e)}")
+        return jsonify({'error': 'Failed to remove habit completion'}), 500
+
 @habits_bp.route('/habits/<habit_id>', methods=['DELETE'])
+@invalidates('habits')
 def delete_habit():
     habit_id = request.view_args['habit_id']
     user_id = request.args.get('user_id')
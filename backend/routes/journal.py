@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from ..config import supabase_client
 import uuid
+from ..cache import invalidates
+from ..leaderboard import record_points
 
 journal_bp = Blueprint('journal', __name__)
 
@@ -45,6 +47,7 @@ def get_entries():
         return jsonify({'error': 'Failed to get journal entries'}), 500
 
 @journal_bp.route('/entries', methods=['POST'])
+@invalidates('points')
 def create_entry():
     data = request.get_json()
     user_id = data.get('user_id')
@@ -89,9 +92,13 @@ def create_entry():
             'user_id': user_id,
             'points': 10,
             'reason': f'Completed {data["prompt_type"]} journal entry',
+            'category': 'journal',
+            'source': 'journal_entry',
+            'source_id': entry_data['id'],
             'created_at': datetime.utcnow().isoformat()
         }
         supabase_client.table('points_history').insert(points_data).execute()
+        record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({'data': response.data[0]}), 201
     except Exception as e:
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from ..config import supabase_client
 import uuid
+from ..cache import cached, invalidates
+from ..leaderboard import record_points
 
 mood_bp = Blueprint('mood', __name__)
 
@@ -38,6 +40,7 @@ def get_moods():
         return jsonify({'error': 'Failed to get mood entries'}), 500
 
 @mood_bp.route('/entries', methods=['POST'])
+@invalidates('mood', 'points')
 def log_mood():
     data = request.get_json()
     user_id = data.get('user_id')
@@ -72,9 +75,13 @@ def log_mood():
             'user_id': user_id,
             'points': 5,
             'reason': 'Logged mood entry',
+            'category': 'mood',
+            'source': 'mood_logged',
+            'source_id': mood_data['id'],
             'created_at': datetime.utcnow().isoformat()
         }
         supabase_client.table('points_history').insert(points_data).execute()
+        record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({'data': response.data[0]}), 201
     except Exception as e:
@@ -82,6 +89,7 @@ def log_mood():
         return jsonify({'error': 'Failed to log mood'}), 500
 
 @mood_bp.route('/entries/<entry_id>', methods=['DELETE'])
+@invalidates('mood')
 def delete_mood(entry_id):
     user_id = request.args.get('user_id')
     if not user_id:
@@ -109,6 +117,7 @@ def delete_mood(entry_id):
         return jsonify({'error': 'Failed to delete mood entry'}), 500
 
 @mood_bp.route('/analytics', methods=['GET'])
+@cached(120, tags=('mood',))
 def get_analytics():
     user_id = request.args.get('user_id')
     if not user_id:
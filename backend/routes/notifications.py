@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime
 from ..db import get_db
 from ..auth import require_auth
+from ..events import publish_event
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -57,8 +58,12 @@ def notification_settings(user_id):
 
 def create_notification(db, user_id, title, message, type, scheduled_for=None):
     """Helper function to create a new notification"""
-    db.execute('''
+    notification = db.execute('''
         INSERT INTO user_notifications (user_id, title, message, type, status, scheduled_for)
         VALUES (%s, %s, %s, %s, 'unread', %s)
-    ''', (user_id, title, message, type, scheduled_for))
-    db.commit() 
\ No newline at end of file
+        RETURNING *
+    ''', (user_id, title, message, type, scheduled_for)).fetchone()
+    db.commit()
+    if scheduled_for is None:
+        publish_event(user_id, 'notification', dict(notification))
+    return notification
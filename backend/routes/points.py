@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from backend.config import get_supabase_client
+from backend.points_ledger import fetch_points_balance
+from backend.cache import invalidates
+from backend.leaderboard import record_points
 
 points_bp = Blueprint('points', __name__)
 
@@ -8,13 +11,8 @@ points_bp = Blueprint('points', __name__)
 def get_total_points(user_id):
     try:
         supabase = get_supabase_client()
-        result = supabase.table('points_log')\
-            .select('points')\
-            .eq('user_id', user_id)\
-            .execute()
-        
-        total_points = sum(record['points'] for record in result.data)
-        return jsonify({"total_points": total_points}), 200
+        balance = fetch_points_balance(supabase, user_id)
+        return jsonify({"total_points": balance['balance']}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -37,6 +35,7 @@ def get_points_history(user_id):
         return jsonify({"error": str(e)}), 400
 
 @points_bp.route('/award', methods=['POST'])
+@invalidates('points')
 def award_points():
     try:
         data = request.get_json()
@@ -49,8 +48,12 @@ def award_points():
             'user_id': user_id,
             'points': points,
             'reason': reason,
+            'category': data.get('category'),
+            'source': data.get('source'),
+            'source_id': data.get('source_id'),
             'created_at': datetime.now().isoformat()
         }).execute()
+        record_points(user_id, points)
         
         return jsonify({"message": "Points awarded successfully", "data": result.data}), 201
     except Exception as e:
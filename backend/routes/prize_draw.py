@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timezone
 from ..config import get_supabase_client
-import random
+from ..cache import invalidate_tags, invalidates
+from ..leaderboard import record_points
+from ..draws import (draw_audit, iter_entries, new_seed, refund_draw, select_winners,
+                     tickets_by_user, verify_draw)
 
 prize_draw_bp = Blueprint('prize_draw', __name__)
 
@@ -46,6 +49,7 @@ def get_draw_entries(draw_id):
         return jsonify({'error': str(e)}), 500
 
 @prize_draw_bp.route('/draws/<draw_id>/enter', methods=['POST'])
+@invalidates('points')
 def enter_draw(draw_id):
     """Enter a prize draw."""
     data = request.get_json()
@@ -98,7 +102,9 @@ def enter_draw(draw_id):
             'user_id': user_id,
             'points': -points_needed,
             'reason': f'Entered prize draw: {draw["title"]} ({tickets} tickets)',
-            'category': 'prize_draw_entry'
+            'category': 'prize_draw',
+            'source': 'prize_draw_entry',
+            'source_id': draw_id
         }
         supabase.table('points_log').insert(points_log_data).execute()
         
@@ -111,58 +117,115 @@ def enter_draw(draw_id):
 
 @prize_draw_bp.route('/draws/<draw_id>/draw-winner', methods=['POST'])
 def draw_winner(draw_id):
-    """Draw a winner for a completed prize draw."""
+    """Draw one or more winners for a completed prize draw.
+
+    Optional JSON body: ``winners`` (default 1). The seed is generated here
+    and stored with an entries digest; replay a draw with ``/verify``.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        winner_count = int(data.get('winners', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'winners must be a number'}), 400
+    if winner_count < 1:
+        return jsonify({'error': 'winners must be at least 1'}), 400
+    if 'seed' in data:
+        return jsonify({'error': 'seed is chosen by the server; use /verify to replay a draw'}), 400
+
     try:
         supabase = get_supabase_client()
         
-        # Get all entries for the draw
-        entries_response = supabase.table('prize_draw_entries')\
-            .select('*')\
-            .eq('draw_id', draw_id)\
-            .execute()
-        
-        entries = entries_response.data
-        if not entries:
+        draw = supabase.table('prize_draws')\
+            .select('status')\
+            .eq('id', draw_id)\
+            .single()\
+            .execute()\
+            .data
+        if not draw:
+            return jsonify({'error': 'Draw not found'}), 404
+        if draw['status'] != 'active':
+            return jsonify({'error': f"Draw is already {draw['status']}"}), 400
+
+        # One weight per entrant, read page by page
+        weighted_users = tickets_by_user(iter_entries(supabase, draw_id))
+        if not weighted_users:
             return jsonify({'error': 'No entries found for this draw'}), 400
         
-        # Create weighted list based on number of tickets
-        weighted_entries = []
-        for entry in entries:
-            weighted_entries.extend([entry['user_id']] * entry['tickets'])
-        
-        # Randomly select winner
-        winner_id = random.choice(weighted_entries)
+        seed = new_seed()
+        winner_ids = select_winners(weighted_users, winner_count, seed)
+        audit = draw_audit(weighted_users, seed, winner_ids)
         
-        # Update draw with winner
+        # Update draw with winners
         update_data = {
             'status': 'completed',
-            'winner_id': winner_id
+            'winner_id': winner_ids[0],
+            'winner_ids': winner_ids,
+            'draw_seed': seed,
+            'draw_audit': audit
         }
         
+        # Only an active draw can complete; a concurrent draw or cancellation wins otherwise
         response = supabase.table('prize_draws')\
             .update(update_data)\
             .eq('id', draw_id)\
+            .eq('status', 'active')\
             .execute()
+        if not response.data:
+            return jsonify({'error': 'Draw is no longer active'}), 409
         
         return jsonify({
             'success': True,
             'data': {
                 'draw': response.data[0],
-                'winner_id': winner_id
+                'winner_id': winner_ids[0],
+                'winner_ids': winner_ids,
+                'audit': audit
             }
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@prize_draw_bp.route('/draws/<draw_id>/verify', methods=['GET'])
+def verify_draw_result(draw_id):
+    """Replay a completed draw from its stored seed and check it.
+
+    An optional ``seed`` query argument is checked against the recorded one.
+    """
+    try:
+        supabase = get_supabase_client()
+
+        draw = supabase.table('prize_draws')\
+            .select('status, draw_audit')\
+            .eq('id', draw_id)\
+            .single()\
+            .execute()\
+            .data
+        if not draw:
+            return jsonify({'error': 'Draw not found'}), 404
+        if draw['status'] != 'completed' or not draw.get('draw_audit'):
+            return jsonify({'error': 'Draw has not been drawn'}), 400
+
+        weighted_users = tickets_by_user(iter_entries(supabase, draw_id))
+        return jsonify({
+            'success': True,
+            'data': verify_draw(weighted_users, draw['draw_audit'], request.args.get('seed'))
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @prize_draw_bp.route('/draws/<draw_id>/cancel', methods=['POST'])
 def cancel_draw(draw_id):
-    """Cancel a prize draw and refund points to participants."""
+    """Cancel a prize draw and refund points to participants.
+
+    Safe to retry: an interrupted cancellation resumes where it stopped and
+    entrants that were already refunded are skipped.
+    """
     try:
         supabase = get_supabase_client()
         
         # Get draw details
         draw_response = supabase.table('prize_draws')\
-            .select('*')\
+            .select('status')\
             .eq('id', draw_id)\
             .single()\
             .execute()
@@ -170,34 +233,45 @@ def cancel_draw(draw_id):
         draw = draw_response.data
         if not draw:
             return jsonify({'error': 'Draw not found'}), 404
+        if draw['status'] == 'completed':
+            return jsonify({'error': 'Draw is already completed'}), 400
         
-        # Get all entries
-        entries_response = supabase.table('prize_draw_entries')\
+        # Refund points to participants in chunked transactions. Entering
+        # never took points off the leaderboards, so refunds don't go on them
+        result = refund_draw(supabase, draw_id, current_app.config['DRAW_REFUND_CHUNK_SIZE'])
+        for user_id, _ in result['refunds']:
+            invalidate_tags(('points',), user_id)
+        
+        response = supabase.table('prize_draws')\
             .select('*')\
-            .eq('draw_id', draw_id)\
+            .eq('id', draw_id)\
             .execute()
         
-        # Refund points to participants
-        for entry in entries_response.data:
-            points_refund = entry['tickets'] * draw['points_required']
-            refund_data = {
-                'user_id': entry['user_id'],
-                'points': points_refund,
-                'reason': f'Refund for cancelled draw: {draw["title"]}',
-                'category': 'prize_draw_refund'
+        return jsonify({
+            'success': True,
+            'data': response.data[0],
+            'refunds': {
+                'users': len(result['refunds']),
+                'points': sum(points for _, points in result['refunds'])
             }
-            supabase.table('points_log').insert(refund_data).execute()
-        
-        # Update draw status
-        update_data = {
-            'status': 'cancelled'
-        }
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@prize_draw_bp.route('/draws/<draw_id>/refunds', methods=['GET'])
+def get_refund_progress(draw_id):
+    """Progress of a draw's cancellation refunds."""
+    try:
+        supabase = get_supabase_client()
         
         response = supabase.table('prize_draws')\
-            .update(update_data)\
+            .select('status, refund_progress')\
             .eq('id', draw_id)\
             .execute()
         
+        if not response.data:
+            return jsonify({'error': 'Draw not found'}), 404
+        
         return jsonify({
             'success': True,
             'data': response.data[0]
@@ -206,6 +280,7 @@ def cancel_draw(draw_id):
         return jsonify({'error': str(e)}), 500
 
 @prize_draw_bp.route('/entry', methods=['POST'])
+@invalidates('points')
 def create_entry():
     try:
         data = request.get_json()
@@ -238,9 +313,12 @@ def create_entry():
             'user_id': user_id,
             'points': 50,  # Award 50 points for completing all tasks in a time period
             'reason': f'Completed all tasks - {time_period}',
+            'category': 'tasks',
+            'source': 'time_period_completed',
             'created_at': datetime.now().isoformat()
         }
         supabase.table('points_history').insert(points_data).execute()
+        record_points(points_data['user_id'], points_data['points'])
         
         return jsonify({
             'message': 'Prize draw entry created successfully',
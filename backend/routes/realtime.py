@@ -0,0 +1,42 @@
+from flask import Blueprint, request, Response, stream_with_context, current_app
+from ..auth import require_auth
+from ..events import HEARTBEAT, format_sse, get_event_broker
+
+realtime_bp = Blueprint('realtime', __name__)
+
+@realtime_bp.route('/events/stream', methods=['GET'])
+@require_auth
+def stream_events(user_id):
+    """Server-sent events for the user's metrics, notifications and messages.
+
+    Clients reconnect with the ``Last-Event-ID`` header (or ``last_event_id``
+    query argument) to receive the events they missed. ``types`` optionally
+    limits the stream to a comma-separated list of event types.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    types = set(filter(None, request.args.get('types', '').split(','))) or None
+
+    broker = get_event_broker(current_app.config)
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+    subscription = broker.subscribe(user_id, last_event_id)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            for event in subscription.events(heartbeat):
+                if event is None:
+                    yield HEARTBEAT
+                elif types is None or event['type'] in types:
+                    yield format_sse(event)
+        finally:
+            subscription.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -1,15 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, send_file
 from datetime import datetime, timedelta
 import json
 import croniter
 import pytz
 from backend.db import get_db
 from backend.auth import require_auth
+from backend.jobs import task, enqueue
+from backend.artifacts import (artifact_path, artifact_exists, save_artifact,
+                               cache_key, get_artifact_cache)
+from backend.charts import chart_specs, render_chart, render_charts, get_chart_executor
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
 from io import BytesIO
-import base64
 import os
 import smtplib
 from email.mime.text import MIMEText
@@ -232,89 +236,95 @@ def manage_scheduled_report(user_id, schedule_id):
 @reporting_bp.route('/generate', methods=['POST'])
 @require_auth
 def generate_report(user_id):
+    """Queue a report for the background workers and return immediately"""
     db = get_db()
     data = request.json
     
-    try:
-        # Start execution record
-        execution_id = db.execute('''
-            INSERT INTO report_executions (
-                template_id, user_id, parameters,
-                status
-            )
-            VALUES (%s, %s, %s, 'running')
-            RETURNING id
-        ''', (data['template_id'], user_id,
-              json.dumps(data.get('parameters', {})))).fetchone()['id']
-        
-        start_time = datetime.now()
-        
-        # Get template
-        template = db.execute('''
-            SELECT * FROM report_templates
-            WHERE id = %s AND (user_id = %s OR is_public = true)
-        ''', (data['template_id'], user_id)).fetchone()
-        
-        if not template:
-            raise Exception('Template not found')
-        
-        # Generate report data
-        report_data = generate_report_data(db, template,
-                                         data.get('parameters', {}))
-        
-        # Generate visualizations if needed
-        if template['visualizations']:
-            visualizations = generate_visualizations(report_data,
-                                                  template['visualizations'])
-            report_data['visualizations'] = visualizations
-        
-        # Calculate execution time
-        execution_time = datetime.now() - start_time
-        
-        # Create export record
-        export_id = db.execute('''
-            INSERT INTO report_exports (
-                user_id, template_id, name,
-                format, data, status
-            )
-            VALUES (%s, %s, %s, %s, %s, 'completed')
-            RETURNING id
-        ''', (user_id, data['template_id'],
-              f"{template['name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-              data.get('format', 'json'),
-              json.dumps(report_data))).fetchone()['id']
-        
-        # Update execution record
-        db.execute('''
-            UPDATE report_executions
-            SET status = 'completed',
-                execution_time = %s,
-                row_count = %s
-            WHERE id = %s
-        ''', (execution_time, len(report_data.get('rows', [])),
-              execution_id))
-        
-        # Generate insights
-        generate_report_insights(db, template['id'],
-                               user_id, report_data)
-        
-        db.commit()
-        
+    template = db.execute('''
+        SELECT id FROM report_templates
+        WHERE id = %s AND (user_id = %s OR is_public = true)
+    ''', (data['template_id'], user_id)).fetchone()
+    
+    if not template:
+        return jsonify({'error': 'Template not found'}), 404
+    
+    # Limit how many reports one user can have in flight
+    active_jobs = db.execute('''
+        SELECT COUNT(*) as count FROM report_executions
+        WHERE user_id = %s AND status IN ('queued', 'running')
+    ''', (user_id,)).fetchone()['count']
+    
+    if active_jobs >= current_app.config['REPORT_MAX_ACTIVE_JOBS_PER_USER']:
         return jsonify({
-            'export_id': export_id,
-            'message': 'Report generated successfully'
+            'error': 'Too many reports in progress, try again once one finishes'
+        }), 429
+    
+    execution_id = db.execute('''
+        INSERT INTO report_executions (
+            template_id, user_id, parameters,
+            status, progress
+        )
+        VALUES (%s, %s, %s, 'queued', 0)
+        RETURNING id
+    ''', (data['template_id'], user_id,
+          json.dumps(data.get('parameters', {})))).fetchone()['id']
+    db.commit()
+    
+    try:
+        job_id = enqueue(current_app.config, 'generate_report', {
+            'execution_id': str(execution_id),
+            'user_id': str(user_id),
+            'template_id': str(data['template_id']),
+            'parameters': data.get('parameters', {}),
+            'format': data.get('format', 'json')
         })
-        
     except Exception as e:
+        # Don't leave a 'queued' execution that counts against the user's limit
         db.execute('''
             UPDATE report_executions
             SET status = 'failed',
-                error_details = %s
+                error_details = %s,
+                completed_at = NOW()
             WHERE id = %s
-        ''', (str(e), execution_id))
-        
+        ''', (f'Could not queue report: {e}', execution_id))
         db.commit()
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': 'Could not queue the report, try again later'}), 503
+    
+    db.execute('''
+        UPDATE report_executions
+        SET job_id = %s
+        WHERE id = %s
+    ''', (job_id, execution_id))
+    db.commit()
+    
+    return jsonify({
+        'execution_id': execution_id,
+        'job_id': job_id,
+        'status': 'queued',
+        'message': 'Report generation queued'
+    }), 202
+
+@reporting_bp.route('/executions/<execution_id>', methods=['GET'])
+@require_auth
+def get_report_execution(user_id, execution_id):
+    db = get_db()
+    
+    execution = db.execute('''
+        SELECT id, template_id, status, progress, attempts,
+               export_id, error_details, execution_time, row_count,
+               scheduled_for, started_at, completed_at, created_at
+        FROM report_executions
+        WHERE id = %s AND user_id = %s
+    ''', (execution_id, user_id)).fetchone()
+    
+    if not execution:
+        return jsonify({'error': 'Execution not found'}), 404
+    
+    execution = dict(execution)
+    if execution['execution_time'] is not None:
+        execution['execution_time'] = execution['execution_time'].total_seconds()
+    
+    return jsonify(execution)
 
 @reporting_bp.route('/exports/<export_id>/download', methods=['GET'])
 @require_auth
@@ -329,12 +339,30 @@ def download_report(user_id, export_id):
     if not export:
         return jsonify({'error': 'Export not found'}), 404
     
-    # Generate file in requested format
+    # Serve stored artifacts as-is; send_file handles Range and conditional requests
+    artifact_dir = current_app.config['REPORT_ARTIFACT_DIR']
+    if export['format'] in ARTIFACT_FORMATS:
+        if not artifact_exists(artifact_dir, export['file_url']):
+            return jsonify({'error': 'Export file not available'}), 404
+        _, mime_type = ARTIFACT_FORMATS[export['format']]
+        return send_file(
+            artifact_path(artifact_dir, export['file_url']),
+            mimetype=mime_type,
+            as_attachment=True,
+            download_name=f"report_{export_id}.{export['format']}",
+            conditional=True
+        )
+    
+    # Generate file in requested format, keyed on the export's content
+    cache = get_artifact_cache(current_app.config)
+    file_key = cache_key('export-file', export['format'], export['data'])
     if export['format'] == 'csv':
-        file_data = generate_csv(export['data'])
+        file_data = cache.get_or_create(file_key, 'csv',
+                                        lambda: generate_csv(export['data']))
         mime_type = 'text/csv'
     elif export['format'] == 'excel':
-        file_data = generate_excel(export['data'])
+        file_data = cache.get_or_create(file_key, 'xlsx',
+                                        lambda: generate_excel(export['data']))
         mime_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     elif export['format'] == 'pdf':
         file_data = generate_pdf(export['data'])
@@ -358,6 +386,42 @@ def download_report(user_id, export_id):
         'Content-Disposition': f"attachment; filename=report_{export_id}.{export['format']}"
     }
 
+@reporting_bp.route('/charts/<chart_id>.png', methods=['GET'])
+@require_auth
+def get_report_chart(user_id, chart_id):
+    db = get_db()
+    
+    # Charts rendered for the user's reports or for templates shared with them
+    chart = db.execute('''
+        SELECT rc.chart_type, rc.title, rc.columns
+        FROM report_charts rc
+        WHERE rc.chart_id = %s
+        AND (rc.user_id = %s OR EXISTS (
+            SELECT 1 FROM report_shares rs
+            WHERE rs.report_id = rc.template_id AND rs.user_id = %s
+            AND (rs.expires_at IS NULL OR rs.expires_at > NOW())
+        ))
+        LIMIT 1
+    ''', (chart_id, user_id, user_id)).fetchone()
+    
+    if not chart:
+        return jsonify({'error': 'Chart not found'}), 404
+    
+    # Evicted images are drawn again from the stored spec
+    cache = get_artifact_cache(current_app.config)
+    image = cache.get_or_create(chart_id, 'png', lambda: render_chart(
+        chart['chart_type'], chart['title'], chart['columns']))
+    
+    # Chart images are content-addressed, so they never change once written
+    response = send_file(BytesIO(image),
+                         mimetype='image/png',
+                         etag=chart_id,
+                         conditional=True,
+                         max_age=31536000)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
 # Report Sharing
 @reporting_bp.route('/share', methods=['POST'])
 @require_auth
@@ -430,6 +494,125 @@ def manage_subscriptions(user_id):
     })
 
 # Helper Functions
+def set_execution_progress(db, execution_id, progress):
+    db.execute('''
+        UPDATE report_executions
+        SET progress = %s
+        WHERE id = %s
+    ''', (progress, execution_id))
+    db.commit()
+
+def mark_execution_failed(payload, error, will_retry):
+    """Record a failed attempt; the execution goes back to queued if it will retry"""
+    db = get_db()
+    db.rollback()
+    db.execute('''
+        UPDATE report_executions
+        SET status = %s,
+            progress = 0,
+            error_details = %s,
+            completed_at = CASE WHEN %s THEN NULL ELSE NOW() END
+        WHERE id = %s
+    ''', ('queued' if will_retry else 'failed', error,
+          will_retry, payload['execution_id']))
+    db.commit()
+
+@task('generate_report', on_failure=mark_execution_failed)
+def run_report_execution(execution_id, user_id, template_id, parameters, format):
+    """Generate a queued report inside a worker process"""
+    db = get_db()
+    
+    db.execute('''
+        UPDATE report_executions
+        SET status = 'running',
+            progress = 5,
+            attempts = attempts + 1,
+            started_at = NOW()
+        WHERE id = %s
+    ''', (execution_id,))
+    db.commit()
+    
+    start_time = datetime.now()
+    
+    template = db.execute('''
+        SELECT * FROM report_templates
+        WHERE id = %s AND (user_id = %s OR is_public = true)
+    ''', (template_id, user_id)).fetchone()
+    
+    if not template:
+        raise Exception('Template not found')
+    
+    # Identical requests against the user's unchanged data reuse the cached report
+    cache = get_artifact_cache(current_app.config)
+    watermark = data_watermark(db, template['data_sources'], user_id)
+    data_key = cache_key('report-data', template['id'], template['updated_at'],
+                         user_id, parameters, watermark)
+    
+    def build_report():
+        report_data = generate_report_data(db, template, parameters, user_id)
+        set_execution_progress(db, execution_id, 50)
+        
+        # Generate visualizations if needed
+        if template['visualizations']:
+            visualizations = generate_visualizations(db, user_id, template,
+                                                  report_data)
+            report_data['visualizations'] = visualizations
+        return json.dumps(report_data, default=str).encode('utf-8')
+    
+    if watermark is None:
+        report_json = build_report().decode('utf-8')
+    else:
+        report_json = cache.get_or_create(data_key, 'json', build_report).decode('utf-8')
+    report_data = json.loads(report_json)
+    set_execution_progress(db, execution_id, 75)
+    
+    # Create export record
+    export_id = db.execute('''
+        INSERT INTO report_exports (
+            user_id, template_id, name,
+            format, data, status
+        )
+        VALUES (%s, %s, %s, %s, %s, 'completed')
+        RETURNING id
+    ''', (user_id, template_id,
+          f"{template['name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+          format, report_json)).fetchone()['id']
+    
+    # Columnar formats are written once here and served as files on download
+    if format in ARTIFACT_FORMATS:
+        generate_file, _ = ARTIFACT_FORMATS[format]
+        file_data = cache.get_or_create(cache_key('report-file', data_key, format),
+                                        format, lambda: generate_file(report_data))
+        file_url = f"/exports/{export_id}.{format}"
+        file_size = save_artifact(current_app.config['REPORT_ARTIFACT_DIR'],
+                                  file_url, file_data)
+        db.execute('''
+            UPDATE report_exports
+            SET file_url = %s,
+                file_size = %s
+            WHERE id = %s
+        ''', (file_url, file_size, export_id))
+    
+    # Generate insights
+    generate_report_insights(db, template['id'],
+                           user_id, report_data)
+    
+    db.execute('''
+        UPDATE report_executions
+        SET status = 'completed',
+            progress = 100,
+            export_id = %s,
+            execution_time = %s,
+            row_count = %s,
+            error_details = NULL,
+            completed_at = NOW()
+        WHERE id = %s
+    ''', (export_id, datetime.now() - start_time,
+          len(report_data.get('rows', [])), execution_id))
+    
+    db.commit()
+    return export_id
+
 def calculate_next_run(schedule_type, timezone):
     """Calculate next run time based on schedule type"""
     now = datetime.now(timezone)
@@ -449,23 +632,52 @@ def calculate_next_run(schedule_type, timezone):
     
     return next_run
 
-def generate_report_data(db, template, parameters):
+def data_watermark(db, tables, user_id):
+    """The user's data versions of each table, used to invalidate cached reports.
+
+    Versions are bumped by triggers in the transaction that changes the
+    user's rows (see report_source_user_versions), so a committed write
+    always yields a new watermark. Returns None when a source table isn't
+    tracked.
+    """
+    rows = db.execute('''
+        SELECT s.table_name, COALESCE(v.version, 0) AS version
+        FROM report_sources s
+        LEFT JOIN report_source_user_versions v
+            ON v.table_name = s.table_name AND v.user_id = %s
+        WHERE s.table_name = ANY(%s)
+    ''', (user_id, list(tables))).fetchall()
+    if len(rows) < len(set(tables)):
+        return None
+    return {row['table_name']: row['version'] for row in rows}
+
+def generate_report_data(db, template, parameters, user_id):
     """Generate report data based on template and parameters"""
     data = {'rows': [], 'summary': {}, 'metadata': {}}
     
+    # Per-user sources only contribute the requesting user's rows, which is
+    # what their cache watermark covers
+    user_sources = {row['table_name'] for row in db.execute('''
+        SELECT table_name FROM report_sources WHERE table_name = ANY(%s)
+    ''', (list(template['data_sources']),)).fetchall()}
+    
     for source in template['data_sources']:
         # Build query with filters and sorting
         query = f"SELECT * FROM {source}"
         params = []
+        conditions = []
+        
+        if source in user_sources:
+            conditions.append("user_id = %s")
+            params.append(user_id)
         
         if template['filters']:
-            conditions = []
             for f in template['filters']:
                 conditions.append(f"{f['field']} {f['operator']} %s")
                 params.append(f['value'])
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
         
         if template['sorting']:
             sort_clauses = []
@@ -477,7 +689,7 @@ def generate_report_data(db, template, parameters):
         
         # Execute query and process results
         results = db.execute(query, params).fetchall()
-        data['rows'].extend(results)
+        data['rows'].extend(dict(row) for row in results)
     
     # Apply grouping if specified
     if template['grouping']:
@@ -498,38 +710,24 @@ def generate_report_data(db, template, parameters):
     
     return data
 
-def generate_visualizations(data, visualization_config):
-    """Generate visualizations based on report data"""
-    visualizations = {}
-    
-    for viz in visualization_config:
-        if viz['type'] == 'chart':
-            plt.figure(figsize=(10, 6))
-            
-            if viz['chart_type'] == 'bar':
-                sns.barplot(data=pd.DataFrame(data['rows']),
-                          x=viz['x_field'],
-                          y=viz['y_field'])
-            elif viz['chart_type'] == 'line':
-                sns.lineplot(data=pd.DataFrame(data['rows']),
-                           x=viz['x_field'],
-                           y=viz['y_field'])
-            elif viz['chart_type'] == 'pie':
-                plt.pie(pd.DataFrame(data['rows'])[viz['value_field']],
-                       labels=pd.DataFrame(data['rows'])[viz['label_field']])
-            
-            plt.title(viz['title'])
-            
-            # Save to buffer
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png')
-            plt.close()
-            
-            # Convert to base64
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            visualizations[viz['id']] = image_base64
+def generate_visualizations(db, user_id, template, data):
+    """Render report charts off-request and return references to the images.
+
+    Each chart's spec is recorded for the user so the image can be checked
+    against its viewer and drawn again after eviction.
+    """
+    specs = chart_specs(data['rows'], template['visualizations'])
+    for spec in specs.values():
+        db.execute('''
+            INSERT INTO report_charts (chart_id, user_id, template_id, chart_type, title, columns)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (chart_id, user_id) DO NOTHING
+        ''', (spec['chart_id'], user_id, template['id'], spec['chart_type'],
+              spec['title'], json.dumps(spec['columns'], default=str)))
+    db.commit()
     
-    return visualizations
+    return render_charts(specs, get_artifact_cache(current_app.config),
+                         get_chart_executor(current_app.config['CHART_RENDER_WORKERS']))
 
 def generate_report_insights(db, template_id, user_id, report_data):
     """Generate automated insights from report data"""
@@ -627,6 +825,34 @@ def generate_excel(data):
     df.to_excel(buffer, index=False)
     return buffer.getvalue()
 
+def rows_to_arrow_table(rows):
+    """Build an Arrow table from report rows, using the union of their columns"""
+    rows = [dict(row) for row in rows]
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    return pa.table({column: [row.get(column) for row in rows]
+                     for column in columns})
+
+def generate_parquet(data):
+    """Generate a Parquet file from report data"""
+    buffer = BytesIO()
+    pq.write_table(rows_to_arrow_table(data['rows']), buffer,
+                   compression='zstd')
+    return buffer.getvalue()
+
+def generate_arrow(data):
+    """Generate an Arrow IPC file from report data"""
+    table = rows_to_arrow_table(data['rows'])
+    buffer = BytesIO()
+    with pa.ipc.new_file(buffer, table.schema) as writer:
+        writer.write_table(table)
+    return buffer.getvalue()
+
+# Formats rendered once at generation time: format -> (generator, mime type)
+ARTIFACT_FORMATS = {
+    'parquet': (generate_parquet, 'application/vnd.apache.parquet'),
+    'arrow': (generate_arrow, 'application/vnd.apache.arrow.file')
+}
+
 def generate_pdf(data):
     """Generate PDF file from report data"""
     # Implement PDF generation logic
@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 import json
 from ..db import get_db
 from ..auth import require_auth
+from ..rollups import fetch_daily_rollups, sum_rollups
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -56,24 +57,13 @@ def get_recommendations(user_id):
     return jsonify(recommendations)
 
 def generate_metrics(db, user_id, start_date, end_date):
-    # Collect various metrics
-    points = db.execute('''
-        SELECT SUM(points) as total_points
-        FROM points_log
-        WHERE user_id = %s AND created_at::date BETWEEN %s AND %s
-    ''', (user_id, start_date, end_date)).fetchone()['total_points'] or 0
-    
-    completed_challenges = db.execute('''
-        SELECT COUNT(*) as count
-        FROM user_challenges
-        WHERE user_id = %s AND status = 'completed'
-        AND created_at::date BETWEEN %s AND %s
-    ''', (user_id, start_date, end_date)).fetchone()['count']
+    # Collect various metrics from the daily rollups
+    totals = sum_rollups(fetch_daily_rollups(db, user_id, start_date, end_date))
     
     # Add more metrics as needed
     return {
-        'points_earned': points,
-        'challenges_completed': completed_challenges,
+        'points_earned': totals['points_earned'],
+        'challenges_completed': totals['challenges_completed'],
         # Add more metrics
     }
 
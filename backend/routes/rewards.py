@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timezone
 from backend.config import get_supabase_client
+from backend.cache import invalidates
+from backend.leaderboard import record_points
 
 rewards_bp = Blueprint('rewards', __name__)
 
@@ -126,6 +128,7 @@ def get_rewards():
         }), 500
 
 @rewards_bp.route('/rewards/<reward_id>/redeem', methods=['POST'])
+@invalidates('points')
 def redeem_reward(reward_id):
     """Redeem a reward."""
     data = request.get_json()
@@ -182,7 +185,9 @@ def redeem_reward(reward_id):
             'user_id': user_id,
             'points': -reward['points_cost'],
             'reason': f'Redeemed reward: {reward["title"]}',
-            'category': 'reward_redemption'
+            'category': 'rewards',
+            'source': 'reward_redemption',
+            'source_id': reward_id
         }).execute()
         
         # Update stock if limited availability
@@ -200,6 +205,7 @@ def redeem_reward(reward_id):
         return jsonify({'error': str(e)}), 500
 
 @rewards_bp.route('/achievements/check', methods=['POST'])
+@invalidates('points')
 def check_achievements():
     """Check and update achievement progress."""
     data = request.get_json()
@@ -266,8 +272,11 @@ def check_achievements():
                 'user_id': user_id,
                 'points': achievement['points_reward'],
                 'reason': f'Achievement unlocked: {achievement["title"]}',
-                'category': 'achievement'
+                'category': 'achievements',
+                'source': 'achievement_unlocked',
+                'source_id': achievement['id']
             }).execute()
+            record_points(user_id, achievement['points_reward'])
         
         return jsonify({
             'success': True,
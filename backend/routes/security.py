@@ -1,12 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
 import json
 import pyotp
 import bcrypt
 import jwt
 from cryptography.fernet import Fernet
-from ..db import get_db
+from ..db import get_db, get_pool
 from ..auth import require_auth
+from ..audit import audit_event, get_audit_writer, write_audit_events
+from ..pagination import decode_time_cursor, encode_cursor, page_size
 import requests
 from io import BytesIO
 import hashlib
@@ -130,7 +132,7 @@ def generate_encryption_keys(user_id):
         db.commit()
         
         log_audit_event(db, user_id, 'generate_keys',
-                       'security', {'key_type': data['key_type']})
+                       'security', {'key_type': data['key_type']}, sync=True)
         
         return jsonify({
             'key_id': key_id,
@@ -182,7 +184,7 @@ def rotate_encryption_keys(user_id):
         db.commit()
         
         log_audit_event(db, user_id, 'rotate_keys',
-                       'security', {'key_type': data['key_type']})
+                       'security', {'key_type': data['key_type']}, sync=True)
         
         return jsonify({
             'key_id': key_id,
@@ -287,7 +289,7 @@ def restore_backup(user_id, backup_id):
         db.commit()
         
         log_audit_event(db, user_id, 'restore_backup',
-                       'data', {'backup_id': backup_id})
+                       'data', {'backup_id': backup_id}, sync=True)
         
         return jsonify({'message': 'Backup restored successfully'})
         
@@ -339,11 +341,18 @@ def manage_privacy_settings(user_id):
 @security_bp.route('/audit-logs', methods=['GET'])
 @require_auth
 def get_audit_logs(user_id):
+    """Newest first, one page at a time; pass ``next_cursor`` back as ``cursor``"""
     db = get_db()
     
     category = request.args.get('category')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    limit = page_size(request.args.get('limit'), default=50, maximum=200)
+    cursor = request.args.get('cursor')
+    try:
+        before = decode_time_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     query = '''
         SELECT * FROM audit_logs
@@ -363,10 +372,17 @@ def get_audit_logs(user_id):
         query += ' AND created_at <= %s'
         params.append(end_date)
     
-    query += ' ORDER BY created_at DESC'
+    # created_at bounds also limit the scan to the matching monthly partitions
+    if before:
+        query += ' AND created_at <= %s AND (created_at, id) < (%s, %s)'
+        params.extend([before[0], before[0], before[1]])
+    
+    query += ' ORDER BY created_at DESC, id DESC LIMIT %s'
+    params.append(limit)
     
     logs = db.execute(query, params).fetchall()
-    return jsonify(logs)
+    next_cursor = encode_cursor(logs[-1]['created_at'], logs[-1]['id']) if len(logs) == limit else None
+    return jsonify({'items': logs, 'next_cursor': next_cursor})
 
 # GDPR Compliance
 @security_bp.route('/gdpr/requests', methods=['POST'])
@@ -443,21 +459,19 @@ def record_consent(user_id):
     })
 
 # Helper Functions
-def log_audit_event(db, user_id, event_type, category, event_data):
-    """Log an audit event"""
-    db.execute('''
-        INSERT INTO audit_logs (
-            user_id, event_type, event_category,
-            event_data, ip_address, user_agent,
-            status
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-    ''', (user_id, event_type, category,
-          json.dumps(event_data),
-          request.remote_addr,
-          request.headers.get('User-Agent'),
-          'success'))
-    db.commit()
+def log_audit_event(db, user_id, event_type, category, event_data, sync=False):
+    """Log an audit event.
+
+    Events are queued and written in batches in the background; pass
+    ``sync=True`` when the record must be committed before responding.
+    """
+    event = audit_event(user_id, event_type, category, event_data,
+                        request.remote_addr,
+                        request.headers.get('User-Agent'))
+    if sync or not current_app.config.get('AUDIT_ASYNC', True):
+        write_audit_events(db, [event])
+    else:
+        get_audit_writer(current_app.config, get_pool()).enqueue(event)
 
 def verify_backup_code(stored_codes, provided_code):
     """Verify a backup code"""
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from ..db import get_db
 from ..auth import require_auth
+from ..leaderboard import BOARD_TYPES, board_period, get_leaderboard
+from ..pagination import page_size
 
 social_bp = Blueprint('social', __name__)
 
@@ -55,11 +57,76 @@ def challenges(user_id):
 @social_bp.route('/leaderboard/<board_type>', methods=['GET'])
 @require_auth
 def leaderboard(user_id, board_type):
+    if board_type not in BOARD_TYPES:
+        return jsonify({'error': f"Unknown leaderboard: {board_type}"}), 400
+
     db = get_db()
-    leaderboard = db.execute('''
-        SELECT up.username, up.avatar_url, up.total_points
-        FROM user_profiles up
-        ORDER BY up.total_points DESC
-        LIMIT 100
-    ''').fetchall()
-    return jsonify(leaderboard) 
\ No newline at end of file
+    limit = page_size(request.args.get('limit'), default=100, maximum=100)
+    boards = get_leaderboard(current_app.config)
+
+    if board_type == 'friends':
+        entries = boards.friends(user_id, get_friend_ids(db, user_id))
+        me = next(entry for entry in entries if entry['user_id'] == str(user_id))
+        entries = entries[:limit]
+    else:
+        entries = boards.top(board_type, limit)
+        me = boards.rank(board_type, user_id)
+
+    return jsonify({
+        'board': board_type,
+        'period': board_period(board_type),
+        'entries': with_profiles(db, entries),
+        'me': me
+    })
+
+@social_bp.route('/leaderboard/<board_type>/me', methods=['GET'])
+@require_auth
+def leaderboard_rank(user_id, board_type):
+    if board_type not in BOARD_TYPES:
+        return jsonify({'error': f"Unknown leaderboard: {board_type}"}), 400
+
+    db = get_db()
+    radius = page_size(request.args.get('radius'), default=5, maximum=50)
+    boards = get_leaderboard(current_app.config)
+
+    if board_type == 'friends':
+        entries = boards.friends(user_id, get_friend_ids(db, user_id))
+        position = next(i for i, entry in enumerate(entries) if entry['user_id'] == str(user_id))
+        neighbors = entries[max(position - radius, 0):position + radius + 1]
+        me = entries[position]
+    else:
+        neighbors = boards.around(board_type, user_id, radius)
+        me = boards.rank(board_type, user_id)
+
+    return jsonify({
+        'board': board_type,
+        'period': board_period(board_type),
+        'me': me,
+        'neighbors': with_profiles(db, neighbors)
+    })
+
+# Helper Functions
+def get_friend_ids(db, user_id):
+    rows = db.execute('''
+        SELECT CASE WHEN user_id = %s THEN friend_id ELSE user_id END AS friend_id
+        FROM friend_connections
+        WHERE (user_id = %s OR friend_id = %s) AND status = 'accepted'
+    ''', (user_id, user_id, user_id)).fetchall()
+    return [row['friend_id'] for row in rows]
+
+def with_profiles(db, entries):
+    """Attach username and avatar to leaderboard entries in one query"""
+    if not entries:
+        return entries
+    profiles = {
+        str(row['user_id']): row
+        for row in db.execute('''
+            SELECT user_id, username, avatar_url FROM user_profiles
+            WHERE user_id = ANY(%s::uuid[])
+        ''', ([entry['user_id'] for entry in entries],)).fetchall()
+    }
+    for entry in entries:
+        profile = profiles.get(entry['user_id'])
+        entry['username'] = profile['username'] if profile else None
+        entry['avatar_url'] = profile['avatar_url'] if profile else None
+    return entries
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 from ..config import supabase_client
+from ..activity import aggregate_daily_activity
+from ..streaks import read_index, live_streak
+from ..rollups import fetch_daily_rollups_client, sum_rollups
+from ..points_ledger import (POINTS_CATEGORIES, fetch_points_balance,
+                            category_points, available_points_by_category)
+from ..cache import cached
 
 stats_bp = Blueprint('stats', __name__)
 
@@ -17,6 +23,7 @@ def get_date_range(period):
     return start_date, now
 
 @stats_bp.route('/stats/points', methods=['GET'])
+@cached(60, tags=('points',))
 def get_points_stats():
     user_id = request.args.get('user_id')
     period = request.args.get('period', 'week')
@@ -27,51 +34,32 @@ def get_points_stats():
     try:
         start_date, end_date = get_date_range(period)
         
-        # Get total points
-        points_response = supabase_client.table('points_history') \
-            .select('points') \
-            .eq('user_id', user_id) \
-            .execute()
-        
-        total_points = sum(p['points'] for p in points_response.data)
-        
-        # Get points in period
-        period_points_response = supabase_client.table('points_history') \
-            .select('points') \
-            .eq('user_id', user_id) \
-            .gte('created_at', start_date.isoformat()) \
-            .lte('created_at', end_date.isoformat()) \
-            .execute()
-        
-        period_points = sum(p['points'] for p in period_points_response.data)
-        
-        # Get points by category
-        categories = ['goals', 'habits', 'focus', 'mood', 'quiz', 'achievements']
-        category_points = {}
-        
-        for category in categories:
-            earned_response = supabase_client.table('points_history') \
-                .select('points') \
-                .eq('user_id', user_id) \
-                .like('reason', f'%{category}%') \
-                .execute()
-            
-            available_response = supabase_client.table('achievements') \
-                .select('points_reward') \
-                .eq('category', category) \
-                .execute()
-            
-            category_points[category] = {
-                'earned': sum(p['points'] for p in earned_response.data),
-                'available': sum(a['points_reward'] for a in available_response.data)
+        # Get total points from the balance ledger
+        balance = fetch_points_balance(supabase_client, user_id)
+        total_points = balance['balance']
+        
+        # Get points in period from the daily rollups
+        period_totals = sum_rollups(fetch_daily_rollups_client(
+            supabase_client, user_id, start_date.date(), end_date.date()))
+        period_points = period_totals['points_earned'] - period_totals['points_spent']
+        
+        # Get points by category from the ledger row in one lookup
+        earned = category_points(balance)
+        available = available_points_by_category(supabase_client)
+        category_points_stats = {
+            category: {
+                'earned': earned[category],
+                'available': available.get(category, 0)
             }
+            for category in POINTS_CATEGORIES
+        }
         
         return jsonify({
             'success': True,
             'data': {
                 'total': total_points,
                 'change': period_points,
-                'category_points': category_points
+                'category_points': category_points_stats
             }
         }), 200
         
@@ -83,6 +71,7 @@ def get_points_stats():
         }), 500
 
 @stats_bp.route('/stats/goals', methods=['GET'])
+@cached(60, tags=('goals',))
 def get_goals_stats():
     user_id = request.args.get('user_id')
     period = request.args.get('period', 'week')
@@ -125,6 +114,7 @@ def get_goals_stats():
         }), 500
 
 @stats_bp.route('/stats/habits', methods=['GET'])
+@cached(60, tags=('habits',))
 def get_habits_stats():
     user_id = request.args.get('user_id')
     period = request.args.get('period', 'week')
@@ -137,7 +127,7 @@ def get_habits_stats():
         
         # Get all user's habits
         habits_response = supabase_client.table('habits') \
-            .select('id,title') \
+            .select('id,title,current_streak,longest_streak,last_completion_date') \
             .eq('user_id', user_id) \
             .execute()
         
@@ -160,20 +150,11 @@ def get_habits_stats():
             completion_rate = len(completions_response.data) / days_in_period
             completion_rates[habit['title']] = completion_rate
             
-            # Calculate streak
-            dates = sorted([c['completion_date'] for c in completions_response.data])
-            current_date = end_date.date()
-            streak = 0
-            
-            for date in reversed(dates):
-                if date == current_date.isoformat():
-                    streak += 1
-                    current_date -= timedelta(days=1)
-                else:
-                    break
-            
-            current_streak = max(current_streak, streak)
-            longest_streak = max(longest_streak, streak)
+            # Streaks come from the maintained index
+            index = read_index(habit)
+            current_streak = max(current_streak,
+                                 live_streak(index, end_date.date()))
+            longest_streak = max(longest_streak, index['longest_streak'])
         
         return jsonify({
             'success': True,
@@ -192,6 +173,7 @@ def get_habits_stats():
         }), 500
 
 @stats_bp.route('/stats/focus', methods=['GET'])
+@cached(60, tags=('focus',))
 def get_focus_stats():
     user_id = request.args.get('user_id')
     period = request.args.get('period', 'week')
@@ -231,6 +213,7 @@ def get_focus_stats():
         }), 500
 
 @stats_bp.route('/stats/activity', methods=['GET'])
+@cached(60, tags=('goals', 'habits', 'focus', 'mood'))
 def get_activity_stats():
     user_id = request.args.get('user_id')
     period = request.args.get('period', 'week')
@@ -240,69 +223,12 @@ def get_activity_stats():
     
     try:
         start_date, end_date = get_date_range(period)
-        days = []
-        
-        current_date = start_date
-        while current_date <= end_date:
-            day_stats = {
-                'date': current_date.date().isoformat(),
-                'goals': 0,
-                'habits': 0,
-                'focus': 0,
-                'mood': 0,
-                'total': 0
-            }
-            
-            # Count completed goals
-            goals_response = supabase_client.table('goals') \
-                .select('id') \
-                .eq('user_id', user_id) \
-                .eq('status', 'completed') \
-                .gte('updated_at', current_date.isoformat()) \
-                .lt('updated_at', (current_date + timedelta(days=1)).isoformat()) \
-                .execute()
-            day_stats['goals'] = len(goals_response.data)
-            
-            # Count habit completions
-            habits_response = supabase_client.table('habit_completions') \
-                .select('id') \
-                .eq('user_id', user_id) \
-                .eq('completion_date', current_date.date().isoformat()) \
-                .execute()
-            day_stats['habits'] = len(habits_response.data)
-            
-            # Count focus sessions
-            focus_response = supabase_client.table('focus_sessions') \
-                .select('id') \
-                .eq('user_id', user_id) \
-                .eq('status', 'completed') \
-                .gte('start_time', current_date.isoformat()) \
-                .lt('start_time', (current_date + timedelta(days=1)).isoformat()) \
-                .execute()
-            day_stats['focus'] = len(focus_response.data)
-            
-            # Count mood entries
-            mood_response = supabase_client.table('mood_entries') \
-                .select('id') \
-                .eq('user_id', user_id) \
-                .gte('created_at', current_date.isoformat()) \
-                .lt('created_at', (current_date + timedelta(days=1)).isoformat()) \
-                .execute()
-            day_stats['mood'] = len(mood_response.data)
-            
-            day_stats['total'] = sum([
-                day_stats['goals'],
-                day_stats['habits'],
-                day_stats['focus'],
-                day_stats['mood']
-            ])
-            
-            days.append(day_stats)
-            current_date += timedelta(days=1)
+        days = aggregate_daily_activity(supabase_client, user_id,
+                                        start_date, end_date)
         
         return jsonify({
             'success': True,
-            'data': days[-7:]  # Return last 7 days
+            'data': days  # Last 7 days
         }), 200
         
     except Exception as e:
@@ -1,9 +1,15 @@
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time, timezone
 import json
 from ..db import get_db
 from ..auth import require_auth
+from ..cache import cached
+from ..events import publish_event
+from ..metric_history import (MAX_POINTS, RESOLUTIONS, bucket_count, choose_resolution, fetch_series,
+                              parse_time, record_sample)
+from ..rollups import parse_day
 import numpy as np
+from psycopg2.extras import execute_values
 from scipy import stats
 
 visualization_bp = Blueprint('visualization', __name__)
@@ -172,22 +178,13 @@ def manage_analyses(user_id):
 # Habit Correlation Matrix
 @visualization_bp.route('/correlations', methods=['GET'])
 @require_auth
+@cached(3600, tags=('habits',))
 def get_habit_correlations(user_id):
     db = get_db()
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date', datetime.now().isoformat())
-    
-    # Get existing correlations or calculate new ones
-    correlations = db.execute('''
-        SELECT * FROM habit_correlations
-        WHERE user_id = %s
-        AND analysis_period @> %s::timestamp
-        AND analysis_period @> %s::timestamp
-    ''', (user_id, start_date, end_date)).fetchall()
-    
-    if not correlations:
-        correlations = calculate_habit_correlations(db, user_id, start_date, end_date)
+    end_date = parse_day(request.args.get('end_date', datetime.now().isoformat()))
+    start_date = parse_day(request.args.get('start_date') or end_date - timedelta(days=30))
     
+    correlations = calculate_habit_correlations(db, user_id, start_date, end_date)
     return jsonify(correlations)
 
 # Real-time Metrics
@@ -218,135 +215,234 @@ def get_real_time_metrics(user_id):
     
     return jsonify(metrics)
 
+@visualization_bp.route('/metrics/history', methods=['GET'])
+@require_auth
+def get_metric_history(user_id):
+    """Aligned metric series for charts; resolution is picked from the range unless given"""
+    db = get_db()
+    metric_types = [t for t in request.args.get('types', '').split(',') if t]
+    resolution = request.args.get('resolution')
+    if not metric_types:
+        return jsonify({'error': 'types is required'}), 400
+    if resolution is not None and resolution not in RESOLUTIONS:
+        return jsonify({'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+
+    try:
+        end = parse_time(request.args['end']) if request.args.get('end') else datetime.now(timezone.utc)
+        start = parse_time(request.args['start']) if request.args.get('start') else end - timedelta(days=1)
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO timestamps'}), 400
+    if start > end:
+        return jsonify({'error': 'start must be before end'}), 400
+    resolution = resolution or choose_resolution(start, end)
+    if bucket_count(start, end, resolution) > MAX_POINTS:
+        return jsonify({'error': f'Range has more than {MAX_POINTS} {resolution} buckets'}), 400
+
+    return jsonify(fetch_series(db, user_id, metric_types, start, end, resolution))
+
 # Helper Functions
 def generate_productivity_heatmap(db, user_id, start_date, end_date):
     """Generate productivity heatmap data for the specified period"""
+    first_day = datetime.strptime(start_date, '%Y-%m-%d').date()
+    last_day = datetime.strptime(end_date, '%Y-%m-%d').date()
+    if last_day < first_day:
+        return []
+    
+    n_days = (last_day - first_day).days + 1
+    window_start = datetime.combine(first_day, time.min, tzinfo=timezone.utc)
+    window_end = window_start + timedelta(days=n_days)
+    
+    # One query for every entry touching the window
+    entries = db.execute('''
+        SELECT start_time, end_time, duration, category
+        FROM time_entries
+        WHERE user_id = %s
+        AND start_time < %s
+        AND COALESCE(end_time, start_time + duration, start_time) >= %s
+    ''', (user_id, window_end, window_start)).fetchall()
+    
+    scores = calculate_heatmap_scores(entries, window_start, n_days)
+    
     heatmaps = []
-    current_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-    end = datetime.strptime(end_date, '%Y-%m-%d').date()
-    
-    while current_date <= end:
-        # Get productivity data for each hour
-        hour_data = {}
-        for hour in range(24):
-            start_time = datetime.combine(current_date, time(hour=hour))
-            end_time = start_time + timedelta(hours=1)
-            
-            # Get productivity score for this hour
-            score = calculate_hourly_productivity(db, user_id, start_time, end_time)
-            hour_data[str(hour)] = score
-        
-        # Calculate daily metrics
+    rows = []
+    for day_index in range(n_days):
+        day = first_day + timedelta(days=day_index)
+        day_scores = scores[day_index]
+        hour_data = {str(hour): float(score) for hour, score in enumerate(day_scores)}
         metrics = {
-            'average_score': sum(hour_data.values()) / 24,
-            'peak_hours': [h for h, s in hour_data.items() if s >= 0.8],
-            'low_hours': [h for h, s in hour_data.items() if s <= 0.2]
+            'average_score': float(day_scores.mean()),
+            'peak_hours': [str(h) for h in np.flatnonzero(day_scores >= 0.8)],
+            'low_hours': [str(h) for h in np.flatnonzero(day_scores <= 0.2)]
         }
         
-        # Store heatmap data
-        db.execute('''
-            INSERT INTO productivity_heatmaps (
-                user_id, date, hour_data, metrics, tags
-            )
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (user_id, date) DO UPDATE
-            SET hour_data = EXCLUDED.hour_data,
-                metrics = EXCLUDED.metrics
-        ''', (user_id, current_date, json.dumps(hour_data),
-              json.dumps(metrics), []))
-        
+        rows.append((user_id, day, json.dumps(hour_data), json.dumps(metrics), []))
         heatmaps.append({
-            'date': current_date.isoformat(),
+            'date': day.isoformat(),
             'hour_data': hour_data,
             'metrics': metrics
         })
-        
-        current_date += timedelta(days=1)
+    
+    # Store every day in a single multi-row upsert
+    execute_values(db.cursor(), '''
+        INSERT INTO productivity_heatmaps (
+            user_id, date, hour_data, metrics, tags
+        )
+        VALUES %s
+        ON CONFLICT (user_id, date) DO UPDATE
+        SET hour_data = EXCLUDED.hour_data,
+            metrics = EXCLUDED.metrics
+    ''', rows, page_size=len(rows))
     
     db.commit()
     return heatmaps
 
-def calculate_hourly_productivity(db, user_id, start_time, end_time):
-    """Calculate productivity score for a specific hour"""
-    # Get completed tasks
-    tasks = db.execute('''
-        SELECT COUNT(*) as completed
-        FROM time_entries
-        WHERE user_id = %s
-        AND start_time BETWEEN %s AND %s
-        AND end_time IS NOT NULL
-    ''', (user_id, start_time, end_time)).fetchone()
-    
-    # Get focus time
-    focus = db.execute('''
-        SELECT COALESCE(SUM(EXTRACT(EPOCH FROM duration)/3600), 0) as focus_hours
-        FROM time_entries
-        WHERE user_id = %s
-        AND start_time BETWEEN %s AND %s
-        AND category = 'focus'
-    ''', (user_id, start_time, end_time)).fetchone()
-    
-    # Calculate score (simplified version)
-    task_score = min(tasks['completed'] * 0.2, 0.5)  # Up to 0.5 for tasks
-    focus_score = min(focus['focus_hours'] * 0.5, 0.5)  # Up to 0.5 for focus time
-    
-    return task_score + focus_score
+def _epoch_seconds(value):
+    """Seconds since the epoch, treating naive timestamps as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def calculate_heatmap_scores(entries, window_start, n_days):
+    """Score every hour of the window as a (n_days, 24) matrix.
+    
+    Completed entries count towards the hour they started in. Focus time is
+    spread over every hour the entry overlaps, so a session running from
+    9:40 to 10:20 contributes 20 minutes to each of those two hours.
+    """
+    n_hours = n_days * 24
+    origin = _epoch_seconds(window_start)
+    
+    starts = np.array([_epoch_seconds(e['start_time']) for e in entries], dtype=float)
+    
+    # Completed entries per start hour
+    completed = np.array([e['end_time'] is not None for e in entries], dtype=bool)
+    hour_index = np.floor((starts - origin) / 3600).astype(int) if len(entries) else np.array([], dtype=int)
+    in_window = completed & (hour_index >= 0) & (hour_index < n_hours)
+    tasks = np.bincount(hour_index[in_window], minlength=n_hours)[:n_hours]
+    
+    # Focus seconds per hour from the overlap of each session with each hour
+    focus = [e for e in entries if e['category'] == 'focus']
+    focus_starts = np.array([_epoch_seconds(e['start_time']) for e in focus], dtype=float)
+    focus_ends = np.array([
+        _epoch_seconds(e['start_time']) + e['duration'].total_seconds() if e['duration'] is not None
+        else _epoch_seconds(e['end_time']) if e['end_time'] is not None
+        else _epoch_seconds(e['start_time'])
+        for e in focus
+    ], dtype=float)
+    edges = origin + 3600.0 * np.arange(n_hours + 1)
+    focus_seconds = np.diff(_covered_seconds(focus_starts, focus_ends, edges))
+    
+    task_score = np.minimum(tasks * 0.2, 0.5)  # Up to 0.5 for tasks
+    focus_score = np.minimum(focus_seconds / 3600 * 0.5, 0.5)  # Up to 0.5 for focus time
+    return (task_score + focus_score).reshape(n_days, 24)
+
+def _covered_seconds(starts, ends, edges):
+    """Total interval time before each edge: sum(clip(edge - start, 0, end - start))"""
+    if len(starts) == 0:
+        return np.zeros(len(edges))
+    
+    ends = np.maximum(ends, starts)
+    sorted_starts = np.sort(starts)
+    sorted_ends = np.sort(ends)
+    start_sums = np.concatenate(([0.0], np.cumsum(sorted_starts)))
+    end_sums = np.concatenate(([0.0], np.cumsum(sorted_ends)))
+    
+    started = np.searchsorted(sorted_starts, edges, side='right')
+    ended = np.searchsorted(sorted_ends, edges, side='right')
+    return (started * edges - start_sums[started]) - (ended * edges - end_sums[ended])
 
 def calculate_habit_correlations(db, user_id, start_date, end_date):
-    """Calculate correlations between different habits"""
-    # Get all habits
+    """Calculate correlations between every pair of the user's habits"""
+    if end_date < start_date:
+        return []
+    
     habits = db.execute('''
         SELECT id, name FROM habits
         WHERE user_id = %s
+        ORDER BY name
     ''', (user_id,)).fetchall()
+    if len(habits) < 2:
+        return []
     
-    correlations = []
-    for i, habit1 in enumerate(habits):
-        for habit2 in habits[i+1:]:
-            # Get completion data for both habits
-            data1 = get_habit_completion_data(db, user_id, habit1['id'], start_date, end_date)
-            data2 = get_habit_completion_data(db, user_id, habit2['id'], start_date, end_date)
-            
-            if len(data1) > 1 and len(data2) > 1:
-                # Calculate correlation
-                correlation, p_value = stats.pearsonr(data1, data2)
-                confidence = 1 - p_value
-                
-                # Store correlation
-                correlation_id = db.execute('''
-                    INSERT INTO habit_correlations (
-                        user_id, habit_pairs, correlation_score,
-                        confidence_score, supporting_data, analysis_period
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (user_id,
-                      json.dumps({'habit1': habit1['id'], 'habit2': habit2['id']}),
-                      correlation, confidence,
-                      json.dumps({'n_days': len(data1), 'p_value': p_value}),
-                      f'[{start_date},{end_date}]')).fetchone()['id']
-                
-                correlations.append({
-                    'id': correlation_id,
-                    'habit1': habit1['name'],
-                    'habit2': habit2['name'],
-                    'correlation': correlation,
-                    'confidence': confidence
-                })
+    # One query for every completion in the window
+    completions = db.execute('''
+        SELECT habit_id, completion_date
+        FROM habit_completions
+        WHERE user_id = %s
+        AND completion_date BETWEEN %s AND %s
+    ''', (user_id, start_date, end_date)).fetchall()
     
+    n_days = (end_date - start_date).days + 1
+    matrix = build_completion_matrix([h['id'] for h in habits], completions, start_date, n_days)
+    correlation, p_values = correlation_matrix(matrix)
+    
+    pairs = [(i, j) for i, j in zip(*np.triu_indices(len(habits), k=1))
+             if np.isfinite(correlation[i, j]) and np.isfinite(p_values[i, j])]
+    analysis_period = f'[{start_date},{end_date}]'
+    rows = [(user_id,
+             json.dumps({'habit1': str(habits[i]['id']), 'habit2': str(habits[j]['id'])}),
+             float(correlation[i, j]), 1 - float(p_values[i, j]),
+             json.dumps({'n_days': n_days, 'p_value': float(p_values[i, j])}),
+             analysis_period)
+            for i, j in pairs]
+    
+    # Replace this period's results in a single multi-row insert
+    db.execute('''
+        DELETE FROM habit_correlations
+        WHERE user_id = %s AND analysis_period = %s::tstzrange
+    ''', (user_id, analysis_period))
+    ids = []
+    if rows:
+        ids = [row[0] for row in execute_values(db.cursor(), '''
+            INSERT INTO habit_correlations (
+                user_id, habit_pairs, correlation_score,
+                confidence_score, supporting_data, analysis_period
+            )
+            VALUES %s
+            RETURNING id
+        ''', rows, page_size=len(rows), fetch=True)]
     db.commit()
-    return correlations
+    
+    return [{
+        'id': correlation_id,
+        'habit1': habits[i]['name'],
+        'habit2': habits[j]['name'],
+        'correlation': float(correlation[i, j]),
+        'confidence': 1 - float(p_values[i, j]),
+        'p_value': float(p_values[i, j])
+    } for correlation_id, (i, j) in zip(ids, pairs)]
 
-def get_habit_completion_data(db, user_id, habit_id, start_date, end_date):
-    """Get daily completion data for a habit"""
-    return db.execute('''
-        SELECT CASE WHEN completed THEN 1 ELSE 0 END as value
-        FROM habit_tracking
-        WHERE user_id = %s
-        AND habit_id = %s
-        AND date BETWEEN %s AND %s
-        ORDER BY date
-    ''', (user_id, habit_id, start_date, end_date)).fetchall()
+def build_completion_matrix(habit_ids, completions, start_date, n_days):
+    """Habits x days 0/1 matrix, aligned on calendar days"""
+    rows = {habit_id: i for i, habit_id in enumerate(habit_ids)}
+    matrix = np.zeros((len(habit_ids), n_days))
+    for completion in completions:
+        row = rows.get(completion['habit_id'])
+        day = (parse_day(completion['completion_date']) - start_date).days
+        if row is not None and 0 <= day < n_days:
+            matrix[row, day] = 1
+    return matrix
+
+def correlation_matrix(matrix):
+    """Pearson correlation and two-sided p-value for every pair of rows.
+    
+    Rows without variance (never or always completed) get NaN, as there is
+    nothing to correlate.
+    """
+    n = matrix.shape[1]
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.sqrt((centered ** 2).sum(axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = (centered @ centered.T) / np.outer(norms, norms)
+    correlation = np.clip(correlation, -1, 1)
+    
+    if n < 3:
+        return correlation, np.full_like(correlation, np.nan)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = correlation * np.sqrt((n - 2) / (1 - correlation ** 2))
+    p_values = 2 * stats.t.sf(np.abs(t), n - 2)
+    return correlation, p_values
 
 def update_real_time_metric(db, user_id, metric_type):
     """Update a real-time metric"""
@@ -367,16 +463,18 @@ def update_real_time_metric(db, user_id, metric_type):
         db.execute('''
             UPDATE real_time_metrics
             SET current_value = %s,
-                historical_values = jsonb_set(
-                    historical_values,
-                    array[to_char(NOW(), 'YYYY-MM-DD HH24:MI')],
-                    %s::jsonb
-                ),
                 last_updated = NOW()
             WHERE user_id = %s AND metric_type = %s
-        ''', (json.dumps(value), json.dumps(value), user_id, metric_type))
+        ''', (json.dumps(value), user_id, metric_type))
+        # History goes to metric_samples, not the row itself
+        record_sample(db, user_id, metric_type, value)
         
         db.commit()
+        publish_event(user_id, 'metric', {
+            'metric_type': metric_type,
+            'value': value,
+            'timestamp': now.isoformat()
+        })
 
 def calculate_current_productivity(db, user_id):
     """Calculate current productivity score"""
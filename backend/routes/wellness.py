@@ -3,6 +3,7 @@ from datetime import datetime, timedelta, time
 import json
 from ..db import get_db
 from ..auth import require_auth
+from ..rollups import fetch_daily_rollups
 
 wellness_bp = Blueprint('wellness', __name__)
 
@@ -283,27 +284,16 @@ def update_mindfulness_stats(db, user_id):
 
 def calculate_work_life_balance(db, user_id, date):
     """Calculate work-life balance score and metrics"""
-    # Get work hours
-    work_hours = db.execute('''
-        SELECT COALESCE(SUM(EXTRACT(EPOCH FROM duration)/3600), 0) as hours
-        FROM time_entries
-        WHERE user_id = %s
-        AND start_time::date = %s
-        AND category = 'work'
-    ''', (user_id, date)).fetchone()['hours']
-    
-    # Get personal activities
-    personal = db.execute('''
-        SELECT 
-            COALESCE(SUM(CASE WHEN category = 'exercise' 
-                THEN EXTRACT(EPOCH FROM duration)/60 ELSE 0 END), 0) as exercise_minutes,
-            COALESCE(SUM(CASE WHEN category != 'work' AND category != 'exercise'
-                THEN EXTRACT(EPOCH FROM duration)/3600 ELSE 0 END), 0) as personal_hours,
-            array_agg(DISTINCT CASE WHEN category != 'work' THEN category END) as activities
-        FROM time_entries
-        WHERE user_id = %s
-        AND start_time::date = %s
-    ''', (user_id, date)).fetchone()
+    # Time tracked per category comes from the daily rollup
+    minutes = fetch_daily_rollups(db, user_id, date, date)[0]['time_minutes_by_category']
+    work_hours = minutes.get('work', 0) / 60
+    personal = {
+        'exercise_minutes': minutes.get('exercise', 0),
+        'personal_hours': sum(value for category, value in minutes.items()
+                              if category not in ('work', 'exercise')) / 60,
+        'activities': [category for category, value in minutes.items()
+                       if category != 'work' and value]
+    }
     
     # Calculate balance score
     factors = {
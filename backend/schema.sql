@@ -1563,7 +1563,7 @@ create table report_exports (
     user_id uuid references auth.users(id) not null,
     template_id uuid references report_templates(id) not null,
     name text not null,
-    format text not null check (format in ('pdf', 'csv', 'excel', 'json')),
+    format text not null check (format in ('pdf', 'csv', 'excel', 'json', 'parquet', 'arrow')),
     data jsonb not null,
     file_url text,
     file_size bigint,
@@ -1591,8 +1591,15 @@ create table report_executions (
     parameters jsonb,
     execution_time interval,
     row_count integer,
-    status text not null check (status in ('running', 'completed', 'failed')),
+    status text not null check (status in ('queued', 'running', 'completed', 'failed')),
+    progress integer default 0 check (progress >= 0 and progress <= 100),
+    job_id text,
+    attempts integer default 0,
+    export_id uuid references report_exports(id),
     error_details text,
+    scheduled_for timestamp with time zone,
+    started_at timestamp with time zone,
+    completed_at timestamp with time zone,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
@@ -1626,7 +1633,9 @@ create index report_templates_user_type_idx on report_templates(user_id, report_
 create index scheduled_reports_user_template_idx on scheduled_reports(user_id, template_id);
 create index report_exports_user_template_idx on report_exports(user_id, template_id);
 create index report_shares_report_idx on report_shares(report_id);
+create index scheduled_reports_due_idx on scheduled_reports(next_run) where is_active;
 create index report_executions_template_idx on report_executions(template_id);
+create index report_executions_user_status_idx on report_executions(user_id, status);
 create index report_insights_report_idx on report_insights(report_id);
 create index report_subscriptions_user_idx on report_subscriptions(user_id);
 
@@ -45,9 +45,14 @@ create table if not exists prize_draws (
     description text,
     prize text not null,
     points_required integer not null,
-    status text not null check (status in ('active', 'completed', 'cancelled')) default 'active',
+    status text not null check (status in ('active', 'completed', 'cancelling', 'cancelled')) default 'active',
     start_date timestamp with time zone not null default now(),
     end_date timestamp with time zone not null,
+    winner_id uuid,
+    winner_ids uuid[],
+    draw_seed text,
+    draw_audit jsonb,
+    refund_progress jsonb,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
@@ -99,7 +104,1107 @@ create table if not exists user_achievements (
     unique(user_id, achievement_id)
 );
 
+-- Habit streak index (backfill with rebuild_habit_streaks.py)
+alter table habits add column if not exists current_streak integer default 0;
+alter table habits add column if not exists longest_streak integer default 0;
+alter table habits add column if not exists last_completion_date date;
+
+-- Per-user daily rollups, maintained by triggers on the source tables
+-- (rebuild with rebuild_daily_rollups.py)
+create table if not exists user_daily_rollups (
+    user_id uuid not null,
+    day date not null,
+    points_earned integer not null default 0,
+    points_spent integer not null default 0,
+    goals_completed integer not null default 0,
+    habit_completions integer not null default 0,
+    focus_sessions integer not null default 0,
+    focus_minutes integer not null default 0,
+    mood_entries integer not null default 0,
+    mood_total numeric not null default 0,
+    challenges_completed integer not null default 0,
+    time_minutes numeric not null default 0,
+    time_minutes_by_category jsonb not null default '{}'::jsonb,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    primary key (user_id, day)
+);
+
+create or replace function bump_daily_rollup(
+    p_user_id uuid, p_day date, p_counters jsonb, p_category text default null
+) returns void as $$
+declare
+    minutes numeric := coalesce((p_counters->>'time_minutes')::numeric, 0);
+begin
+    if p_user_id is null or p_day is null then
+        return;
+    end if;
+
+    insert into user_daily_rollups (user_id, day) values (p_user_id, p_day)
+    on conflict (user_id, day) do nothing;
+
+    update user_daily_rollups set
+        points_earned = points_earned + coalesce((p_counters->>'points_earned')::integer, 0),
+        points_spent = points_spent + coalesce((p_counters->>'points_spent')::integer, 0),
+        goals_completed = goals_completed + coalesce((p_counters->>'goals_completed')::integer, 0),
+        habit_completions = habit_completions + coalesce((p_counters->>'habit_completions')::integer, 0),
+        focus_sessions = focus_sessions + coalesce((p_counters->>'focus_sessions')::integer, 0),
+        focus_minutes = focus_minutes + coalesce((p_counters->>'focus_minutes')::integer, 0),
+        mood_entries = mood_entries + coalesce((p_counters->>'mood_entries')::integer, 0),
+        mood_total = mood_total + coalesce((p_counters->>'mood_total')::numeric, 0),
+        challenges_completed = challenges_completed + coalesce((p_counters->>'challenges_completed')::integer, 0),
+        time_minutes = time_minutes + minutes,
+        time_minutes_by_category = case
+            when p_category is null or minutes = 0 then time_minutes_by_category
+            else time_minutes_by_category || jsonb_build_object(p_category,
+                coalesce((time_minutes_by_category->>p_category)::numeric, 0) + minutes)
+        end,
+        updated_at = timezone('utc'::text, now())
+    where user_id = p_user_id and day = p_day;
+end;
+$$ language plpgsql;
+
+-- Each trigger removes the old row's contribution and adds the new row's,
+-- so inserts, updates and deletes all keep the rollups exact.
+create or replace function rollup_points() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform bump_daily_rollup(old.user_id, old.created_at::date, jsonb_build_object(
+            'points_earned', -greatest(old.points, 0),
+            'points_spent', -greatest(-old.points, 0)));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform bump_daily_rollup(new.user_id, new.created_at::date, jsonb_build_object(
+            'points_earned', greatest(new.points, 0),
+            'points_spent', greatest(-new.points, 0)));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace function rollup_goals() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.status = 'completed' then
+        perform bump_daily_rollup(old.user_id, old.updated_at::date,
+            jsonb_build_object('goals_completed', -1));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.status = 'completed' then
+        perform bump_daily_rollup(new.user_id, new.updated_at::date,
+            jsonb_build_object('goals_completed', 1));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace function rollup_habit_completions() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform bump_daily_rollup(old.user_id, old.completion_date::date,
+            jsonb_build_object('habit_completions', -1));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform bump_daily_rollup(new.user_id, new.completion_date::date,
+            jsonb_build_object('habit_completions', 1));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace function rollup_focus_sessions() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.status = 'completed' then
+        perform bump_daily_rollup(old.user_id, old.start_time::date, jsonb_build_object(
+            'focus_sessions', -1, 'focus_minutes', -coalesce(old.duration, 0)));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.status = 'completed' then
+        perform bump_daily_rollup(new.user_id, new.start_time::date, jsonb_build_object(
+            'focus_sessions', 1, 'focus_minutes', coalesce(new.duration, 0)));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace function rollup_mood_entries() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform bump_daily_rollup(old.user_id, old.created_at::date, jsonb_build_object(
+            'mood_entries', -1, 'mood_total', -coalesce(old.mood_rating, 0)));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform bump_daily_rollup(new.user_id, new.created_at::date, jsonb_build_object(
+            'mood_entries', 1, 'mood_total', coalesce(new.mood_rating, 0)));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace function rollup_user_challenges() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.status = 'completed' then
+        perform bump_daily_rollup(old.user_id, old.created_at::date,
+            jsonb_build_object('challenges_completed', -1));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.status = 'completed' then
+        perform bump_daily_rollup(new.user_id, new.created_at::date,
+            jsonb_build_object('challenges_completed', 1));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace function rollup_time_entries() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform bump_daily_rollup(old.user_id, old.start_time::date, jsonb_build_object(
+            'time_minutes', -coalesce(extract(epoch from old.duration) / 60, 0)), old.category);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform bump_daily_rollup(new.user_id, new.start_time::date, jsonb_build_object(
+            'time_minutes', coalesce(extract(epoch from new.duration) / 60, 0)), new.category);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists points_log_rollup on points_log;
+create trigger points_log_rollup after insert or update or delete on points_log
+    for each row execute function rollup_points();
+drop trigger if exists points_history_rollup on points_history;
+create trigger points_history_rollup after insert or update or delete on points_history
+    for each row execute function rollup_points();
+drop trigger if exists goals_rollup on goals;
+create trigger goals_rollup after insert or update or delete on goals
+    for each row execute function rollup_goals();
+drop trigger if exists habit_completions_rollup on habit_completions;
+create trigger habit_completions_rollup after insert or update or delete on habit_completions
+    for each row execute function rollup_habit_completions();
+drop trigger if exists focus_sessions_rollup on focus_sessions;
+create trigger focus_sessions_rollup after insert or update or delete on focus_sessions
+    for each row execute function rollup_focus_sessions();
+drop trigger if exists mood_entries_rollup on mood_entries;
+create trigger mood_entries_rollup after insert or update or delete on mood_entries
+    for each row execute function rollup_mood_entries();
+drop trigger if exists user_challenges_rollup on user_challenges;
+create trigger user_challenges_rollup after insert or update or delete on user_challenges
+    for each row execute function rollup_user_challenges();
+drop trigger if exists time_entries_rollup on time_entries;
+create trigger time_entries_rollup after insert or update or delete on time_entries
+    for each row execute function rollup_time_entries();
+
+-- Recompute rollups from the source tables (all users when p_user_id is null)
+create or replace function rebuild_daily_rollups(p_user_id uuid default null)
+returns integer as $$
+declare
+    rebuilt integer;
+begin
+    delete from user_daily_rollups where p_user_id is null or user_id = p_user_id;
+
+    insert into user_daily_rollups (
+        user_id, day, points_earned, points_spent, goals_completed,
+        habit_completions, focus_sessions, focus_minutes, mood_entries,
+        mood_total, challenges_completed, time_minutes, time_minutes_by_category
+    )
+    select user_id, day,
+        sum(points_earned), sum(points_spent), sum(goals_completed),
+        sum(habit_completions), sum(focus_sessions), sum(focus_minutes),
+        sum(mood_entries), sum(mood_total), sum(challenges_completed),
+        sum(time_minutes),
+        coalesce(jsonb_object_agg(category, category_minutes)
+            filter (where category is not null), '{}'::jsonb)
+    from (
+        select user_id, created_at::date as day,
+            sum(greatest(points, 0)) as points_earned, sum(greatest(-points, 0)) as points_spent,
+            0 as goals_completed, 0 as habit_completions, 0 as focus_sessions, 0 as focus_minutes,
+            0 as mood_entries, 0 as mood_total, 0 as challenges_completed,
+            0 as time_minutes, null::text as category, null::numeric as category_minutes
+        from (select user_id, points, created_at from points_log
+              union all
+              select user_id, points, created_at from points_history) points
+        where p_user_id is null or user_id = p_user_id
+        group by 1, 2
+        union all
+        select user_id, updated_at::date, 0, 0, count(*), 0, 0, 0, 0, 0, 0, 0, null, null
+        from goals
+        where status = 'completed' and (p_user_id is null or user_id = p_user_id)
+        group by 1, 2
+        union all
+        select user_id, completion_date::date, 0, 0, 0, count(*), 0, 0, 0, 0, 0, 0, null, null
+        from habit_completions
+        where p_user_id is null or user_id = p_user_id
+        group by 1, 2
+        union all
+        select user_id, start_time::date, 0, 0, 0, 0, count(*), coalesce(sum(duration), 0), 0, 0, 0, 0, null, null
+        from focus_sessions
+        where status = 'completed' and (p_user_id is null or user_id = p_user_id)
+        group by 1, 2
+        union all
+        select user_id, created_at::date, 0, 0, 0, 0, 0, 0, count(*), coalesce(sum(mood_rating), 0), 0, 0, null, null
+        from mood_entries
+        where p_user_id is null or user_id = p_user_id
+        group by 1, 2
+        union all
+        select user_id, created_at::date, 0, 0, 0, 0, 0, 0, 0, 0, count(*), 0, null, null
+        from user_challenges
+        where status = 'completed' and (p_user_id is null or user_id = p_user_id)
+        group by 1, 2
+        union all
+        select user_id, start_time::date, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+            coalesce(sum(extract(epoch from duration) / 60), 0), category,
+            coalesce(sum(extract(epoch from duration) / 60), 0)
+        from time_entries
+        where p_user_id is null or user_id = p_user_id
+        group by 1, 2, category
+    ) sources
+    group by user_id, day;
+
+    get diagnostics rebuilt = row_count;
+    return rebuilt;
+end;
+$$ language plpgsql;
+
+alter table user_daily_rollups enable row level security;
+
+drop policy if exists "Users can view their own daily rollups" on user_daily_rollups;
+create policy "Users can view their own daily rollups"
+    on user_daily_rollups for select
+    using (auth.uid() = user_id);
+
+-- Points balance ledger: running totals per user, maintained by triggers on
+-- points_log and points_history in the same transaction as each award/refund
+-- (check with reconcile_points.py)
+alter table points_log add column if not exists category text;
+alter table points_log add column if not exists source text;
+alter table points_log add column if not exists source_id text;
+alter table points_history add column if not exists category text;
+alter table points_history add column if not exists source text;
+alter table points_history add column if not exists source_id text;
+
+create table if not exists user_points_balances (
+    user_id uuid primary key,
+    balance bigint not null default 0,
+    lifetime_earned bigint not null default 0,
+    lifetime_spent bigint not null default 0,
+    entries integer not null default 0,
+    category_totals jsonb not null default '{}'::jsonb,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- Category a points entry counts towards. New entries carry an explicit
+-- category; older rows are classified from their legacy category/source
+-- values or keywords in the free-text reason.
+create or replace function points_category(p_category text, p_source text, p_reason text)
+returns text as $$
+    select case
+        when p_category = 'goal_completion' then 'goals'
+        when p_category = 'achievement' then 'achievements'
+        when p_category = 'reward_redemption' then 'rewards'
+        when p_category like 'prize_draw%' then 'prize_draw'
+        when nullif(p_category, '') is not null then p_category
+        when p_source like 'habit%' then 'habits'
+        when p_source like 'focus%' then 'focus'
+        when p_source like 'goal%' then 'goals'
+        when p_reason ilike '%goal%' then 'goals'
+        when p_reason ilike '%habit%' then 'habits'
+        when p_reason ilike '%focus%' then 'focus'
+        when p_reason ilike '%mood%' then 'mood'
+        when p_reason ilike '%journal%' then 'journal'
+        when p_reason ilike '%quiz%' then 'quiz'
+        when p_reason ilike '%achievement%' then 'achievements'
+        when p_reason ilike '%reward%' then 'rewards'
+        when p_reason ilike '%prize draw%' then 'prize_draw'
+        else 'other'
+    end
+$$ language sql immutable;
+
+-- Category totals without categories whose points net to zero, so a
+-- category that lost all its entries looks the same as one never used
+create or replace function nonzero_category_totals(p_totals jsonb)
+returns jsonb as $$
+    select coalesce(jsonb_object_agg(t.key, t.value), '{}'::jsonb)
+    from jsonb_each(p_totals) t
+    where t.value <> '0'::jsonb
+$$ language sql immutable;
+
+create or replace function bump_points_balance(
+    p_user_id uuid, p_points integer, p_sign integer, p_category text
+) returns void as $$
+begin
+    insert into user_points_balances (user_id) values (p_user_id)
+    on conflict (user_id) do nothing;
+
+    update user_points_balances set
+        balance = balance + p_sign * p_points,
+        lifetime_earned = lifetime_earned + p_sign * greatest(p_points, 0),
+        lifetime_spent = lifetime_spent + p_sign * greatest(-p_points, 0),
+        entries = entries + p_sign,
+        category_totals = nonzero_category_totals(category_totals || jsonb_build_object(p_category,
+            coalesce((category_totals->>p_category)::bigint, 0) + p_sign * p_points)),
+        updated_at = timezone('utc'::text, now())
+    where user_id = p_user_id;
+end;
+$$ language plpgsql;
+
+create or replace function apply_points_to_balance() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform bump_points_balance(old.user_id, old.points, -1,
+            points_category(old.category, old.source, old.reason));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform bump_points_balance(new.user_id, new.points, 1,
+            points_category(new.category, new.source, new.reason));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists points_log_balance on points_log;
+create trigger points_log_balance after insert or update or delete on points_log
+    for each row execute function apply_points_to_balance();
+drop trigger if exists points_history_balance on points_history;
+create trigger points_history_balance after insert or update or delete on points_history
+    for each row execute function apply_points_to_balance();
+
+-- Give legacy rows an explicit category (the triggers move their points
+-- between ledger categories) so per-category queries can use an index
+update points_log set category = points_category(category, source, reason)
+where category is distinct from points_category(category, source, reason);
+update points_history set category = points_category(category, source, reason)
+where category is distinct from points_category(category, source, reason);
+
+create index if not exists points_log_user_category_idx on points_log(user_id, category);
+create index if not exists points_history_user_category_idx on points_history(user_id, category);
+
+create or replace function get_user_points(user_id_param uuid)
+returns bigint as $$
+    select coalesce((select balance from user_points_balances
+                     where user_id = user_id_param), 0)
+$$ language sql stable;
+
+-- Compare the ledger with totals recomputed from the logs. Returns users
+-- whose ledger is wrong; with p_fix the ledger rows are rewritten.
+create or replace function reconcile_points_balances(p_fix boolean default false)
+returns table (
+    user_id uuid,
+    ledger_balance bigint,
+    log_balance bigint,
+    ledger_entries integer,
+    log_entries integer
+) as $$
+begin
+    if p_fix then
+        -- Block new awards so the recomputed totals can't go stale mid-fix
+        lock table points_log, points_history in share mode;
+    end if;
+
+    create temporary table expected_balances on commit drop as
+    select totals.user_id,
+        sum(totals.points)::bigint as balance,
+        sum(totals.earned)::bigint as lifetime_earned,
+        sum(totals.spent)::bigint as lifetime_spent,
+        sum(totals.entries)::integer as entries,
+        nonzero_category_totals(jsonb_object_agg(totals.category, totals.points)) as category_totals
+    from (
+        select entries.user_id, entries.category,
+            sum(entries.points) as points, count(*) as entries,
+            -- Per entry, as bump_points_balance adds them, not from net sums
+            sum(greatest(entries.points, 0)) as earned,
+            sum(greatest(-entries.points, 0)) as spent
+        from (
+            select l.user_id, l.points, points_category(l.category, l.source, l.reason) as category
+            from points_log l
+            union all
+            select h.user_id, h.points, points_category(h.category, h.source, h.reason)
+            from points_history h
+        ) entries
+        group by entries.user_id, entries.category
+    ) totals
+    group by totals.user_id;
+
+    create temporary table mismatched_balances on commit drop as
+    select coalesce(e.user_id, b.user_id) as user_id,
+        coalesce(b.balance, 0) as ledger_balance,
+        coalesce(e.balance, 0) as log_balance,
+        coalesce(b.entries, 0) as ledger_entries,
+        coalesce(e.entries, 0) as log_entries
+    from expected_balances e
+    full outer join user_points_balances b on b.user_id = e.user_id
+    where b.user_id is null
+        or (e.user_id is null and (b.balance <> 0 or b.entries <> 0
+            or b.lifetime_earned <> 0 or b.lifetime_spent <> 0))
+        or b.balance <> e.balance
+        or b.entries <> e.entries
+        or b.lifetime_earned <> e.lifetime_earned
+        or b.lifetime_spent <> e.lifetime_spent
+        or nonzero_category_totals(b.category_totals) <> e.category_totals;
+
+    if p_fix then
+        delete from user_points_balances b
+        where b.user_id in (select m.user_id from mismatched_balances m);
+
+        insert into user_points_balances (
+            user_id, balance, lifetime_earned, lifetime_spent, entries, category_totals
+        )
+        select e.user_id, e.balance, e.lifetime_earned, e.lifetime_spent, e.entries, e.category_totals
+        from expected_balances e
+        where e.user_id in (select m.user_id from mismatched_balances m);
+    end if;
+
+    return query select * from mismatched_balances;
+end;
+$$ language plpgsql;
+
+alter table user_points_balances enable row level security;
+
+drop policy if exists "Users can view their own points balance" on user_points_balances;
+create policy "Users can view their own points balance"
+    on user_points_balances for select
+    using (auth.uid() = user_id);
+
+-- Points earned per user for seeding leaderboards (rebuild_leaderboards.py):
+-- lifetime totals from the ledger, or totals since p_since from the rollups.
+-- Prize draw refunds (the points_log rows with a refund_key) give back
+-- points that were never taken off the boards, so they are left out, as
+-- record_points leaves them out of the live boards.
+create or replace function leaderboard_totals(p_since date default null)
+returns table (user_id uuid, points bigint) as $$
+begin
+    if p_since is null then
+        return query
+        select b.user_id, b.lifetime_earned - coalesce(refunds.points, 0)
+        from user_points_balances b
+        left join (
+            select l.user_id, sum(l.points)::bigint as points
+            from points_log l
+            where l.refund_key is not null
+            group by l.user_id
+        ) refunds on refunds.user_id = b.user_id
+        where b.lifetime_earned - coalesce(refunds.points, 0) > 0;
+    else
+        return query
+        select earned.user_id, earned.points - coalesce(refunds.points, 0)
+        from (
+            select r.user_id, sum(r.points_earned)::bigint as points
+            from user_daily_rollups r
+            where r.day >= p_since
+            group by r.user_id
+        ) earned
+        left join (
+            select l.user_id, sum(l.points)::bigint as points
+            from points_log l
+            where l.refund_key is not null and l.created_at::date >= p_since
+            group by l.user_id
+        ) refunds on refunds.user_id = earned.user_id
+        where earned.points - coalesce(refunds.points, 0) > 0;
+    end if;
+end;
+$$ language plpgsql;
+
+-- Social feed: per-user materialized timelines (fan-out on write). Posts
+-- by users with more than p_max_followers friends are not copied into
+-- timelines; readers pull them (fan-in), as they do public posts.
+-- feed_fan_in marks authors with such posts so readers keep pulling them
+-- after the author drops back under the limit, until
+-- backfill_feed_timelines copies them into timelines.
+alter table user_profiles add column if not exists friend_count integer not null default 0;
+alter table user_profiles add column if not exists feed_fan_in boolean not null default false;
+alter table social_activities add column if not exists reaction_count integer not null default 0;
+alter table social_activities add column if not exists comment_count integer not null default 0;
+
+create table if not exists feed_items (
+    user_id uuid not null,
+    activity_id uuid references social_activities(id) on delete cascade not null,
+    author_id uuid not null,
+    created_at timestamp with time zone not null,
+    primary key (user_id, created_at, activity_id)
+);
+
+create index if not exists social_activities_public_feed_idx
+    on social_activities(created_at desc, id desc) where visibility = 'public';
+create index if not exists social_activities_author_feed_idx
+    on social_activities(user_id, created_at desc, id desc);
+create index if not exists friend_connections_friend_id_idx on friend_connections(friend_id, status);
+create index if not exists feed_items_user_author_idx on feed_items(user_id, author_id);
+
+-- Keeps friend_count current and, when a friendship ends, removes the
+-- friends-only posts the two users fanned out to each other's timelines
+create or replace function count_friends() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.status = 'accepted' then
+        update user_profiles set friend_count = friend_count - 1
+        where user_id in (old.user_id, old.friend_id);
+        if tg_op = 'DELETE' or new.status <> 'accepted' then
+            delete from feed_items
+            where (user_id = old.user_id and author_id = old.friend_id)
+               or (user_id = old.friend_id and author_id = old.user_id);
+        end if;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.status = 'accepted' then
+        update user_profiles set friend_count = friend_count + 1
+        where user_id in (new.user_id, new.friend_id);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists count_friends on friend_connections;
+create trigger count_friends after insert or update of status or delete on friend_connections
+    for each row execute function count_friends();
+
+-- Drop timeline rows left behind by friendships that ended before the
+-- trigger above removed them
+delete from feed_items fi
+where fi.user_id <> fi.author_id
+    and not exists (
+        select 1 from friend_connections fc
+        where fc.status = 'accepted'
+            and ((fc.user_id = fi.user_id and fc.friend_id = fi.author_id)
+                 or (fc.friend_id = fi.user_id and fc.user_id = fi.author_id))
+    );
+
+update user_profiles up set friend_count = (
+    select count(*) from friend_connections fc
+    where fc.status = 'accepted' and up.user_id in (fc.user_id, fc.friend_id)
+);
+
+-- Copy an activity into its author's and (for non-public posts by users
+-- below the fan-out limit) their friends' timelines
+create or replace function fan_out_activity(p_activity_id uuid, p_max_followers integer)
+returns integer as $$
+declare
+    v_activity social_activities;
+    v_rows integer;
+begin
+    select * into v_activity from social_activities where id = p_activity_id;
+    if not found then
+        return 0;
+    end if;
+
+    insert into feed_items (user_id, activity_id, author_id, created_at)
+    values (v_activity.user_id, v_activity.id, v_activity.user_id, v_activity.created_at)
+    on conflict do nothing;
+
+    if v_activity.visibility <> 'friends' then
+        return 1;
+    end if;
+
+    if coalesce((
+        select friend_count from user_profiles where user_id = v_activity.user_id
+    ), 0) > p_max_followers then
+        update user_profiles set feed_fan_in = true
+        where user_id = v_activity.user_id and not feed_fan_in;
+        return 1;
+    end if;
+
+    insert into feed_items (user_id, activity_id, author_id, created_at)
+    select case when fc.user_id = v_activity.user_id then fc.friend_id else fc.user_id end,
+        v_activity.id, v_activity.user_id, v_activity.created_at
+    from friend_connections fc
+    where (fc.user_id = v_activity.user_id or fc.friend_id = v_activity.user_id)
+        and fc.status = 'accepted'
+    on conflict do nothing;
+    get diagnostics v_rows = row_count;
+    return v_rows + 1;
+end;
+$$ language plpgsql;
+
+-- Fan out recent activities again under p_max_followers and stop pulling
+-- authors who are now under it. Run by rebuild_feed_timelines.py whenever
+-- FEED_FANOUT_MAX_FOLLOWERS changes, and periodically to settle authors
+-- whose friend count has dropped; returns the number of authors settled.
+create or replace function backfill_feed_timelines(p_max_followers integer, p_window interval default '90 days')
+returns integer as $$
+declare
+    v_authors integer;
+begin
+    perform fan_out_activity(id, p_max_followers) from social_activities
+    where created_at > now() - p_window;
+
+    update user_profiles set feed_fan_in = false
+    where feed_fan_in and friend_count <= p_max_followers;
+    get diagnostics v_authors = row_count;
+    return v_authors;
+end;
+$$ language plpgsql;
+
+-- Backfill timelines and counters for existing activities, with the
+-- default FEED_FANOUT_MAX_FOLLOWERS; rerun rebuild_feed_timelines.py if
+-- it is configured differently
+select backfill_feed_timelines(1000);
+
+update social_activities sa set
+    reaction_count = (select count(*) from activity_reactions ar where ar.activity_id = sa.id),
+    comment_count = (select count(*) from activity_comments ac where ac.activity_id = sa.id);
+
+alter table feed_items enable row level security;
+
+drop policy if exists "Users can view their own feed" on feed_items;
+create policy "Users can view their own feed"
+    on feed_items for select
+    using (auth.uid() = user_id);
+
+-- Reaction counts per type ({"like": 3, "support": 1}) next to the totals
+-- (check with repair_activity_counters.py)
+alter table social_activities add column if not exists reaction_counts jsonb not null default '{}'::jsonb;
+
+create index if not exists activity_comments_activity_id_idx on activity_comments(activity_id);
+
+-- Compare stored counters with counts recomputed from activity_reactions and
+-- activity_comments. Returns activities whose counters are wrong; with p_fix
+-- they are rewritten.
+create or replace function repair_activity_counters(p_fix boolean default false)
+returns table (
+    activity_id uuid,
+    stored_reactions integer,
+    actual_reactions integer,
+    stored_comments integer,
+    actual_comments integer
+) as $$
+begin
+    create temporary table mismatched_counters on commit drop as
+    select sa.id as activity_id,
+        sa.reaction_count as stored_reactions,
+        coalesce(r.total, 0)::integer as actual_reactions,
+        sa.comment_count as stored_comments,
+        coalesce(c.total, 0)::integer as actual_comments,
+        coalesce(r.by_type, '{}'::jsonb) as reaction_counts
+    from social_activities sa
+    left join (
+        select t.activity_id, sum(t.total) as total, jsonb_object_agg(t.reaction_type, t.total) as by_type
+        from (
+            select ar.activity_id, ar.reaction_type, count(*) as total
+            from activity_reactions ar
+            group by ar.activity_id, ar.reaction_type
+        ) t
+        group by t.activity_id
+    ) r on r.activity_id = sa.id
+    left join (
+        select ac.activity_id, count(*) as total
+        from activity_comments ac
+        group by ac.activity_id
+    ) c on c.activity_id = sa.id
+    where sa.reaction_count <> coalesce(r.total, 0)
+        or sa.comment_count <> coalesce(c.total, 0)
+        or sa.reaction_counts <> coalesce(r.by_type, '{}'::jsonb);
+
+    if p_fix then
+        update social_activities sa set
+            reaction_count = m.actual_reactions,
+            reaction_counts = m.reaction_counts,
+            comment_count = m.actual_comments
+        from mismatched_counters m
+        where sa.id = m.activity_id;
+    end if;
+
+    return query
+    select m.activity_id, m.stored_reactions, m.actual_reactions, m.stored_comments, m.actual_comments
+    from mismatched_counters m;
+end;
+$$ language plpgsql;
+
+select count(*) from repair_activity_counters(true);
+
+-- Prize draw cancellation: refunds are issued per user in chunks, each
+-- chunk in one transaction together with the draw's refund_progress. Every
+-- refund carries a refund_key, so retrying a cancellation never refunds a
+-- user twice.
+alter table points_log add column if not exists refund_key text;
+create unique index if not exists points_log_refund_key_idx on points_log(refund_key)
+    where refund_key is not null;
+create index if not exists prize_draw_entries_draw_user_idx on prize_draw_entries(draw_id, user_id);
+
+-- Move an active draw to 'cancelling' and return its progress and status;
+-- a draw that is already cancelling or cancelled is returned as is
+create or replace function begin_draw_cancellation(p_draw_id uuid)
+returns jsonb as $$
+declare
+    v_draw prize_draws;
+begin
+    select * into v_draw from prize_draws where id = p_draw_id for update;
+    if not found then
+        raise exception 'Draw % not found', p_draw_id;
+    end if;
+    if v_draw.status = 'completed' then
+        raise exception 'Draw % is already completed', p_draw_id;
+    end if;
+
+    if v_draw.status = 'active' then
+        update prize_draws set
+            status = 'cancelling',
+            refund_progress = jsonb_build_object(
+                'total_users', (select count(distinct e.user_id) from prize_draw_entries e
+                                where e.draw_id = p_draw_id),
+                'users', 0,
+                'refunded_points', 0,
+                'last_user_id', null)
+        where id = p_draw_id
+        returning * into v_draw;
+    end if;
+
+    return coalesce(v_draw.refund_progress, '{}'::jsonb) || jsonb_build_object('status', v_draw.status);
+end;
+$$ language plpgsql;
+
+-- Refund the next p_limit entrants (by user id) after p_after_user. Returns
+-- each user's refund and whether it was issued now; the draw becomes
+-- 'cancelled' with the last chunk.
+create or replace function refund_prize_draw_chunk(p_draw_id uuid, p_after_user uuid, p_limit integer)
+returns table (user_id uuid, points bigint, refunded boolean) as $$
+declare
+    v_draw prize_draws;
+    v_last_user uuid;
+begin
+    select * into v_draw from prize_draws d where d.id = p_draw_id for update;
+    if not found or v_draw.status <> 'cancelling' then
+        raise exception 'Draw % is not being cancelled', p_draw_id;
+    end if;
+
+    create temporary table refund_chunk on commit drop as
+    select e.user_id, sum(e.tickets)::bigint * v_draw.points_required as points, false as refunded
+    from prize_draw_entries e
+    where e.draw_id = p_draw_id and (p_after_user is null or e.user_id > p_after_user)
+    group by e.user_id
+    order by e.user_id
+    limit p_limit;
+
+    with inserted as (
+        insert into points_log (user_id, points, reason, category, source, source_id, refund_key)
+        select c.user_id, c.points, 'Refund for cancelled draw: ' || v_draw.title,
+            'prize_draw', 'prize_draw_refund', p_draw_id::text,
+            'prize_draw:' || p_draw_id || ':' || c.user_id
+        from refund_chunk c
+        on conflict (refund_key) where refund_key is not null do nothing
+        returning points_log.user_id
+    )
+    update refund_chunk c set refunded = true
+    from inserted i
+    where i.user_id = c.user_id;
+
+    select c.user_id into v_last_user from refund_chunk c order by c.user_id desc limit 1;
+
+    update prize_draws d set
+        refund_progress = d.refund_progress || jsonb_build_object(
+            'users', coalesce((d.refund_progress->>'users')::integer, 0)
+                + (select count(*) from refund_chunk),
+            'refunded_points', coalesce((d.refund_progress->>'refunded_points')::bigint, 0)
+                + (select coalesce(sum(c.points), 0) from refund_chunk c where c.refunded),
+            'last_user_id', coalesce(v_last_user::text, d.refund_progress->>'last_user_id')),
+        status = case when (select count(*) from refund_chunk) < p_limit
+                      then 'cancelled' else d.status end
+    where d.id = p_draw_id;
+
+    return query select c.user_id, c.points, c.refunded from refund_chunk c order by c.user_id;
+end;
+$$ language plpgsql;
+
+-- Real-time metric history: one row per user, metric, resolution and time
+-- bucket instead of an ever-growing historical_values document. Every
+-- sample is folded into its minute, hour and day bucket (count, sum, min,
+-- max), so a write costs three small upserts however long the history is.
+-- Old buckets are removed per resolution by prune_metric_samples. Buckets
+-- are truncated in UTC whatever the session time zone, matching
+-- metric_history.truncate.
+create table if not exists metric_samples (
+    user_id uuid references auth.users(id) not null,
+    metric_type text not null,
+    resolution text not null check (resolution in ('minute', 'hour', 'day')),
+    bucket timestamp with time zone not null,
+    sample_count integer not null,
+    value_sum double precision not null,
+    value_min double precision not null,
+    value_max double precision not null,
+    primary key (user_id, metric_type, resolution, bucket)
+);
+create index if not exists metric_samples_resolution_bucket_idx on metric_samples(resolution, bucket);
+
+create or replace function record_metric_sample(
+    p_user_id uuid, p_metric_type text, p_value double precision,
+    p_at timestamp with time zone default now())
+returns void as $$
+    insert into metric_samples as s
+        (user_id, metric_type, resolution, bucket, sample_count, value_sum, value_min, value_max)
+    select p_user_id, p_metric_type, r.resolution, date_trunc(r.resolution, p_at, 'UTC'), 1, p_value, p_value, p_value
+    from (values ('minute'), ('hour'), ('day')) r(resolution)
+    on conflict (user_id, metric_type, resolution, bucket) do update set
+        sample_count = s.sample_count + excluded.sample_count,
+        value_sum = s.value_sum + excluded.value_sum,
+        value_min = least(s.value_min, excluded.value_min),
+        value_max = greatest(s.value_max, excluded.value_max);
+$$ language sql;
+
+-- Delete buckets older than each resolution's retention; returns the
+-- number of rows removed per resolution
+create or replace function prune_metric_samples(
+    p_minute_retention interval default '2 days',
+    p_hour_retention interval default '90 days',
+    p_day_retention interval default '2 years')
+returns table (resolution text, deleted bigint) as $$
+    with pruned as (
+        delete from metric_samples s
+        using (values ('minute', p_minute_retention), ('hour', p_hour_retention),
+                      ('day', p_day_retention)) r(resolution, retention)
+        where s.resolution = r.resolution and s.bucket < now() - r.retention
+        returning s.resolution
+    )
+    select p.resolution, count(*) from pruned p group by p.resolution;
+$$ language sql;
+
+-- Move existing historical_values into metric_samples, then empty them
+insert into metric_samples as s
+    (user_id, metric_type, resolution, bucket, sample_count, value_sum, value_min, value_max)
+select m.user_id, m.metric_type, r.resolution, date_trunc(r.resolution, h.at, 'UTC'),
+    count(*), sum(h.value), min(h.value), max(h.value)
+from real_time_metrics m
+cross join lateral (
+    select to_timestamp(e.key, 'YYYY-MM-DD HH24:MI') as at,
+        (case when jsonb_typeof(e.value) = 'number' then e.value #>> '{}'
+              else coalesce(e.value->>'score', e.value->>'level') end)::double precision as value
+    from jsonb_each(m.historical_values) e
+) h
+cross join (values ('minute'), ('hour'), ('day')) r(resolution)
+where jsonb_typeof(m.historical_values) = 'object' and h.value is not null
+group by m.user_id, m.metric_type, r.resolution, date_trunc(r.resolution, h.at, 'UTC')
+on conflict (user_id, metric_type, resolution, bucket) do update set
+    sample_count = s.sample_count + excluded.sample_count,
+    value_sum = s.value_sum + excluded.value_sum,
+    value_min = least(s.value_min, excluded.value_min),
+    value_max = greatest(s.value_max, excluded.value_max);
+
+update real_time_metrics set historical_values = '{}'::jsonb
+where historical_values <> '{}'::jsonb;
+
+alter table metric_samples enable row level security;
+
+drop policy if exists "Users can view their own metric samples" on metric_samples;
+create policy "Users can view their own metric samples"
+    on metric_samples for select
+    using (auth.uid() = user_id);
+
+-- Audit logs partitioned by month. Partitions are created ahead of time by
+-- ensure_audit_log_partitions and dropped whole once past retention by
+-- drop_audit_log_partitions (both run by maintain_audit_partitions.py).
+-- Rows outside every monthly partition land in audit_logs_default, so
+-- writes never fail; ensure_audit_log_partitions moves them into their
+-- month when it creates that partition.
+do $$
+begin
+    if exists (select 1 from pg_class where relname = 'audit_logs' and relkind = 'r') then
+        alter table audit_logs rename to audit_logs_unpartitioned;
+        alter index if exists audit_logs_pkey rename to audit_logs_unpartitioned_pkey;
+        alter index if exists audit_logs_user_type_idx rename to audit_logs_unpartitioned_user_type_idx;
+        alter index if exists audit_logs_category_idx rename to audit_logs_unpartitioned_category_idx;
+    end if;
+end $$;
+
+create table if not exists audit_logs (
+    id uuid default uuid_generate_v4() not null,
+    user_id uuid references auth.users(id) not null,
+    event_type text not null,
+    event_category text not null check (event_category in ('security', 'data', 'privacy', 'system', 'user')),
+    event_data jsonb not null,
+    ip_address text,
+    user_agent text,
+    status text not null check (status in ('success', 'failure', 'warning')),
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    primary key (id, created_at)
+) partition by range (created_at);
+
+create table if not exists audit_logs_default partition of audit_logs default;
+
+create index if not exists audit_logs_user_created_idx on audit_logs(user_id, created_at desc, id desc);
+create index if not exists audit_logs_user_type_idx on audit_logs(user_id, event_type);
+create index if not exists audit_logs_category_idx on audit_logs(event_category);
+
+-- Create monthly partitions from the oldest unpartitioned row through
+-- p_months_ahead months from now; returns the partitions created
+create or replace function ensure_audit_log_partitions(p_months_ahead integer default 3)
+returns setof text as $$
+declare
+    v_month timestamp with time zone;
+    v_name text;
+begin
+    for v_month in
+        select generate_series(
+            date_trunc('month', least(coalesce((select min(created_at) from audit_logs_default), now()), now())),
+            date_trunc('month', now()) + make_interval(months => p_months_ahead),
+            interval '1 month')
+    loop
+        v_name := 'audit_logs_' || to_char(v_month, 'YYYY_MM');
+        continue when to_regclass(v_name) is not null;
+
+        execute format('create table %I (like audit_logs including defaults including constraints)', v_name);
+        execute format(
+            'with moved as (delete from audit_logs_default where created_at >= %L and created_at < %L returning *)
+             insert into %I select * from moved',
+            v_month, v_month + interval '1 month', v_name);
+        execute format('alter table audit_logs attach partition %I for values from (%L) to (%L)',
+            v_name, v_month, v_month + interval '1 month');
+        return next v_name;
+    end loop;
+end;
+$$ language plpgsql;
+
+-- Drop monthly partitions that ended more than p_retention ago; returns
+-- the partitions dropped
+create or replace function drop_audit_log_partitions(p_retention interval default '2 years')
+returns setof text as $$
+declare
+    v_name text;
+begin
+    for v_name in
+        select c.relname
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = 'audit_logs'::regclass
+        and c.relname ~ '^audit_logs_[0-9]{4}_[0-9]{2}$'
+        and to_timestamp(substring(c.relname from 12), 'YYYY_MM') + interval '1 month' <= now() - p_retention
+        order by c.relname
+    loop
+        execute format('alter table audit_logs detach partition %I', v_name);
+        execute format('drop table %I', v_name);
+        return next v_name;
+    end loop;
+end;
+$$ language plpgsql;
+
+do $$
+begin
+    if to_regclass('audit_logs_unpartitioned') is not null then
+        insert into audit_logs (id, user_id, event_type, event_category, event_data,
+                                ip_address, user_agent, status, created_at)
+        select id, user_id, event_type, event_category, event_data,
+               ip_address, user_agent, status, created_at
+        from audit_logs_unpartitioned;
+        drop table audit_logs_unpartitioned;
+    end if;
+end $$;
+
+select ensure_audit_log_partitions(3);
+
+alter table audit_logs enable row level security;
+
+drop policy if exists "Users can view their own audit logs" on audit_logs;
+create policy "Users can view their own audit logs"
+    on audit_logs for select
+    using (auth.uid() = user_id);
+
+drop policy if exists "System can create audit logs" on audit_logs;
+create policy "System can create audit logs"
+    on audit_logs for insert
+    with check (true);
+
+-- Report data versions: a row-level trigger on every table a report reads
+-- bumps the writing user's version of that table in the same transaction,
+-- so cached reports (keyed by the requesting user's versions) are
+-- invalidated exactly when a change to that user's rows commits, and
+-- writers only ever contend on their own user's row. Only tables with a
+-- user_id column can be tracked (report_sources); reports over other
+-- tables are never cached.
+drop table if exists report_source_versions;
+
+create table if not exists report_sources (
+    table_name text primary key,
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create table if not exists report_source_user_versions (
+    table_name text not null references report_sources(table_name) on delete cascade,
+    user_id uuid not null,
+    version bigint not null default 0,
+    changed_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    primary key (table_name, user_id)
+);
+
+create or replace function bump_report_source_version_for(p_table text, p_user_id uuid)
+returns void as $$
+begin
+    if p_user_id is null then
+        return;
+    end if;
+    insert into report_source_user_versions (table_name, user_id, version)
+    values (p_table, p_user_id, 1)
+    on conflict (table_name, user_id) do update
+    set version = report_source_user_versions.version + 1, changed_at = now();
+end;
+$$ language plpgsql;
+
+create or replace function bump_report_source_version()
+returns trigger as $$
+begin
+    if tg_op = 'TRUNCATE' then
+        update report_source_user_versions
+        set version = version + 1, changed_at = now()
+        where table_name = tg_table_name;
+        return null;
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform bump_report_source_version_for(tg_table_name, old.user_id);
+    end if;
+    if tg_op = 'INSERT' or (tg_op = 'UPDATE' and new.user_id is distinct from old.user_id) then
+        perform bump_report_source_version_for(tg_table_name, new.user_id);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+-- Start tracking a table a report reads from; no-op for unknown, already
+-- tracked or not per-user tables
+create or replace function track_report_source(p_table text)
+returns void as $$
+begin
+    if to_regclass(format('public.%I', p_table)) is null
+       or exists (select 1 from report_sources where table_name = p_table)
+       or not exists (
+           select 1 from information_schema.columns
+           where table_schema = 'public' and table_name = p_table and column_name = 'user_id') then
+        return;
+    end if;
+    execute format('drop trigger if exists bump_report_source_version on public.%I', p_table);
+    execute format('drop trigger if exists bump_report_source_version_truncate on public.%I', p_table);
+    execute format('create trigger bump_report_source_version
+        after insert or update or delete on public.%I
+        for each row execute function bump_report_source_version()', p_table);
+    execute format('create trigger bump_report_source_version_truncate
+        after truncate on public.%I
+        for each statement execute function bump_report_source_version()', p_table);
+    insert into report_sources (table_name) values (p_table) on conflict do nothing;
+end;
+$$ language plpgsql security definer;
+
+create or replace function track_report_template_sources()
+returns trigger as $$
+begin
+    perform track_report_source(source) from unnest(new.data_sources) source;
+    return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists track_report_template_sources on report_templates;
+create trigger track_report_template_sources
+    after insert or update of data_sources on report_templates
+    for each row execute function track_report_template_sources();
+
+select track_report_source(source)
+from (select distinct unnest(data_sources) as source from report_templates) sources;
+
+-- Report charts: the spec of every rendered chart and the user it was
+-- rendered for. Images are cached by chart_id and evicted with the report
+-- cache; /charts/<chart_id>.png checks access here and redraws evicted
+-- images from the spec.
+create table if not exists report_charts (
+    chart_id text not null,
+    user_id uuid references auth.users(id) on delete cascade not null,
+    template_id uuid references report_templates(id) on delete cascade not null,
+    chart_type text not null,
+    title text,
+    columns jsonb not null,
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    primary key (chart_id, user_id)
+);
+
+create index if not exists report_charts_template_id_idx on report_charts(template_id);
+
 -- Create indexes
+create index if not exists habit_completions_habit_id_date_idx on habit_completions(habit_id, completion_date);
 create index if not exists transactions_user_id_date_idx on transactions(user_id, date);
 create index if not exists prize_draws_status_end_date_idx on prize_draws(status, end_date);
 create index if not exists prize_draw_entries_draw_id_idx on prize_draw_entries(draw_id);
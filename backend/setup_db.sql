@@ -126,6 +126,7 @@ create table if not exists habits (
     target_value integer,
     current_streak integer default 0,
     longest_streak integer default 0,
+    last_completion_date date,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null,
     updated_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
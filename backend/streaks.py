@@ -0,0 +1,109 @@
+"""
+Habit streak index.
+
+Each habit row carries ``current_streak``, ``longest_streak`` and
+``last_completion_date``. Completions advance the index in O(1); removing a
+completion rebuilds the habit from ``habit_completions``. ``current_streak``
+is the length of the run ending on ``last_completion_date`` and is only
+reported as alive while that date is today or yesterday.
+"""
+from datetime import date, datetime, timedelta
+
+PAGE_SIZE = 1000
+
+def _to_date(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+def empty_index():
+    return {'current_streak': 0, 'longest_streak': 0, 'last_completion_date': None}
+
+def read_index(habit):
+    """Extract the streak index from a habit row"""
+    return {
+        'current_streak': habit.get('current_streak') or 0,
+        'longest_streak': habit.get('longest_streak') or 0,
+        'last_completion_date': _to_date(habit.get('last_completion_date'))
+    }
+
+def advance_streak(index, completion_date):
+    """Return the index after recording a completion on ``completion_date``"""
+    completion_date = _to_date(completion_date)
+    last = index['last_completion_date']
+    current = index['current_streak']
+
+    if last is not None and completion_date <= last:
+        # Same day or backdated completion: nothing to extend incrementally
+        return dict(index)
+
+    if last is not None and completion_date - last == timedelta(days=1):
+        current += 1
+    else:
+        current = 1
+
+    return {
+        'current_streak': current,
+        'longest_streak': max(index['longest_streak'], current),
+        'last_completion_date': completion_date
+    }
+
+def compute_index(completion_dates):
+    """Build the index from scratch out of any iterable of completion dates"""
+    index = empty_index()
+    for day in sorted({_to_date(d) for d in completion_dates}):
+        index = advance_streak(index, day)
+    return index
+
+def live_streak(index, today=None):
+    """Streak as seen today: zero once a full day has been missed"""
+    today = today or datetime.now().date()
+    last = index['last_completion_date']
+    if last is None or (today - last).days > 1:
+        return 0
+    return index['current_streak']
+
+def serialize_index(index):
+    last = index['last_completion_date']
+    return {
+        'current_streak': index['current_streak'],
+        'longest_streak': index['longest_streak'],
+        'last_completion_date': last.isoformat() if last else None
+    }
+
+def save_index(client, habit_id, index):
+    client.table('habits') \
+        .update(serialize_index(index)) \
+        .eq('id', habit_id) \
+        .execute()
+
+def record_completion(client, habit, completion_date):
+    """Advance and persist the index for a newly inserted completion"""
+    index = advance_streak(read_index(habit), completion_date)
+    if index != read_index(habit):
+        save_index(client, habit['id'], index)
+    return index
+
+def fetch_completion_dates(client, habit_id):
+    """Page through every completion date recorded for a habit"""
+    dates = []
+    offset = 0
+    while True:
+        response = client.table('habit_completions') \
+            .select('completion_date') \
+            .eq('habit_id', habit_id) \
+            .order('completion_date') \
+            .range(offset, offset + PAGE_SIZE - 1) \
+            .execute()
+        dates.extend(row['completion_date'] for row in response.data)
+        if len(response.data) < PAGE_SIZE:
+            return dates
+        offset += PAGE_SIZE
+
+def rebuild_habit_index(client, habit_id):
+    """Recompute and persist a habit's index from ``habit_completions``"""
+    index = compute_index(fetch_completion_dates(client, habit_id))
+    save_index(client, habit_id, index)
+    return index
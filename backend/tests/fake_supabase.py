@@ -0,0 +1,86 @@
+"""
+In-memory stand-in for the Supabase query builder.
+
+Only the filters the routes use are supported. Every execute() counts as one
+round trip so tests and benchmarks can assert on request counts.
+"""
+from types import SimpleNamespace
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.filters = []
+        self.columns = '*'
+        self.ordering = []
+        self.window = None
+        self.one = False
+
+    def select(self, columns='*'):
+        self.columns = columns
+        return self
+
+    def eq(self, field, value):
+        self.filters.append(lambda row: row.get(field) == value)
+        return self
+
+    def in_(self, field, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(field) in values)
+        return self
+
+    def gte(self, field, value):
+        self.filters.append(lambda row: row.get(field) is not None and str(row[field]) >= str(value))
+        return self
+
+    def gt(self, field, value):
+        self.filters.append(lambda row: row.get(field) is not None and str(row[field]) > str(value))
+        return self
+
+    def lte(self, field, value):
+        self.filters.append(lambda row: row.get(field) is not None and str(row[field]) <= str(value))
+        return self
+
+    def lt(self, field, value):
+        self.filters.append(lambda row: row.get(field) is not None and str(row[field]) < str(value))
+        return self
+
+    def like(self, field, pattern):
+        needle = pattern.strip('%')
+        self.filters.append(lambda row: needle in str(row.get(field, '')))
+        return self
+
+    def order(self, field, desc=False):
+        self.ordering.append((field, desc))
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        return self
+
+    def single(self):
+        self.one = True
+        return self
+
+    def execute(self):
+        self.client.round_trips += 1
+        rows = [row for row in self.client.tables.get(self.table_name, [])
+                if all(f(row) for f in self.filters)]
+        for field, desc in reversed(self.ordering):
+            rows.sort(key=lambda row: str(row.get(field)), reverse=desc)
+        if self.window:
+            rows = rows[self.window[0]:self.window[1] + 1]
+        if self.columns != '*':
+            fields = [c.strip() for c in self.columns.split(',')]
+            rows = [{f: row.get(f) for f in fields} for row in rows]
+        if self.one:
+            return SimpleNamespace(data=rows[0] if rows else None)
+        return SimpleNamespace(data=rows)
+
+class FakeSupabase:
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.round_trips = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
@@ -0,0 +1,73 @@
+import os
+import pytest
+from backend.artifacts import (ArtifactCache, artifact_exists, artifact_path,
+                               cache_key, save_artifact)
+
+def test_save_artifact_writes_file_under_root(tmp_path):
+    """Test that artifacts are stored under the root at their file_url."""
+    size = save_artifact(str(tmp_path), '/exports/abc.parquet', b'PAR1data')
+
+    assert size == 8
+    assert (tmp_path / 'exports' / 'abc.parquet').read_bytes() == b'PAR1data'
+    assert artifact_exists(str(tmp_path), '/exports/abc.parquet')
+    assert os.listdir(tmp_path / 'exports') == ['abc.parquet']
+
+def test_artifact_path_rejects_escaping_urls(tmp_path):
+    """Test that a file_url cannot point outside the artifact root."""
+    with pytest.raises(ValueError):
+        artifact_path(str(tmp_path), '/../secrets.txt')
+
+def test_missing_artifact_does_not_exist(tmp_path):
+    """Test that exports without a stored file are reported as missing."""
+    assert not artifact_exists(str(tmp_path), None)
+    assert not artifact_exists(str(tmp_path), '/exports/missing.arrow')
+
+def test_cache_key_is_stable_and_order_independent():
+    """Test that cache keys depend on content, not dict ordering."""
+    assert cache_key('report', {'a': 1, 'b': 2}) == cache_key('report', {'b': 2, 'a': 1})
+    assert cache_key('report', {'a': 1}) != cache_key('report', {'a': 2})
+
+def test_cache_renders_once(tmp_path):
+    """Test that a cached artifact is rendered only on the first request."""
+    cache = ArtifactCache(str(tmp_path), max_bytes=1024)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return b'csv,data'
+
+    assert cache.get_or_create('ab12', 'csv', render) == b'csv,data'
+    assert cache.get_or_create('ab12', 'csv', render) == b'csv,data'
+    assert len(calls) == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 0}
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the oldest entries are evicted once the size budget is exceeded."""
+    cache = ArtifactCache(str(tmp_path), max_bytes=20)
+    cache.put('aa01', 'bin', b'x' * 8)
+    cache.put('bb02', 'bin', b'y' * 8)
+    os.utime(cache._path('aa01', 'bin'), (1, 1))
+    os.utime(cache._path('bb02', 'bin'), (2, 2))
+
+    cache.put('cc03', 'bin', b'z' * 8)
+
+    assert cache.get('aa01', 'bin') is None
+    assert cache.get('bb02', 'bin') == b'y' * 8
+    assert cache.get('cc03', 'bin') == b'z' * 8
+
+def test_cache_only_walks_the_directory_when_over_budget(tmp_path, monkeypatch):
+    """Test that writes under budget use the running size instead of rescanning."""
+    cache = ArtifactCache(str(tmp_path), max_bytes=20)
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(os, 'walk', lambda root: walks.append(root) or walk(root))
+
+    cache.put('aa01', 'bin', b'x' * 8)
+    cache.put('bb02', 'bin', b'y' * 8)
+    cache.put('bb02', 'bin', b'y' * 9)
+    assert len(walks) == 1
+
+    cache.put('cc03', 'bin', b'z' * 8)
+    assert len(walks) == 2
+    assert cache.get('aa01', 'bin') is None
+    assert cache._size == 17
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from backend import audit
+from backend.audit import AuditWriter, audit_event
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        self.pool.commits += 1
+
+class FakePool:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.commits = 0
+        self.discarded = 0
+        self.batches = []
+        self.written = threading.Event()
+
+    def getconn(self):
+        return FakeConnection(self)
+
+    def putconn(self, conn, discard=False):
+        self.discarded += discard
+
+@pytest.fixture
+def fake_execute_values(monkeypatch):
+    def execute_values(conn, sql, rows, page_size=100):
+        pool = conn.pool
+        if pool.failures:
+            pool.failures -= 1
+            raise RuntimeError('connection lost')
+        assert sql.startswith('INSERT INTO audit_logs (user_id, event_type')
+        pool.batches.append(rows)
+        pool.written.set()
+    monkeypatch.setattr(audit, 'execute_values', execute_values)
+    monkeypatch.setattr(audit.time, 'sleep', lambda seconds: None)
+
+def events(count):
+    return [audit_event('u1', 'verify_2fa', 'security', {'n': n}) for n in range(count)]
+
+def test_queued_events_are_written_in_batches(fake_execute_values):
+    """Test that flushing writes queued events with one insert per batch."""
+    pool = FakePool()
+    writer = AuditWriter(pool, batch_size=2)
+    for event in events(5):
+        writer.enqueue(event)
+
+    writer.flush()
+
+    assert [len(rows) for rows in pool.batches] == [2, 2, 1]
+    assert pool.commits == 3
+    assert pool.batches[0][0][:3] == ('u1', 'verify_2fa', 'security')
+
+def test_background_thread_flushes_and_close_drains(fake_execute_values):
+    """Test that the writer thread writes after the interval and close writes the rest."""
+    pool = FakePool()
+    writer = AuditWriter(pool, batch_size=100, flush_interval=0.05).start()
+    writer.enqueue(events(1)[0])
+
+    assert pool.written.wait(2)
+    writer.close()
+    writer.enqueue(events(1)[0])
+    writer.flush()
+
+    assert [len(rows) for rows in pool.batches] == [1, 1]
+    assert not writer._thread.is_alive()
+
+def test_failed_batches_are_retried_on_a_new_connection(fake_execute_values):
+    """Test that a failed insert discards the connection and retries the batch."""
+    pool = FakePool(failures=2)
+    writer = AuditWriter(pool, retries=3)
+    for event in events(3):
+        writer.enqueue(event)
+
+    writer.flush()
+
+    assert pool.discarded == 2
+    assert [len(rows) for rows in pool.batches] == [3]
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+import uuid
+import jwt
+import pytest
+from flask import Flask
+from backend.pagination import encode_cursor
+from backend.routes import security
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+class FakeDB:
+    """Serves the audit log query from rows sorted newest first"""
+
+    def __init__(self, logs):
+        self.logs = sorted(logs, key=lambda log: (log['created_at'], log['id']), reverse=True)
+        self.limits = []
+
+    def execute(self, sql, params):
+        *filters, limit = params
+        self.limits.append(limit)
+        rows = [log for log in self.logs if log['user_id'] == filters[0]]
+        if '(created_at, id) <' in sql:
+            before = (filters[-2], filters[-1])
+            rows = [log for log in rows if (log['created_at'], str(log['id'])) < before]
+        return FakeCursor(rows[:limit])
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(security.security_bp)
+    return app.test_client()
+
+@pytest.fixture
+def db(monkeypatch):
+    start = datetime(2024, 2, 1, tzinfo=timezone.utc)
+    db = FakeDB([{'id': str(uuid.UUID(int=n)), 'user_id': 'u1', 'event_type': 'login',
+                  'created_at': start + timedelta(hours=n // 2)} for n in range(5)])
+    monkeypatch.setattr(security, 'get_db', lambda: db)
+    return db
+
+def get(client, **args):
+    token = jwt.encode({'user_id': 'u1'}, 'your_jwt_secret', algorithm='HS256')
+    return client.get('/audit-logs', query_string=args, headers={'Authorization': f'Bearer {token}'})
+
+def test_audit_logs_are_paged_by_cursor(client, db):
+    """Test that following next_cursor walks every log once, newest first."""
+    seen, cursor = [], None
+    while True:
+        body = get(client, limit=2, **({'cursor': cursor} if cursor else {})).get_json()
+        seen.extend(item['id'] for item in body['items'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == [log['id'] for log in db.logs]
+    assert len(seen) == 5
+
+def test_audit_log_limit_is_capped(client, db):
+    """Test that the page size defaults to 50 and is clamped to 200."""
+    get(client)
+    get(client, limit=10000)
+
+    assert db.limits == [50, 200]
+
+def test_invalid_audit_log_cursors_are_rejected(client, db):
+    """Test that a garbled cursor or a cursor id that is not a uuid gets a 400."""
+    bad_id = encode_cursor(datetime(2024, 2, 1, tzinfo=timezone.utc), "1' OR '1'='1")
+
+    for cursor in ('garbage', bad_id):
+        response = get(client, cursor=cursor)
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid cursor'}
+    assert db.limits == []
@@ -0,0 +1,68 @@
+import threading
+import time
+from backend.cache import MemoryBackend, ResponseCache
+
+def test_memory_backend_expires_entries():
+    """Test that entries disappear once their TTL has passed."""
+    backend = MemoryBackend()
+    backend.set('a', 'value', ttl=0.05)
+    backend.set('b', 'value')
+
+    assert backend.get('a') == 'value'
+    time.sleep(0.06)
+    assert backend.get('a') is None
+    assert backend.get('b') == 'value'
+    assert backend.add('a', 'again')
+    assert not backend.add('a', 'ignored')
+
+def test_invalidating_a_tag_changes_only_that_users_keys():
+    """Test that bumping a user's tag version moves their entries to new keys."""
+    cache = ResponseCache(MemoryBackend())
+    before = cache.key_for('stats.get_points_stats', 'user-1', ('points',), [('period', 'week')])
+    other = cache.key_for('stats.get_points_stats', 'user-2', ('points',), [('period', 'week')])
+
+    cache.invalidate(('points',), 'user-1')
+
+    assert cache.key_for('stats.get_points_stats', 'user-1', ('points',), [('period', 'week')]) != before
+    assert cache.key_for('stats.get_points_stats', 'user-2', ('points',), [('period', 'week')]) == other
+    assert cache.key_for('stats.get_goals_stats', 'user-1', ('goals',), []) == \
+        cache.key_for('stats.get_goals_stats', 'user-1', ('goals',), [])
+
+def test_concurrent_misses_compute_once():
+    """Test that concurrent requests for a missing key share one computation."""
+    cache = ResponseCache(MemoryBackend(), poll_interval=0.01)
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return '{"total_points": 10}'
+
+    def fetch():
+        results.append(cache.get_or_compute('cache:stats:key', 60, compute))
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['{"total_points": 10}'] * 8
+    assert cache.get_or_compute('cache:stats:key', 60, compute) == '{"total_points": 10}'
+    assert len(calls) == 1
+
+def test_uncacheable_results_are_not_stored():
+    """Test that a None result (e.g. an error response) is computed every time."""
+    cache = ResponseCache(MemoryBackend())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_compute('cache:stats:error', 60, compute) is None
+    assert cache.get_or_compute('cache:stats:error', 60, compute) is None
+    assert len(calls) == 2
+    assert cache.backend.get('cache:stats:error:lock') is None
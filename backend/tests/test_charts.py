@@ -0,0 +1,41 @@
+from concurrent.futures import Future
+from backend.artifacts import ArtifactCache
+from backend.charts import bar_totals, chart_specs, render_charts
+
+class InlineExecutor:
+    """Runs submitted renders immediately and counts them"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def submit(self, fn, *args):
+        self.calls += 1
+        future = Future()
+        future.set_result(b'png:' + args[1].encode('utf-8'))
+        return future
+
+def test_repeated_bar_labels_are_summed():
+    """Test that bars sharing an x value are drawn once with their total."""
+    assert bar_totals(['Mon', 'Tue', 'Mon', None], [2, 3, 4, None]) == (['Mon', 'Tue', 'None'], [6, 3, 0])
+
+def test_charts_render_once_into_the_cache(tmp_path):
+    """Test that charts are referenced by content hash and only missing images are drawn."""
+    rows = [{'day': 'Mon', 'points': 2}, {'day': 'Tue', 'points': 3}]
+    config = [
+        {'id': 'v1', 'type': 'chart', 'chart_type': 'bar', 'title': 'Points', 'x_field': 'day', 'y_field': 'points'},
+        {'id': 'v2', 'type': 'chart', 'chart_type': 'bar', 'title': 'Points', 'x_field': 'day', 'y_field': 'points'},
+        {'id': 'v3', 'type': 'table'}
+    ]
+    cache = ArtifactCache(str(tmp_path), max_bytes=1024)
+    executor = InlineExecutor()
+
+    specs = chart_specs(rows, config)
+    charts = render_charts(specs, cache, executor)
+    render_charts(specs, cache, executor)
+
+    chart_id = specs['v1']['chart_id']
+    assert set(charts) == {'v1', 'v2'}
+    assert charts['v1']['file_url'] == charts['v2']['file_url'] == f'/charts/{chart_id}.png'
+    assert specs['v1']['columns'] == {'x_field': ['Mon', 'Tue'], 'y_field': [2, 3]}
+    assert executor.calls == 1
+    assert cache.get(chart_id, 'png') == b'png:Points'
@@ -0,0 +1,121 @@
+import threading
+import pytest
+import psycopg2
+import psycopg2.extensions
+from backend.db import ConnectionPool, PoolTimeout
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError('server closed the connection')
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.cursor_factory = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def fake_connect(monkeypatch):
+    created = []
+
+    def connect(*args, **kwargs):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    return created
+
+def test_pool_reuses_connections(fake_connect):
+    """Test that returned connections are handed out again instead of reconnecting."""
+    pool = ConnectionPool(min_size=1, max_size=2)
+
+    conn = pool.getconn()
+    pool.putconn(conn)
+    again = pool.getconn()
+
+    assert again is conn
+    assert len(fake_connect) == 1
+    assert pool.stats()['checkouts'] == 2
+
+def test_pool_checkout_timeout(fake_connect):
+    """Test that checkout fails once max_size connections are in use."""
+    pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+    pool.getconn()
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()['checkout_timeouts'] == 1
+
+def test_pool_waiter_receives_returned_connection(fake_connect):
+    """Test that a waiting checkout is woken when a connection is returned."""
+    pool = ConnectionPool(min_size=0, max_size=1, timeout=2)
+    conn = pool.getconn()
+    result = {}
+
+    waiter = threading.Thread(target=lambda: result.update(conn=pool.getconn()))
+    waiter.start()
+    pool.putconn(conn)
+    waiter.join(timeout=2)
+
+    assert result['conn'] is conn
+
+def test_pool_rolls_back_open_transactions(fake_connect):
+    """Test that a connection left inside a transaction is reset on return."""
+    pool = ConnectionPool(min_size=0, max_size=1)
+    conn = pool.getconn()
+    conn.raw.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+    pool.putconn(conn)
+
+    assert conn.raw.rollbacks == 1
+    assert pool.stats()['idle'] == 1
+
+def test_pool_replaces_unhealthy_connections(fake_connect):
+    """Test that a connection failing its health check is replaced."""
+    pool = ConnectionPool(min_size=0, max_size=1, health_check_interval=0.0001)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.last_used -= 1
+    conn.raw.broken = True
+
+    fresh = pool.getconn()
+
+    assert fresh is not conn
+    assert conn.raw.closed
+    assert pool.stats()['health_check_failures'] == 1
+
+def test_pool_recycles_idle_connections_above_minimum(fake_connect):
+    """Test that surplus connections idle past max_idle are closed."""
+    pool = ConnectionPool(min_size=0, max_size=2, max_idle=0.0001,
+                          health_check_interval=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.last_used -= 1
+
+    fresh = pool.getconn()
+
+    assert fresh is not conn
+    assert pool.stats()['connections_recycled'] == 1
@@ -0,0 +1,80 @@
+from backend.events import EventBroker, format_sse
+
+def test_events_reach_only_the_users_streams():
+    """Test that published events are delivered to each open stream of that user."""
+    broker = EventBroker()
+    first = broker.subscribe('u1')
+    second = broker.subscribe('u1')
+    other = broker.subscribe('u2')
+
+    broker.publish('u1', 'notification', {'title': 'Hi'})
+
+    for subscription in (first, second):
+        event = next(subscription.events(heartbeat=0.01))
+        assert (event['id'], event['type'], event['data']) == (1, 'notification', {'title': 'Hi'})
+    assert next(other.events(heartbeat=0.01)) is None
+
+    second.close()
+    assert broker._subscribers['u1'] == {first}
+    assert format_sse({'id': 1, 'type': 'metric', 'data': {'v': 2}}) == \
+        'id: 1\nevent: metric\ndata: {"v": 2}\n\n'
+
+def test_reconnect_replays_missed_events():
+    """Test that Last-Event-ID replays the backlog after it and only after it."""
+    broker = EventBroker(backlog=3)
+    for n in range(5):
+        broker.publish('u1', 'metric', {'n': n})
+
+    events = broker.subscribe('u1', last_event_id=2).events(heartbeat=0.01)
+    assert [next(events)['id'] for _ in range(3)] == [3, 4, 5]
+    assert next(events) is None
+
+    # Only the last three events are retained; older ids can't be resumed
+    replay = broker.subscribe('u1', last_event_id=0).events(heartbeat=0.01)
+    assert (next(replay)['type'], next(replay)) == ('resync', None)
+
+def test_slow_consumers_are_disconnected():
+    """Test that a full per-connection queue ends the stream instead of growing."""
+    broker = EventBroker(max_queue=2)
+    slow = broker.subscribe('u1')
+    for n in range(3):
+        broker.publish('u1', 'message', {'n': n})
+
+    assert slow.overflowed
+    assert list(slow.events(heartbeat=0.01)) == []
+    assert [e['id'] for e in broker.backlog('u1', 0)] == [1, 2, 3]
+
+def test_unresumable_ids_get_a_resync():
+    """Test that ids ahead of the sequence or older than the backlog trigger a resync."""
+    restarted = EventBroker()
+    events = restarted.subscribe('u1', last_event_id=500).events(heartbeat=0.01)
+    for n in range(3):
+        restarted.publish('u1', 'metric', {'n': n})
+
+    assert [(e['id'], e['type']) for e in (next(events) for _ in range(4))] == \
+        [(0, 'resync'), (1, 'metric'), (2, 'metric'), (3, 'metric')]
+
+    trimmed = EventBroker(backlog=2)
+    for n in range(5):
+        trimmed.publish('u1', 'metric', {'n': n})
+    stale = trimmed.subscribe('u1', last_event_id=1).events(heartbeat=0.01)
+    assert next(stale)['type'] == 'resync'
+    assert next(stale) is None
+
+def test_replay_stays_ordered_when_events_race_the_backlog_read():
+    """Test that an event published while replaying is sent once, after the replay."""
+    broker = EventBroker()
+    for n in range(3):
+        broker.publish('u1', 'metric', {'n': n})
+    read_backlog = broker.backlog
+
+    def backlog_with_race(user_id, after_id):
+        missed = read_backlog(user_id, after_id)
+        broker.publish('u1', 'message', {'n': 3})
+        return missed + read_backlog(user_id, missed[-1]['id'])
+
+    broker.backlog = backlog_with_race
+    events = broker.subscribe('u1', last_event_id=1).events(heartbeat=0.01)
+
+    assert [next(events)['id'] for _ in range(3)] == [2, 3, 4]
+    assert next(events) is None
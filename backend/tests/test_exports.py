@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from backend.exports import iter_csv, iter_ndjson
+
+COLUMNS = ['start_time', 'duration', 'score', 'tags']
+
+def make_batches():
+    return [
+        [{'start_time': datetime(2024, 1, 1, 9, 30), 'duration': timedelta(hours=1),
+          'score': Decimal('7.5'), 'tags': ['deep', 'work']}],
+        [{'start_time': datetime(2024, 1, 2, 14, 0), 'duration': timedelta(minutes=30),
+          'score': None, 'tags': []},
+         {'start_time': date(2024, 1, 3), 'duration': None, 'score': 3, 'tags': None}]
+    ]
+
+def test_iter_csv_yields_header_then_one_chunk_per_batch():
+    """Test that CSV export encodes each batch separately after the header."""
+    chunks = list(iter_csv(COLUMNS, make_batches()))
+
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert rows[0] == COLUMNS
+    assert rows[1] == ['2024-01-01T09:30:00', '3600.0', '7.5', '["deep", "work"]']
+    assert rows[3] == ['2024-01-03', '', '3', '']
+
+def test_iter_ndjson_writes_one_object_per_line():
+    """Test that NDJSON export produces valid JSON on every line."""
+    lines = b''.join(iter_ndjson(COLUMNS, make_batches())).decode('utf-8').splitlines()
+
+    assert len(lines) == 3
+    first = json.loads(lines[0])
+    assert first == {'start_time': '2024-01-01T09:30:00', 'duration': 3600.0,
+                     'score': 7.5, 'tags': ['deep', 'work']}
+
+def test_iter_csv_is_lazy():
+    """Test that batches are only pulled as chunks are consumed."""
+    pulled = []
+
+    def batches():
+        for batch in make_batches():
+            pulled.append(batch)
+            yield batch
+
+    stream = iter_csv(COLUMNS, batches())
+    next(stream)
+    assert pulled == []
+    next(stream)
+    assert len(pulled) == 1
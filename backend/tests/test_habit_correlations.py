@@ -0,0 +1,32 @@
+from datetime import date
+import numpy as np
+from scipy import stats
+from backend.routes.visualization import build_completion_matrix, correlation_matrix
+
+def test_completions_are_aligned_by_day():
+    """Test that each completion lands on its own habit row and calendar day."""
+    completions = [
+        {'habit_id': 'a', 'completion_date': date(2024, 3, 1)},
+        {'habit_id': 'b', 'completion_date': date(2024, 3, 3)},
+        {'habit_id': 'b', 'completion_date': date(2024, 3, 9)},  # outside the window
+        {'habit_id': 'deleted', 'completion_date': date(2024, 3, 2)}
+    ]
+
+    matrix = build_completion_matrix(['a', 'b'], completions, date(2024, 3, 1), 4)
+
+    assert matrix.tolist() == [[1, 0, 0, 0], [0, 0, 1, 0]]
+
+def test_correlation_matrix_matches_pearsonr():
+    """Test that the vectorized matrix agrees with scipy for every pair."""
+    rng = np.random.default_rng(3)
+    matrix = (rng.random((5, 40)) > 0.5).astype(float)
+    matrix[4] = 1  # always completed: no variance
+
+    correlation, p_values = correlation_matrix(matrix)
+
+    for i in range(4):
+        for j in range(i + 1, 4):
+            expected_r, expected_p = stats.pearsonr(matrix[i], matrix[j])
+            assert np.isclose(correlation[i, j], expected_r)
+            assert np.isclose(p_values[i, j], expected_p)
+    assert np.isnan(correlation[4, :4]).all()
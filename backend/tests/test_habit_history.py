@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+import pytest
+from backend.habit_history import load_habits_with_history
+from backend.tests.fake_supabase import FakeSupabase
+
+TODAY = date(2024, 5, 20)
+
+def make_client(habit_count, days=10):
+    habits = []
+    completions = []
+    for i in range(habit_count):
+        habit_id = f'habit-{i}'
+        habits.append({'id': habit_id, 'user_id': 'user-1', 'title': f'Habit {i}',
+                       'current_streak': 3, 'longest_streak': 3,
+                       'last_completion_date': TODAY.isoformat()})
+        for offset in range(days):
+            if (offset + i) % 2 == 0:
+                completions.append({'id': f'{habit_id}-{offset}', 'habit_id': habit_id,
+                                    'user_id': 'user-1',
+                                    'completion_date': (TODAY - timedelta(days=offset)).isoformat()})
+    return FakeSupabase({'habits': habits, 'habit_completions': completions})
+
+@pytest.mark.parametrize('habit_count', [1, 5, 30, 100])
+def test_get_habits_query_count_is_constant(habit_count):
+    """Test that loading habit history does not issue one query per habit."""
+    client = make_client(habit_count)
+
+    habits = load_habits_with_history(client, 'user-1', TODAY)
+
+    assert len(habits) == habit_count
+    assert client.round_trips == 2
+
+def test_get_habits_history_matches_completions():
+    """Test that bulk-loaded history is grouped onto the right habit."""
+    client = make_client(2)
+
+    habits = {h['id']: h for h in load_habits_with_history(client, 'user-1', TODAY)}
+
+    first = habits['habit-0']
+    assert len(first['history']) == 7
+    assert first['history'][-1] == {'date': TODAY.isoformat(), 'completed': True}
+    assert first['history'][-2]['completed'] is False
+    assert first['completed_today'] is True
+    assert first['current_streak'] == 3
+
+    second = habits['habit-1']
+    assert second['completed_today'] is False
+    assert second['history'][-2]['completed'] is True
+
+def test_get_habits_chunks_large_habit_lists():
+    """Test that very large habit lists are split into bounded in_() queries."""
+    client = make_client(250)
+
+    habits = load_habits_with_history(client, 'user-1', TODAY)
+
+    assert len(habits) == 250
+    assert client.round_trips == 1 + 3
+    assert all(len(h['history']) == 7 for h in habits)
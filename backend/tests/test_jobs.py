@@ -0,0 +1,80 @@
+import time
+import pytest
+from backend.jobs import SQLiteJobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), visibility_timeout=60, retry_delay=10)
+
+def test_jobs_claimed_once_in_order(queue):
+    """Test that jobs are claimed oldest first and never handed out twice."""
+    first = queue.enqueue('generate_report', {'execution_id': '1'})
+    second = queue.enqueue('generate_report', {'execution_id': '2'})
+
+    claimed = [queue.claim('worker-a'), queue.claim('worker-b')]
+
+    assert [job['id'] for job in claimed] == [first, second]
+    assert claimed[0]['payload'] == {'execution_id': '1'}
+    assert claimed[0]['attempts'] == 1
+    assert queue.claim('worker-c') is None
+
+def test_failed_job_retried_with_backoff(queue):
+    """Test that a failed job is rescheduled in the future until attempts run out."""
+    queue.enqueue('generate_report', {}, max_attempts=2)
+
+    job = queue.claim('worker')
+    assert queue.fail(job, 'boom') is True
+    assert queue.claim('worker') is None
+    assert queue.get(job['id'])['available_at'] >= time.time() + 9
+
+    with queue._connection() as conn:
+        conn.execute('UPDATE jobs SET available_at = 0')
+    job = queue.claim('worker')
+    assert job['attempts'] == 2
+    assert queue.fail(job, 'boom again') is False
+
+    stored = queue.get(job['id'])
+    assert stored['status'] == 'failed'
+    assert stored['last_error'] == 'boom again'
+
+def test_completed_jobs_are_counted(queue):
+    """Test that completed jobs leave the queue."""
+    job_id = queue.enqueue('generate_report', {})
+    assert queue.complete(queue.claim('worker'))
+
+    assert queue.get(job_id)['status'] == 'completed'
+    assert queue.counts() == {'completed': 1}
+
+def test_stale_running_job_is_reclaimed(queue):
+    """Test that a job locked by a dead worker is handed to another worker."""
+    job_id = queue.enqueue('generate_report', {})
+    queue.claim('dead-worker')
+    with queue._connection() as conn:
+        conn.execute('UPDATE jobs SET locked_at = ?', (time.time() - 120,))
+
+    job = queue.claim('live-worker')
+
+    assert job['id'] == job_id
+    assert job['attempts'] == 2
+    assert queue.get(job_id)['locked_by'] == 'live-worker'
+
+def test_heartbeat_keeps_the_lock_and_stale_workers_cannot_finish(queue):
+    """Test that renewed jobs aren't reclaimed and only the lock holder can finish a job."""
+    job_id = queue.enqueue('generate_report', {})
+    slow = queue.claim('slow-worker')
+    with queue._connection() as conn:
+        conn.execute('UPDATE jobs SET locked_at = ?', (time.time() - 120,))
+
+    assert queue.heartbeat(slow)
+    assert queue.claim('other-worker') is None
+
+    with queue._connection() as conn:
+        conn.execute('UPDATE jobs SET locked_at = ?', (time.time() - 120,))
+    fresh = queue.claim('other-worker')
+
+    assert not queue.heartbeat(slow)
+    assert not queue.complete(slow)
+    assert queue.fail(slow, 'late failure') is False
+    assert queue.get(job_id)['status'] == 'running'
+    assert queue.complete(fresh)
+    assert queue.get(job_id)['status'] == 'completed'
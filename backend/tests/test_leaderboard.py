@@ -0,0 +1,71 @@
+from datetime import date, datetime
+from backend.leaderboard import Leaderboard, MemoryLeaderboardStore, board_key
+
+def make_leaderboard():
+    leaderboard = Leaderboard(MemoryLeaderboardStore())
+    when = datetime(2024, 2, 14)
+    for user_id, points in [('a', 50), ('b', 120), ('c', 80), ('d', 10), ('a', 40)]:
+        leaderboard.record(user_id, points, when)
+    return leaderboard, when
+
+def test_ranks_follow_incremental_updates():
+    """Test that recorded points update standings on every stored board."""
+    leaderboard, when = make_leaderboard()
+
+    for board_type in ('global', 'weekly', 'monthly'):
+        assert [(e['user_id'], e['points']) for e in leaderboard.top(board_type, when=when)] == \
+            [('b', 120), ('a', 90), ('c', 80), ('d', 10)]
+    assert leaderboard.rank('global', 'c', when) == {'rank': 3, 'user_id': 'c', 'points': 80}
+    assert leaderboard.rank('global', 'nobody', when) is None
+
+    leaderboard.record('d', 200, when)
+    assert leaderboard.rank('weekly', 'd', when)['rank'] == 1
+    assert leaderboard.rank('weekly', 'b', when)['rank'] == 2
+
+def test_neighbors_and_friends():
+    """Test rank windows around a user and the friends-only board."""
+    leaderboard, when = make_leaderboard()
+
+    assert [e['user_id'] for e in leaderboard.around('global', 'a', radius=1, when=when)] == ['b', 'a', 'c']
+    assert [e['rank'] for e in leaderboard.around('global', 'b', radius=1, when=when)] == [1, 2]
+    assert [(e['user_id'], e['rank']) for e in leaderboard.friends('d', ['c', 'x'])] == \
+        [('c', 1), ('d', 2), ('x', 3)]
+
+def test_windowed_boards_roll_over():
+    """Test that a new week starts empty and old periods are deleted."""
+    leaderboard, when = make_leaderboard()
+    next_week = datetime(2024, 2, 21)
+    later = datetime(2024, 3, 6)
+
+    leaderboard.record('d', 5, next_week)
+    assert [e['user_id'] for e in leaderboard.top('weekly', when=next_week)] == ['d']
+    assert leaderboard.rank('global', 'd', next_week)['points'] == 15
+
+    leaderboard.record('a', 1, later)
+    deleted = leaderboard.rollover(later)
+
+    assert deleted == [board_key('weekly', when), board_key('weekly', next_week)]
+    assert leaderboard.top('monthly', when=later)[0]['user_id'] == 'a'
+    assert leaderboard.top('monthly', when=when)[0]['user_id'] == 'b'
+    assert leaderboard.rollover(datetime(2024, 4, 1)) == [board_key('monthly', when), board_key('weekly', later)]
+
+def test_memory_boards_are_seeded_from_the_ledger():
+    """Test that in-process boards load ledger totals on first read and when stale."""
+    ledger = {None: {'a': 500, 'b': 300}, date(2024, 2, 12): {'b': 40}, date(2024, 2, 1): {'b': 90}}
+    calls = []
+
+    def loader(since):
+        calls.append(since)
+        return dict(ledger[since])
+
+    leaderboard = Leaderboard(MemoryLeaderboardStore(), loader, refresh_interval=3600)
+    when = datetime(2024, 2, 14)
+    leaderboard.record('c', 10, when)
+
+    assert [e['user_id'] for e in leaderboard.top('global', when=when)] == ['a', 'b']
+    assert leaderboard.rank('weekly', 'b', when)['points'] == 40
+    assert calls == [None, date(2024, 2, 12), date(2024, 2, 1)]
+
+    ledger[None]['c'] = 900
+    leaderboard.refresh_interval = 0
+    assert leaderboard.top('global', limit=1, when=when)[0]['user_id'] == 'c'
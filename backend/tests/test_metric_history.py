@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+from backend.metric_history import MAX_POINTS, align_series, bucket_count, choose_resolution, sample_value
+
+UTC = timezone.utc
+
+def test_sample_values_come_from_scores_and_levels():
+    """Test that metric documents are reduced to the number that is charted."""
+    assert sample_value({'score': 0.4, 'factors': {}}) == 0.4
+    assert sample_value({'level': 3, 'factors': None}) == 3.0
+    assert sample_value(2) == 2.0
+    assert sample_value({'factors': {}}) is None
+    assert sample_value(True) is None
+
+def test_resolution_follows_range_and_retention():
+    """Test that the finest retained resolution within the point budget is used."""
+    now = datetime(2024, 2, 14, 12, 0, tzinfo=UTC)
+
+    assert choose_resolution(datetime(2024, 2, 14, 6, 0, tzinfo=UTC), now, now) == 'minute'
+    assert choose_resolution(datetime(2024, 2, 10, tzinfo=UTC), now, now) == 'hour'
+    assert choose_resolution(datetime(2024, 2, 14, 6, 0, tzinfo=UTC), now, now, max_points=60) == 'hour'
+    assert choose_resolution(datetime(2023, 6, 1, tzinfo=UTC), now, now) == 'day'
+
+    # Day is the fallback even past the budget; the endpoint rejects such ranges
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    assert choose_resolution(start, now, now) == 'day'
+    assert bucket_count(start, now, 'day') > MAX_POINTS
+
+def test_series_are_aligned_with_gaps():
+    """Test that buckets land on one timestamp axis and missing buckets are None."""
+    rows = [
+        {'metric_type': 'focus', 'bucket': datetime(2024, 2, 14, 9, tzinfo=UTC),
+         'sample_count': 4, 'value_sum': 2.0, 'value_min': 0.2, 'value_max': 0.8},
+        {'metric_type': 'energy', 'bucket': '2024-02-14T11:00:00+00:00',
+         'sample_count': 1, 'value_sum': 3.0, 'value_min': 3.0, 'value_max': 3.0}
+    ]
+    result = align_series(rows, ['focus', 'energy'], datetime(2024, 2, 14, 9, 30),
+                          datetime(2024, 2, 14, 11, 5), 'hour')
+
+    assert result['timestamps'] == ['2024-02-14T09:00:00+00:00', '2024-02-14T10:00:00+00:00',
+                                    '2024-02-14T11:00:00+00:00']
+    assert result['series']['focus']['avg'] == [0.5, None, None]
+    assert result['series']['focus']['max'] == [0.8, None, None]
+    assert result['series']['energy']['count'] == [None, None, 1]
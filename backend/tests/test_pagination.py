@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+import pytest
+from backend.pagination import decode_cursor, decode_time_cursor, encode_cursor, page_size
+
+def test_time_cursor_round_trip():
+    """Test that a (created_at, id) sort key survives encoding."""
+    created_at = datetime(2024, 2, 14, 9, 30, 15, 123456, tzinfo=timezone.utc)
+    token = encode_cursor(created_at, 'b5e7c1d2-0000-4000-8000-000000000001')
+
+    assert '=' not in token
+    assert decode_time_cursor(token) == (created_at, 'b5e7c1d2-0000-4000-8000-000000000001')
+
+def test_malformed_cursors_are_rejected():
+    """Test that garbage or wrong-sized cursors raise ValueError."""
+    for token in ('not a cursor', encode_cursor('only-one'), encode_cursor('x', 'y', 'z')):
+        with pytest.raises(ValueError):
+            decode_cursor(token)
+    with pytest.raises(ValueError):
+        decode_time_cursor(encode_cursor('yesterday', 'id'))
+    with pytest.raises(ValueError):
+        decode_time_cursor(encode_cursor(datetime(2024, 2, 14), 'not-a-uuid'))
+
+def test_page_size_is_clamped():
+    """Test that limits default, clamp to the maximum and ignore junk."""
+    assert page_size(None) == 20
+    assert page_size('500') == 100
+    assert page_size('0') == 1
+    assert page_size('abc') == 20
@@ -0,0 +1,47 @@
+from backend import points_ledger
+from backend.points_ledger import (ACHIEVEMENT_TOTALS_TTL, available_points_by_category,
+                                   category_points, fetch_points_balance)
+from backend.tests.fake_supabase import FakeSupabase
+
+def test_missing_balance_reads_as_zero():
+    """Test that users without any points get an empty ledger row."""
+    client = FakeSupabase({'user_points_balances': []})
+
+    balance = fetch_points_balance(client, 'u1')
+
+    assert balance['balance'] == 0
+    assert category_points(balance) == {
+        'goals': 0, 'habits': 0, 'focus': 0, 'mood': 0, 'quiz': 0, 'achievements': 0
+    }
+
+def test_category_points_come_from_ledger_row():
+    """Test that all category totals are read from a single ledger lookup."""
+    client = FakeSupabase({'user_points_balances': [
+        {'user_id': 'u1', 'balance': 75, 'category_totals': {'goals': 50, 'mood': 5, 'rewards': -30}}
+    ]})
+
+    points = category_points(fetch_points_balance(client, 'u1'))
+
+    assert client.round_trips == 1
+    assert points['goals'] == 50
+    assert points['mood'] == 5
+    assert 'rewards' not in points
+
+def test_available_points_are_cached_for_the_ttl(monkeypatch):
+    """Test that achievement totals are queried once and refreshed after the TTL."""
+    now = [1000.0]
+    monkeypatch.setattr(points_ledger.time, 'monotonic', lambda: now[0])
+    monkeypatch.setitem(points_ledger._achievement_totals, 'value', None)
+    client = FakeSupabase({'achievements': [
+        {'id': 1, 'category': 'goals', 'points_reward': 300},
+        {'id': 2, 'category': 'goals', 'points_reward': 100},
+        {'id': 3, 'category': 'habits', 'points_reward': 500}
+    ]})
+
+    assert available_points_by_category(client) == {'goals': 400, 'habits': 500}
+    available_points_by_category(client)
+    assert client.round_trips == 1
+
+    now[0] += ACHIEVEMENT_TOTALS_TTL
+    available_points_by_category(client)
+    assert client.round_trips == 2
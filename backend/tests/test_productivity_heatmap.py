@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from backend.routes.visualization import _covered_seconds, calculate_heatmap_scores
+
+WINDOW_START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+def entry(start, minutes, category='focus', completed=True):
+    end = start + timedelta(minutes=minutes)
+    return {'start_time': start, 'end_time': end if completed else None,
+            'duration': timedelta(minutes=minutes) if completed else None, 'category': category}
+
+def at(day, hour, minute=0):
+    return WINDOW_START + timedelta(days=day, hours=hour, minutes=minute)
+
+def test_covered_seconds_matches_a_direct_sum():
+    """Test that overlapping, reversed and out-of-range intervals agree with clipping each one."""
+    rng = np.random.default_rng(5)
+    starts = rng.uniform(-500, 1500, 200)
+    ends = starts + rng.uniform(-50, 400, 200)  # some end before they start
+    edges = np.linspace(0, 1000, 41)
+
+    expected = [np.clip(edge - starts, 0, np.maximum(ends - starts, 0)).sum() for edge in edges]
+
+    assert np.allclose(_covered_seconds(starts, ends, edges), expected)
+    assert _covered_seconds(np.array([]), np.array([]), edges).tolist() == [0.0] * 41
+
+def test_focus_is_split_across_the_hours_a_session_spans():
+    """Test that a session crossing an hour edge counts towards both hours."""
+    scores = calculate_heatmap_scores([entry(at(0, 9, 40), 40)], WINDOW_START, 2)
+
+    assert scores.shape == (2, 24)
+    # The completed task counts in its start hour, focus in both
+    assert np.isclose(scores[0, 9], 0.2 + 20 / 60 * 0.5)
+    assert np.isclose(scores[0, 10], 20 / 60 * 0.5)
+    assert np.count_nonzero(scores) == 2
+
+def test_overlapping_sessions_add_up_to_the_cap():
+    """Test that concurrent sessions both count and scores stay within their caps."""
+    entries = [entry(at(0, 14), 60), entry(at(0, 14, 30), 30), entry(at(0, 14, 45), 10, category='admin')]
+
+    scores = calculate_heatmap_scores(entries, WINDOW_START, 1)
+
+    # 90 focus minutes cap at 0.5, three completed tasks cap at 0.5
+    assert np.isclose(scores[0, 14], 1.0)
+    assert np.isclose(calculate_heatmap_scores(entries[1:2], WINDOW_START, 1)[0, 14], 0.2 + 0.25)
+
+def test_sessions_are_clipped_to_the_window():
+    """Test that only the part of a session inside the window is scored."""
+    entries = [
+        entry(WINDOW_START - timedelta(minutes=30), 60),  # started the evening before
+        entry(at(1, 23, 30), 60),                         # runs past the last day
+        entry(at(3, 9), 60),                              # after the window
+        entry(at(0, 8), 60, completed=False)              # still running: no time yet
+    ]
+
+    scores = calculate_heatmap_scores(entries, WINDOW_START, 2)
+
+    assert np.isclose(scores[0, 0], 0.25)
+    assert np.isclose(scores[1, 23], 0.2 + 0.25)
+    assert np.count_nonzero(scores) == 2
+
+def test_naive_timestamps_are_utc():
+    """Test that timestamps without a timezone land in the same hour as UTC ones."""
+    naive = entry(at(0, 6).replace(tzinfo=None), 30)
+
+    assert np.array_equal(calculate_heatmap_scores([naive], WINDOW_START, 1),
+                          calculate_heatmap_scores([entry(at(0, 6), 30)], WINDOW_START, 1))
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+import pytz
+import pytest
+from backend import report_scheduler
+from backend.report_scheduler import SchedulerMetrics, dispatch_due_schedules, next_run_after
+
+UTC = pytz.utc
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+class FakeDB:
+    """Answers the scheduler's queries from in-memory schedules and executions"""
+
+    def __init__(self, schedules=(), executions=()):
+        self.schedules = list(schedules)
+        self.executions = list(executions)
+        self.commits = 0
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        if sql.startswith('SELECT e.id'):
+            cutoff, = params
+            return FakeCursor([dict(e, export_format=self._schedule(e['scheduled_id']).get('export_format'))
+                               for e in self.executions
+                               if e['status'] == 'queued' and e['job_id'] is None and e['created_at'] < cutoff][:1])
+        if sql.startswith('SELECT s.*'):
+            now, limit = params
+            return FakeCursor([s for s in self.schedules if s['next_run'] <= now][:limit])
+        if sql.startswith('INSERT INTO report_executions'):
+            template_id, user_id, scheduled_id, parameters, scheduled_for = params
+            execution = {'id': f'e{len(self.executions) + 1}', 'template_id': template_id,
+                         'user_id': user_id, 'scheduled_id': scheduled_id, 'parameters': {},
+                         'status': 'queued', 'job_id': None, 'created_at': scheduled_for}
+            self.executions.append(execution)
+            return FakeCursor([execution])
+        if sql.startswith('UPDATE scheduled_reports'):
+            last_run, next_run, schedule_id = params
+            self._schedule(schedule_id).update(last_run=last_run, next_run=next_run)
+        elif sql.startswith('UPDATE report_executions SET job_id'):
+            job_id, execution_id = params
+            self._execution(execution_id)['job_id'] = job_id
+        elif sql.startswith("UPDATE report_executions SET status = 'failed'"):
+            self._execution(params[0])['status'] = 'failed'
+        return FakeCursor([])
+
+    def _schedule(self, schedule_id):
+        return next((s for s in self.schedules if s['id'] == schedule_id), {})
+
+    def _execution(self, execution_id):
+        return next(e for e in self.executions if e['id'] == execution_id)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+@pytest.fixture
+def queued(monkeypatch):
+    jobs = []
+
+    def enqueue(config, task_name, payload):
+        jobs.append(payload)
+        return f'job-{len(jobs)}'
+
+    monkeypatch.setattr(report_scheduler, 'enqueue', enqueue)
+    return jobs
+
+def schedule(schedule_type, next_run, timezone='UTC', **extra):
+    return dict({'id': 's1', 'template_id': 't1', 'user_id': 'u1', 'schedule_type': schedule_type,
+                 'timezone': timezone, 'next_run': next_run, 'cron_expression': None,
+                 'export_format': ['csv']}, **extra)
+
+def test_next_run_keeps_local_time_and_coalesces_missed_runs():
+    """Test that runs advance in the schedule's timezone and skip past missed ones."""
+    berlin = pytz.timezone('Europe/Berlin')
+    daily = schedule('daily', berlin.localize(datetime(2024, 3, 30, 8, 0)), 'Europe/Berlin')
+
+    # Across the DST change the run stays at 08:00 local time
+    run = next_run_after(daily, berlin.localize(datetime(2024, 3, 30, 9, 0)))
+    assert (run.day, run.hour) == (31, 8)
+
+    # Three missed days collapse into the next future run
+    run = next_run_after(daily, berlin.localize(datetime(2024, 4, 2, 12, 0)))
+    assert (run.month, run.day, run.hour) == (4, 3, 8)
+
+    monthly = schedule('monthly', UTC.localize(datetime(2024, 1, 1)))
+    assert next_run_after(monthly, UTC.localize(datetime(2024, 2, 15))) == UTC.localize(datetime(2024, 3, 1))
+
+    custom = schedule('custom', UTC.localize(datetime(2024, 1, 1)), cron_expression='30 6 * * 1')
+    assert next_run_after(custom, UTC.localize(datetime(2024, 1, 3))) == UTC.localize(datetime(2024, 1, 8, 6, 30))
+
+def test_due_schedules_are_dispatched_and_advanced(queued):
+    """Test that a due schedule gets an execution, a queued job and a later next_run."""
+    due = datetime.now(UTC) - timedelta(minutes=1)
+    db = FakeDB([schedule('daily', due), schedule('daily', due + timedelta(days=2), id='s2')])
+    metrics = SchedulerMetrics()
+
+    assert dispatch_due_schedules(db, {}, metrics) == 1
+
+    execution, = db.executions
+    assert execution['job_id'] == 'job-1'
+    assert queued == [{'execution_id': 'e1', 'user_id': 'u1', 'template_id': 't1',
+                       'parameters': {}, 'format': 'csv'}]
+    assert db.schedules[0]['next_run'] > datetime.now(UTC)
+    assert metrics.dispatched == 1
+
+def test_orphaned_executions_are_recovered(queued):
+    """Test that executions left without a job are re-queued or failed on the next dispatch."""
+    old = datetime.now(UTC) - timedelta(hours=1)
+    recent = datetime.now(UTC)
+    orphan = {'status': 'queued', 'job_id': None, 'template_id': 't1', 'user_id': 'u1', 'parameters': {}}
+    db = FakeDB([schedule('daily', recent + timedelta(days=1))], [
+        dict(orphan, id='scheduled', scheduled_id='s1', created_at=old),
+        dict(orphan, id='on-demand', scheduled_id=None, created_at=old),
+        dict(orphan, id='in-flight', scheduled_id='s1', created_at=recent)
+    ])
+
+    assert dispatch_due_schedules(db, {}, SchedulerMetrics()) == 0
+
+    states = {e['id']: (e['status'], e['job_id']) for e in db.executions}
+    assert states == {'scheduled': ('queued', 'job-1'), 'on-demand': ('failed', None),
+                      'in-flight': ('queued', None)}
+    # One claim and commit per orphan, so no lock outlives its commit
+    assert db.commits == 2
+    assert queued[0]['format'] == 'csv'
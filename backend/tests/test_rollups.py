@@ -0,0 +1,60 @@
+from datetime import date, datetime, timedelta
+from backend import rollups
+from backend.activity import aggregate_daily_activity
+from backend.rollups import fetch_daily_rollups_client, fill_days, mood_average, sum_rollups
+from backend.tests.fake_supabase import FakeSupabase
+
+ROWS = [
+    {'user_id': 'u1', 'day': '2024-03-01', 'points_earned': 30, 'mood_entries': 2, 'mood_total': 7,
+     'time_minutes': 90, 'time_minutes_by_category': {'work': 60, 'exercise': 30}},
+    {'user_id': 'u1', 'day': date(2024, 3, 3), 'points_earned': 10, 'points_spent': 5,
+     'time_minutes': 45, 'time_minutes_by_category': {'work': 45}}
+]
+
+def test_fill_days_zero_fills_missing_days():
+    """Test that every day in the range gets a rollup, even without activity."""
+    days = fill_days(ROWS, date(2024, 3, 1), date(2024, 3, 3))
+
+    assert [d['day'] for d in days] == ['2024-03-01', '2024-03-02', '2024-03-03']
+    assert days[1]['points_earned'] == 0
+    assert days[1]['time_minutes_by_category'] == {}
+    assert mood_average(days[0]) == 3.5
+    assert mood_average(days[1]) is None
+
+def test_sum_rollups_merges_categories():
+    """Test that period totals add counters and per-category minutes."""
+    totals = sum_rollups(fill_days(ROWS, date(2024, 3, 1), date(2024, 3, 3)))
+
+    assert totals['points_earned'] == 40
+    assert totals['points_spent'] == 5
+    assert totals['time_minutes'] == 135
+    assert totals['time_minutes_by_category'] == {'work': 105, 'exercise': 30}
+
+def test_activity_stats_use_one_query():
+    """Test that the activity dashboard reads the rollups in a single round trip."""
+    client = FakeSupabase({'user_daily_rollups': [
+        {'user_id': 'u1', 'day': '2024-03-06', 'goals_completed': 1, 'habit_completions': 2,
+         'focus_sessions': 1, 'mood_entries': 1},
+        {'user_id': 'u2', 'day': '2024-03-06', 'goals_completed': 9}
+    ]})
+
+    days = aggregate_daily_activity(client, 'u1', datetime(2024, 2, 1), datetime(2024, 3, 7, 15))
+
+    assert client.round_trips == 1
+    assert len(days) == 7
+    assert days[-2] == {'date': '2024-03-06', 'goals': 1, 'habits': 2, 'focus': 1, 'mood': 1, 'total': 5}
+    assert days[-1]['total'] == 0
+
+def test_long_ranges_are_read_in_pages(monkeypatch):
+    """Test that ranges longer than one PostgREST page are read in full."""
+    monkeypatch.setattr(rollups, 'PAGE_SIZE', 10)
+    first_day = date(2024, 1, 1)
+    client = FakeSupabase({'user_daily_rollups': [
+        {'user_id': 'u1', 'day': (first_day + timedelta(days=n)).isoformat(), 'points_earned': 1}
+        for n in range(25)
+    ]})
+
+    days = fetch_daily_rollups_client(client, 'u1', first_day, first_day + timedelta(days=29))
+
+    assert client.round_trips == 3
+    assert sum_rollups(days)['points_earned'] == 25
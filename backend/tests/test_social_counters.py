@@ -0,0 +1,18 @@
+from backend.routes.enhanced_social import apply_reaction_change
+
+def test_first_reaction_is_counted():
+    """Test that a new reaction adds one to its type."""
+    assert apply_reaction_change({}, None, 'like') == {'like': 1}
+    assert apply_reaction_change({'like': 2}, None, 'support') == {'like': 2, 'support': 1}
+
+def test_changing_reaction_type_moves_the_count():
+    """Test that switching type keeps the total and empties the old type."""
+    counts = {'like': 1, 'celebrate': 3}
+
+    assert apply_reaction_change(counts, 'like', 'celebrate') == {'celebrate': 4}
+    assert apply_reaction_change(counts, 'celebrate', 'like') == {'like': 2, 'celebrate': 2}
+    assert counts == {'like': 1, 'celebrate': 3}
+
+def test_repeating_the_same_reaction_changes_nothing():
+    """Test that re-sending an existing reaction is not counted again."""
+    assert apply_reaction_change({'like': 5}, 'like', 'like') == {'like': 5}
@@ -0,0 +1,102 @@
+from datetime import datetime, timezone
+import json
+import jwt
+import pytest
+from flask import Flask
+from psycopg2.extras import DictRow
+from backend.events import format_sse
+from backend.pagination import encode_cursor
+from backend.routes import enhanced_social
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+class FakeDB:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = []
+
+    def execute(self, sql, params):
+        self.queries.append((sql, params))
+        return FakeCursor(self.rows)
+
+    def commit(self):
+        pass
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['FEED_FANOUT_MAX_FOLLOWERS'] = 1000
+    app.register_blueprint(enhanced_social.enhanced_social_bp)
+    return app.test_client()
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(enhanced_social, 'get_db', lambda: db)
+    return db
+
+def auth_headers():
+    token = jwt.encode({'user_id': 'u1'}, 'your_jwt_secret', algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+def get(client, path, **args):
+    return client.get(path, query_string=args, headers=auth_headers())
+
+def test_invalid_feed_cursors_are_rejected(client, db):
+    """Test that a feed cursor whose id is not a uuid gets a 400 without a query."""
+    cursor = encode_cursor(datetime(2024, 2, 1, tzinfo=timezone.utc), 'abc')
+
+    response = get(client, '/feed', cursor=cursor)
+
+    assert response.status_code == 400
+    assert db.queries == []
+
+def test_counter_ids_must_be_uuids(client, db):
+    """Test that malformed counter ids get a 400 instead of a database error."""
+    valid = '00000000-0000-4000-8000-000000000001'
+
+    response = get(client, '/activities/counters', ids=f'{valid},nope')
+
+    assert response.status_code == 400
+    assert db.queries == []
+
+def test_counters_are_limited_to_visible_activities(client, db):
+    """Test that counters are read with the feed's visibility rules for the viewer."""
+    activity_id = '00000000-0000-4000-8000-000000000001'
+    db.rows = [{'id': activity_id, 'reaction_count': 2, 'reaction_counts': {'like': 2},
+                'comment_count': 1, 'viewer_reaction': None}]
+
+    body = get(client, '/activities/counters', ids=activity_id.upper()).get_json()
+
+    sql, params = db.queries[0]
+    assert params == {'viewer': 'u1', 'ids': [activity_id]}
+    assert "sa.visibility = 'public'" in sql and "fc.status = 'accepted'" in sql
+    assert body[activity_id]['reaction_count'] == 2
+
+def test_message_events_carry_named_fields(client, db, monkeypatch):
+    """Test that the SSE message event is a JSON object keyed by column, not a bare row."""
+    class Cursor:
+        index = {'id': 0, 'sender_id': 1, 'content': 2}
+        description = [None] * 3
+
+    row = DictRow(Cursor())
+    row[:] = [7, 'u1', 'hi']
+    db.rows = [row]
+    published = []
+    monkeypatch.setattr(enhanced_social, 'publish_event',
+                        lambda user_id, event_type, data: published.append((user_id, event_type, data)))
+
+    client.post('/messages/send', json={'receiver_id': 'u2', 'content': 'hi'}, headers=auth_headers())
+
+    receiver, event_type, data = published[0]
+    payload = format_sse({'id': 1, 'type': event_type, 'data': data}).split('data: ', 1)[1]
+    assert (receiver, event_type) == ('u2', 'message')
+    assert json.loads(payload) == {'id': 7, 'sender_id': 'u1', 'content': 'hi'}
@@ -0,0 +1,55 @@
+import jwt
+import pytest
+from flask import Flask
+from backend import leaderboard
+from backend.leaderboard import Leaderboard, MemoryLeaderboardStore
+from backend.routes import social
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+class FakeDB:
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, sql, params):
+        self.queries.append((' '.join(sql.split()), params))
+        return FakeCursor([{'user_id': user_id, 'username': f'name-{user_id}', 'avatar_url': None}
+                           for user_id in params[0]])
+
+@pytest.fixture
+def client(monkeypatch):
+    boards = Leaderboard(MemoryLeaderboardStore())
+    for n in range(150):
+        boards.record(f'u{n:03d}', n + 1)
+    monkeypatch.setattr(leaderboard, '_leaderboards', {None: boards})
+    db = FakeDB()
+    monkeypatch.setattr(social, 'get_db', lambda: db)
+    app = Flask(__name__)
+    app.register_blueprint(social.social_bp)
+    client = app.test_client()
+    client.db = db
+    return client
+
+def get(client, path, **args):
+    token = jwt.encode({'user_id': 'u075'}, 'your_jwt_secret', algorithm='HS256')
+    return client.get(path, query_string=args, headers={'Authorization': f'Bearer {token}'})
+
+def test_leaderboard_limits_are_clamped(client):
+    """Test that limit and radius are bounded and junk values fall back to the defaults."""
+    assert len(get(client, '/leaderboard/global', limit=5000).get_json()['entries']) == 100
+    assert len(get(client, '/leaderboard/global', limit=-3).get_json()['entries']) == 1
+    assert get(client, '/leaderboard/global', limit='many').status_code == 200
+    assert len(get(client, '/leaderboard/global/me', radius=1000).get_json()['neighbors']) == 101
+
+def test_profiles_are_matched_on_the_uuid_column(client):
+    """Test that the profile lookup compares user_id as uuid so its index is usable."""
+    entries = get(client, '/leaderboard/global', limit=2).get_json()['entries']
+
+    sql, params = client.db.queries[0]
+    assert 'user_id = ANY(%s::uuid[])' in sql and '::text' not in sql
+    assert [entry['username'] for entry in entries] == ['name-u149', 'name-u148']
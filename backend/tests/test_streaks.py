@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+from backend.streaks import advance_streak, compute_index, empty_index, live_streak, read_index
+
+def test_advance_streak_consecutive_days():
+    """Test that consecutive completions extend the current streak."""
+    index = empty_index()
+    for offset in range(3):
+        index = advance_streak(index, date(2024, 1, 1) + timedelta(days=offset))
+
+    assert index['current_streak'] == 3
+    assert index['longest_streak'] == 3
+    assert index['last_completion_date'] == date(2024, 1, 3)
+
+def test_advance_streak_gap_resets_current_but_keeps_longest():
+    """Test that a missed day restarts the current streak."""
+    index = compute_index(['2024-01-01', '2024-01-02', '2024-01-03'])
+    index = advance_streak(index, date(2024, 1, 5))
+
+    assert index['current_streak'] == 1
+    assert index['longest_streak'] == 3
+
+def test_advance_streak_same_day_is_noop():
+    """Test that recording the same day twice does not double count."""
+    index = compute_index(['2024-01-01'])
+    assert advance_streak(index, '2024-01-01') == index
+
+def test_compute_index_matches_incremental_updates():
+    """Test that a rebuild agrees with the incrementally maintained index."""
+    days = ['2024-02-01', '2024-02-02', '2024-02-04', '2024-02-05', '2024-02-06', '2024-02-07']
+    incremental = empty_index()
+    for day in days:
+        incremental = advance_streak(incremental, day)
+
+    rebuilt = compute_index(reversed(days))
+
+    assert rebuilt == incremental
+    assert rebuilt['current_streak'] == 4
+    assert rebuilt['longest_streak'] == 4
+
+def test_live_streak_expires_after_missed_day():
+    """Test that a streak is only reported while it is still unbroken."""
+    index = read_index({'current_streak': 5, 'longest_streak': 9,
+                        'last_completion_date': '2024-03-10'})
+
+    assert live_streak(index, date(2024, 3, 10)) == 5
+    assert live_streak(index, date(2024, 3, 11)) == 5
+    assert live_streak(index, date(2024, 3, 12)) == 0
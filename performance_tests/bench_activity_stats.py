@@ -0,0 +1,97 @@
+"""
+Benchmark for /stats/activity: round trips and latency per period.
+
+Compares the previous day-by-day loop (four queries per day of the period)
+with backend.activity.aggregate_daily_activity (one query against the daily
+rollups per request).
+Latency is the measured in-process time plus RTT_MS per round trip, which is
+what dominates against a remote Supabase instance.
+
+    python performance_tests/bench_activity_stats.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.activity import aggregate_daily_activity
+from backend.tests.fake_supabase import FakeSupabase
+
+RTT_MS = 20
+USER_ID = 'bench-user'
+PERIODS = {'week': 7, 'month': 30, 'year': 365, 'all': 3650}
+
+def make_tables(now, days=400):
+    rng = random.Random(42)
+    tables = {'goals': [], 'habit_completions': [], 'focus_sessions': [], 'mood_entries': []}
+    for offset in range(days):
+        stamp = now - timedelta(days=offset, hours=rng.randint(0, 12))
+        for _ in range(rng.randint(0, 3)):
+            tables['goals'].append({'id': len(tables['goals']), 'user_id': USER_ID,
+                                    'status': 'completed', 'updated_at': stamp.isoformat()})
+        for _ in range(rng.randint(0, 5)):
+            tables['habit_completions'].append({'id': len(tables['habit_completions']), 'user_id': USER_ID,
+                                                'completion_date': stamp.date().isoformat()})
+        for _ in range(rng.randint(0, 4)):
+            tables['focus_sessions'].append({'id': len(tables['focus_sessions']), 'user_id': USER_ID,
+                                             'status': 'completed', 'start_time': stamp.isoformat()})
+        tables['mood_entries'].append({'id': offset, 'user_id': USER_ID, 'created_at': stamp.isoformat()})
+    tables['user_daily_rollups'] = build_rollups(tables)
+    return tables
+
+def build_rollups(tables):
+    """What the rollup triggers would have written for the synthetic events"""
+    sources = [('goals', 'updated_at', 'goals_completed'),
+               ('habit_completions', 'completion_date', 'habit_completions'),
+               ('focus_sessions', 'start_time', 'focus_sessions'),
+               ('mood_entries', 'created_at', 'mood_entries')]
+    rollups = {}
+    for table, column, counter in sources:
+        for row in tables[table]:
+            day = row[column][:10]
+            rollup = rollups.setdefault(day, {'user_id': USER_ID, 'day': day})
+            rollup[counter] = rollup.get(counter, 0) + 1
+    return list(rollups.values())
+
+def legacy_activity_stats(client, user_id, start_date, end_date):
+    """The previous implementation: four queries for every day of the period"""
+    days = []
+    current_date = start_date
+    while current_date <= end_date:
+        next_date = current_date + timedelta(days=1)
+        goals = client.table('goals').select('id').eq('user_id', user_id).eq('status', 'completed') \
+            .gte('updated_at', current_date.isoformat()).lt('updated_at', next_date.isoformat()).execute()
+        habits = client.table('habit_completions').select('id').eq('user_id', user_id) \
+            .eq('completion_date', current_date.date().isoformat()).execute()
+        focus = client.table('focus_sessions').select('id').eq('user_id', user_id).eq('status', 'completed') \
+            .gte('start_time', current_date.isoformat()).lt('start_time', next_date.isoformat()).execute()
+        mood = client.table('mood_entries').select('id').eq('user_id', user_id) \
+            .gte('created_at', current_date.isoformat()).lt('created_at', next_date.isoformat()).execute()
+        counts = [len(goals.data), len(habits.data), len(focus.data), len(mood.data)]
+        days.append({'date': current_date.date().isoformat(), 'total': sum(counts)})
+        current_date = next_date
+    return days[-7:]
+
+def run(fn, tables, start_date, end_date):
+    client = FakeSupabase(tables)
+    started = time.perf_counter()
+    fn(client, USER_ID, start_date, end_date)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return client.round_trips, elapsed_ms + client.round_trips * RTT_MS
+
+def main():
+    now = datetime.utcnow()
+    tables = make_tables(now)
+
+    print(f"{'period':<8}{'legacy trips':>14}{'legacy ms':>12}{'new trips':>12}{'new ms':>10}")
+    for period, days in PERIODS.items():
+        start_date = now - timedelta(days=days)
+        legacy_trips, legacy_ms = run(legacy_activity_stats, tables, start_date, now)
+        new_trips, new_ms = run(aggregate_daily_activity, tables, start_date, now)
+        print(f"{period:<8}{legacy_trips:>14}{legacy_ms:>12.0f}{new_trips:>12}{new_ms:>10.0f}")
+
+if __name__ == '__main__':
+    main()
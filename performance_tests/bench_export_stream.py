@@ -0,0 +1,85 @@
+"""
+Benchmark for /analytics/export: peak memory and throughput over 1M rows.
+
+Compares the previous approach (fetchall, DataFrame, StringIO, BytesIO)
+with backend.exports.iter_csv / iter_ndjson fed batch by batch, as they are
+from a server-side cursor. Rows are synthetic time entries generated in
+process so the numbers reflect encoding and memory only, not Postgres.
+Peak memory is measured with tracemalloc.
+
+    python performance_tests/bench_export_stream.py [rows]
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.exports import iter_csv, iter_ndjson
+
+COLUMNS = ['activity_type', 'category', 'start_time', 'end_time', 'duration', 'notes', 'tags']
+BATCH_SIZE = 2000
+
+def make_row(i, base=datetime(2020, 1, 1)):
+    start = base + timedelta(minutes=30 * i)
+    return {
+        'activity_type': 'focus' if i % 3 else 'meeting',
+        'category': ('work', 'study', 'personal')[i % 3],
+        'start_time': start,
+        'end_time': start + timedelta(minutes=25),
+        'duration': timedelta(minutes=25),
+        'notes': f'entry {i}',
+        'tags': ['deep', 'work'] if i % 2 else []
+    }
+
+def cursor_batches(rows):
+    """Mimic PooledConnection.stream: yield rows in fetchmany-sized batches"""
+    for start in range(0, rows, BATCH_SIZE):
+        yield [make_row(i) for i in range(start, min(start + BATCH_SIZE, rows))]
+
+def legacy_export(rows):
+    try:
+        import pandas as pd
+    except ImportError:
+        return None
+    data = [make_row(i) for i in range(rows)]  # fetchall()
+    df = pd.DataFrame(data)
+    output = io.StringIO()
+    df.to_csv(output, index=False)
+    output.seek(0)
+    return len(io.BytesIO(output.getvalue().encode('utf-8')).getvalue())
+
+def streaming_export(encoder, rows):
+    return sum(len(chunk) for chunk in encoder(COLUMNS, cursor_batches(rows)))
+
+def measure(fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    print(f"{rows:,} rows, batch size {BATCH_SIZE}")
+    print(f"{'mode':<18}{'bytes':>14}{'seconds':>10}{'peak MiB':>12}{'rows/s':>12}")
+    cases = [
+        ('legacy (pandas)', legacy_export, (rows,)),
+        ('stream csv', streaming_export, (iter_csv, rows)),
+        ('stream ndjson', streaming_export, (iter_ndjson, rows))
+    ]
+    for name, fn, args in cases:
+        size, elapsed, peak = measure(fn, *args)
+        if size is None:
+            print(f"{name:<18}{'skipped: pandas not installed':>48}")
+            continue
+        print(f"{name:<18}{size:>14,}{elapsed:>10.2f}{peak / 2 ** 20:>12.1f}{rows / elapsed:>12,.0f}")
+
+if __name__ == "__main__":
+    main()